@@ -1,53 +1,179 @@
 import json
 from datetime import datetime
 
-# ==============================
-# Cargar precios actuales del día
-# ==============================
-with open("precio-aceite.json", encoding="utf-8") as f:
-    data = json.load(f)
-
-# Intentar acceder a la estructura de precios
-precios = data.get("precios", data)
-
-# Obtener precios según las claves reales
-ve = precios.get("Aceite de oliva virgen extra", {}).get("precio_eur_kg")
-v = precios.get("Aceite de oliva virgen", {}).get("precio_eur_kg")
-l = precios.get("Aceite de oliva lampante", {}).get("precio_eur_kg")
-
-# ==============================
-# Leer histórico existente
-# ==============================
-with open("precios2015.txt", encoding="utf-8") as f:
-    contenido = f.read().strip().splitlines()
-
-# ==============================
-# Fecha de hoy
-# ==============================
-fecha_hoy = datetime.now().strftime("%d-%m-%Y")
-
-# ==============================
-# Evitar duplicar fecha
-# ==============================
-if any(fecha_hoy in line for line in contenido):
-    print(f"📅 {fecha_hoy} ya existe en el histórico, no se agrega.")
-    exit(0)
-
-# ==============================
-# Crear bloque nuevo
-# ==============================
-nuevo_bloque = [
-    fecha_hoy,
-    f"Aceite de oliva virgen extra {ve:.3f}",
-    f"Aceite de oliva virgen {v:.3f}",
-    f"Aceite de oliva lampante {l:.3f}",
-]
-
-# ==============================
-# Añadir al final del archivo
-# ==============================
-with open("precios2015.txt", "a", encoding="utf-8") as f:
-    f.write("\n" + "\n".join(nuevo_bloque) + "\n")
-
-print(f"✅ Histórico actualizado correctamente con precios del {fecha_hoy}")
+import escritura
+import serie_binaria
+from historico_store import HIST_KEYS
+from parser_historico import fecha_de_linea
+from validar_precios import leer_precios
 
+TXT_FILE = serie_binaria.TXT_FILE
+BIN_FILE = serie_binaria.BIN_FILE
+PRECIO_ACTUAL_FILE = "precio-aceite.json"
+COLA_BYTES = 4096
+
+
+def ultima_fecha_texto(path):
+    """Última fecha del texto leyendo solo la cola del fichero."""
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        f.seek(max(0, f.tell() - COLA_BYTES))
+        cola = f.read().decode("utf-8", errors="replace").splitlines()
+    for linea in reversed(cola):
+        fecha = fecha_de_linea(linea)
+        if fecha:
+            return fecha
+    return None
+
+
+def serie_al_dia(ultima_txt) -> bool:
+    """¿La serie binaria termina en la misma fecha que el texto? (entonces sirve de índice)"""
+    try:
+        with serie_binaria.SerieBinaria(BIN_FILE) as serie:
+            return serie.n > 0 and ultima_txt is not None and serie.dias[-1] == ultima_txt.toordinal()
+    except (OSError, ValueError):
+        return False
+
+
+def fecha_presente(fecha) -> bool:
+    """Búsqueda binaria de la fecha en la columna de días de la serie binaria."""
+    with serie_binaria.SerieBinaria(BIN_FILE) as serie:
+        return serie.contiene(fecha)
+
+
+def valores_de_json(path=PRECIO_ACTUAL_FILE) -> dict:
+    """{clave: precio | None} de precio-aceite.json."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    # Intentar acceder a la estructura de precios
+    precios = data.get("precios", data)
+
+    # Obtener precios según las claves reales
+    return {k: precios.get(k, {}).get("precio_eur_kg") for k in HIST_KEYS}
+
+
+def actualizar(valores: dict, hoy) -> bool:
+    """
+    Añade el bloque de `hoy` (date) con `valores` {clave: precio | None} a precios2015.txt
+    y a la serie binaria. Devuelve True si se añadió (False si no hay precios o ya estaba).
+    """
+    if all(v is None for v in valores.values()):
+        print("ℹ️ precio-aceite.json no trae precios; no se agrega nada.")
+        return False
+    fecha_hoy = hoy.strftime("%d-%m-%Y")
+
+    # Todo bajo el cerrojo y en una transacción: texto y serie binaria cambian juntos
+    with escritura.transaccion() as t:
+        # ==============================
+        # Evitar duplicar fecha (índice de la serie binaria, no un recorrido del texto)
+        # ==============================
+        ultima_txt = ultima_fecha_texto(TXT_FILE)
+        if not serie_al_dia(ultima_txt):
+            print(f"🔁 {BIN_FILE} no está al día con {TXT_FILE}; se regenera antes de comprobar.")
+            serie_binaria.escribir_por_fecha(BIN_FILE, leer_precios(str(TXT_FILE)))
+
+        if fecha_presente(hoy):
+            print(f"📅 {fecha_hoy} ya existe en el histórico, no se agrega.")
+            return False
+
+        # ==============================
+        # Crear bloque nuevo y añadirlo al final del archivo
+        # ==============================
+        nuevo_bloque = [fecha_hoy] + [f"{k} {v:.3f}" for k, v in valores.items() if v is not None]
+        t.anexar(TXT_FILE, "\n" + "\n".join(nuevo_bloque) + "\n")
+
+        # ==============================
+        # Serie columnar binaria: un día más sin volver a parsear el texto
+        # ==============================
+        contenido = serie_binaria.con_dia(BIN_FILE, hoy, valores)
+        if contenido is not None:
+            t.escribir(BIN_FILE, contenido)
+
+    # hoy va antes del último día de la serie (reloj cambiado...): reconstrucción completa
+    if contenido is None:
+        with escritura.bloqueo():
+            serie_binaria.escribir_por_fecha(BIN_FILE, leer_precios(str(TXT_FILE)))
+
+    print(f"✅ Histórico actualizado correctamente con precios del {fecha_hoy}")
+    print(f"✅ Serie binaria {BIN_FILE} actualizada.")
+    return True
+
+
+def _bloque(fecha, valores: dict) -> str:
+    return "\n".join([fecha.strftime("%d-%m-%Y")] + [f"{k} {v:.3f}" for k, v in valores.items()]) + "\n"
+
+
+def _clave_de_linea(linea: str):
+    clave = linea.rstrip().rsplit(" ", 1)[0]
+    return clave if clave in HIST_KEYS else None
+
+
+def incorporar(dias: dict) -> int:
+    """
+    Lleva a precios2015.txt y a la serie binaria cierres reales de días pasados
+    ({date: {clave: precio}}, los de un backfill): en el texto sustituyen las líneas de
+    esas claves (el precio arrastrado del día anterior) y los días que no estén se
+    insertan en su sitio. Texto y serie binaria cambian juntos. Devuelve cuántos días
+    se han escrito.
+    """
+    dias = {d: {k: v for k, v in valores.items() if v is not None} for d, valores in dias.items()}
+    dias = {d: valores for d, valores in dias.items() if valores}
+    if not dias:
+        return 0
+    pendientes = sorted(dias)
+
+    with escritura.transaccion() as t:
+        if not serie_al_dia(ultima_fecha_texto(TXT_FILE)):
+            print(f"🔁 {BIN_FILE} no está al día con {TXT_FILE}; se regenera desde el texto.")
+            serie_binaria.escribir_por_fecha(BIN_FILE, leer_precios(str(TXT_FILE)))
+
+        salida, j = [], 0
+        actual, vistas = None, set()  # bloque en curso con precios a sustituir y claves ya escritas
+
+        def _cerrar_bloque():
+            # claves que el bloque no traía, al final del bloque
+            if actual is not None:
+                if salida and not salida[-1].endswith("\n"):
+                    salida[-1] += "\n"
+                salida.extend(f"{k} {v:.3f}\n" for k, v in dias[actual].items() if k not in vistas)
+
+        with open(TXT_FILE, encoding="utf-8") as f:
+            for linea in f:
+                fecha = fecha_de_linea(linea)
+                if fecha is None and not linea.strip():
+                    _cerrar_bloque()
+                    actual = None
+                elif fecha is not None:
+                    _cerrar_bloque()
+                    actual = None
+                    while j < len(pendientes) and pendientes[j] < fecha:
+                        salida.append(_bloque(pendientes[j], dias[pendientes[j]]) + "\n")
+                        j += 1
+                    if j < len(pendientes) and pendientes[j] == fecha:
+                        actual, vistas = fecha, set()
+                        j += 1
+                elif actual is not None:
+                    k = _clave_de_linea(linea)
+                    if k in dias[actual]:
+                        vistas.add(k)
+                        linea = f"{k} {dias[actual][k]:.3f}\n"
+                salida.append(linea)
+        _cerrar_bloque()
+        if j < len(pendientes):
+            if salida and not salida[-1].endswith("\n"):
+                salida.append("\n")
+            salida.extend("\n" + _bloque(d, dias[d]) for d in pendientes[j:])
+        t.escribir(TXT_FILE, "".join(salida))
+
+        por_fecha = serie_binaria.leer_por_fecha(BIN_FILE)
+        for d, valores in dias.items():
+            por_fecha.setdefault(d, {}).update(valores)
+        t.escribir(BIN_FILE, serie_binaria.serializar_por_fecha(por_fecha))
+
+    print(f"✅ {len(dias)} día(s) pasados incorporados a {TXT_FILE} y {BIN_FILE}.")
+    return len(dias)
+
+
+if __name__ == "__main__":
+    actualizar(valores_de_json(), datetime.now().date())
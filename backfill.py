@@ -0,0 +1,129 @@
+# backfill.py
+# Piezas del modo `scraper.py backfill`: reconstruir cierres reales de días pasados
+# descargando las páginas históricas en lugar de rellenar huecos arrastrando precios.
+#
+#   - TokenBucket: limita las peticiones por segundo (con ráfaga máxima) entre
+#     todos los trabajadores;
+#   - Checkpoint: días ya resueltos (con precios o sin cierre), para poder cortar
+#     y retomar; los días con error no se marcan y se reintentan en la siguiente ejecución;
+#   - ejecutar(): cola de días con un número fijo de trabajadores asyncio.
+#
+# La descarga y el volcado al histórico los pone scraper.py.
+
+import asyncio
+import json
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import escritura
+
+CHECKPOINT_FILE = Path(".backfill-checkpoint.json")
+TRABAJADORES = 4
+TASA = 2.0  # peticiones por segundo
+RAFAGA = 4
+GUARDAR_CADA = 25  # días resueltos entre escrituras del checkpoint
+
+OK = "ok"
+SIN_DATOS = "sin_datos"
+ERROR = "error"
+
+
+class TokenBucket:
+    """Cubo de fichas: `tasa` fichas por segundo, como mucho `capacidad` acumuladas."""
+
+    def __init__(self, tasa: float = TASA, capacidad: int = RAFAGA):
+        if tasa <= 0:
+            raise ValueError("La tasa debe ser positiva")
+        self.tasa = tasa
+        self.capacidad = max(1, capacidad)
+        self._fichas = float(self.capacidad)
+        self._t = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def tomar(self):
+        # el lock reparte las fichas por orden de llegada entre los trabajadores
+        async with self._lock:
+            while True:
+                ahora = time.monotonic()
+                self._fichas = min(self.capacidad, self._fichas + (ahora - self._t) * self.tasa)
+                self._t = ahora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                await asyncio.sleep((1 - self._fichas) / self.tasa)
+
+
+def dias(desde: date, hasta: date, fines_de_semana: bool = False):
+    """Días de [desde, hasta]; sin sábados ni domingos salvo que se pidan."""
+    n = (hasta - desde).days + 1
+    todos = (desde + timedelta(days=i) for i in range(max(0, n)))
+    return [d for d in todos if fines_de_semana or d.weekday() < 5]
+
+
+class Checkpoint:
+    def __init__(self, path: Path = CHECKPOINT_FILE, origen: str = ""):
+        self.path = Path(path)
+        self.origen = origen
+        self.resueltos = {}
+        try:
+            cp = json.loads(self.path.read_text(encoding="utf-8"))
+            if cp.get("origen") == origen:
+                self.resueltos = {f: OK for f in cp.get(OK, [])}
+                self.resueltos.update({f: SIN_DATOS for f in cp.get(SIN_DATOS, [])})
+        except (OSError, ValueError):
+            pass
+
+    def pendientes(self, fechas):
+        return [d for d in fechas if d.isoformat() not in self.resueltos]
+
+    def marcar(self, fecha_iso: str, estado: str):
+        if estado in (OK, SIN_DATOS):
+            self.resueltos[fecha_iso] = estado
+
+    def guardar(self):
+        data = {"origen": self.origen}
+        for estado in (OK, SIN_DATOS):
+            data[estado] = sorted(f for f, e in self.resueltos.items() if e == estado)
+        escritura.escribir(self.path, json.dumps(data, ensure_ascii=False))
+
+    def borrar(self):
+        self.resueltos = {}
+        self.path.unlink(missing_ok=True)
+
+
+async def ejecutar(fechas, tarea, al_resolver, trabajadores: int = TRABAJADORES,
+                   limitador: TokenBucket = None, checkpoint: Checkpoint = None):
+    """
+    Reparte `fechas` entre `trabajadores` corrutinas. Cada día: espera una ficha,
+    `await tarea(fecha)` → (estado, datos) y `al_resolver(fecha, estado, datos)`
+    (en el hilo del bucle: puede escribir en el histórico sin bloqueos).
+    Devuelve el recuento por estado.
+    """
+    cola = asyncio.Queue()
+    for d in fechas:
+        cola.put_nowait(d)
+    cuenta = {OK: 0, SIN_DATOS: 0, ERROR: 0}
+
+    async def _trabajador():
+        while True:
+            try:
+                d = cola.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if limitador is not None:
+                await limitador.tomar()
+            estado, datos = await tarea(d)
+            al_resolver(d, estado, datos)
+            cuenta[estado] += 1
+            if checkpoint is not None:
+                checkpoint.marcar(d.isoformat(), estado)
+                if sum(cuenta.values()) % GUARDAR_CADA == 0:
+                    checkpoint.guardar()
+
+    try:
+        await asyncio.gather(*(_trabajador() for _ in range(max(1, trabajadores))))
+    finally:
+        if checkpoint is not None:
+            checkpoint.guardar()
+    return cuenta
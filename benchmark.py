@@ -0,0 +1,278 @@
+# benchmark.py
+# Banco de rendimiento de los parsers, convertidores y del alta en el histórico.
+#
+# Genera históricos sintéticos en cada formato de texto que existe en el repo, a
+# 1×, 10× y 100× el tamaño actual (~4000 días), y mide cada etapa:
+#
+#   a_float_eur          precio de la tabla ('3.600 €') → float
+#   leer_precios         validar_precios.leer_precios
+#   convertir_historico  convertir_historico.convertir (JSON + serie binaria)
+#   fusionar_historico   fusionar_historico.main (relleno diario hasta hoy)
+#   append_historico     scraper._append_history_if_needed: 256 días nuevos sobre
+#                        un almacén con todo el histórico ya cargado
+#
+# Formatos: "espacios" (precios2015.txt), "coma" (igual con coma decimal),
+# "tabulado" (historico_completo.txt) y "sin_cierre" (historico.txt, con filas
+# "Sin cierre de operaciones").
+#
+# Tiempo: el mejor de N repeticiones (perf_counter), también relativo a un bucle de
+# calibración medido en la misma ejecución ("rel"), que es lo que se compara: así la
+# línea base sirve en otra máquina o con la CPU más cargada. Memoria: pico de
+# tracemalloc en una ejecución aparte. Con una línea base guardada
+# (benchmark-baseline.json) sale con código 1 si alguna medida empeora más de la tolerancia.
+#
+#   python benchmark.py                       # compara con la línea base
+#   python benchmark.py --escalas 1,10 --guardar-baseline
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+import convertir_historico
+import escritura
+import fusionar_historico
+import validar_precios
+from fuentes import a_float_eur
+from historico_store import HIST_KEYS, HistoricoStore
+from scraper import _append_history_if_needed
+
+BASELINE_FILE = Path("benchmark-baseline.json")
+DIAS_BASE = 4000  # ≈ precios2015.txt (3954 días)
+ESCALAS = (1, 10, 100)
+FORMATOS = ("espacios", "coma", "tabulado", "sin_cierre")
+REPETICIONES = 3
+TOLERANCIA_TIEMPO = 0.5  # +50 %
+TOLERANCIA_MEMORIA = 0.25  # +25 %
+# por debajo de estos márgenes la diferencia es ruido
+MARGEN_S = 0.01
+MARGEN_MB = 1.0
+CLAVE_CALIBRACION = "_calibracion"
+
+FIN_SINTETICO = date(2025, 10, 28)
+DIAS_APPEND = 256
+_CADA_SIN_CIERRE = 15
+
+
+def _serie_sintetica(dias: int, semilla: int = 2015):
+    """Paseo aleatorio reproducible: [(fecha, [precio por tipo] | None)] ascendente."""
+    rnd = random.Random(semilla)
+    precios = [2.824, 2.629, 2.504]
+    inicio = FIN_SINTETICO - timedelta(days=dias - 1)
+    serie = []
+    for i in range(dias):
+        precios = [min(9.0, max(1.0, p + rnd.gauss(0, 0.012))) for p in precios]
+        serie.append((inicio + timedelta(days=i), list(precios)))
+    return serie
+
+
+def generar(path: Path, formato: str, dias: int):
+    """Escribe un histórico sintético de `dias` días en el formato indicado."""
+    serie = _serie_sintetica(dias)
+    partes = []
+    if formato in ("espacios", "coma"):
+        for d, precios in serie:
+            partes.append(d.strftime("%d-%m-%Y") + "\n")
+            for k, p in zip(HIST_KEYS, precios):
+                txt = f"{p:.3f}"
+                partes.append(f"{k} {txt.replace('.', ',') if formato == 'coma' else txt}\n")
+            partes.append("\n")
+    elif formato == "tabulado":
+        partes.append("\nTipo de aceite de oliva\tVariedad\tPrecio €/kg\n")
+        for d, precios in reversed(serie):
+            partes.append(d.strftime("%d-%m-%Y") + "\n")
+            partes.extend(f"{k}\tPicual\t{p:.3f} €\n" for k, p in zip(HIST_KEYS, precios))
+    elif formato == "sin_cierre":
+        partes.append("Tipo de aceite de oliva Variedad Precio €/kg\n")
+        for i, (d, precios) in enumerate(reversed(serie)):
+            partes.append(" " + d.strftime("%d-%m-%Y") + "\n")
+            for k, p in zip(HIST_KEYS, precios):
+                valor = "Sin cierre de operaciones" if i % _CADA_SIN_CIERRE == 0 else f"{p:.3f} €"
+                partes.append(f" {k} Picual {valor}\n")
+    else:
+        raise ValueError(f"Formato desconocido: {formato!r}")
+    path.write_text("".join(partes), encoding="utf-8")
+
+
+# --- Etapas: preparar(path, directorio, dias) -> función a medir (la preparación no cuenta) ---
+
+def _etapa_a_float(path, directorio, dias):
+    textos = [f"{p:.3f} €".replace(".", ",") if i % 2 else f"{p:.3f} €"
+              for i, (_, precios) in enumerate(_serie_sintetica(dias)) for p in precios]
+    return lambda: [a_float_eur(t) for t in textos]
+
+
+def _etapa_leer_precios(path, directorio, dias):
+    return lambda: validar_precios.leer_precios(str(path))
+
+
+def _etapa_convertir(path, directorio, dias):
+    return lambda: convertir_historico.convertir(str(path), str(directorio / "convertido.json"),
+                                                 bin_file=str(directorio / "convertido.bin"))
+
+
+def _etapa_fusionar(path, directorio, dias):
+    return lambda: fusionar_historico.main([str(path)], str(directorio / "fusionado.json"),
+                                           bin_file=str(directorio / "fusionado.bin"))
+
+
+def _etapa_append(path, directorio, dias):
+    for p in directorio.glob("bench-historico.*"):
+        p.unlink()
+    store = HistoricoStore(directorio / "bench-historico.dat", directorio / "bench-historico.log")
+    serie = _serie_sintetica(dias + DIAS_APPEND)
+    store.importar_json({
+        k: [{"fecha": d.isoformat(), "precio_eur_kg": precios[i]} for d, precios in serie[:dias]]
+        for i, k in enumerate(HIST_KEYS)
+    })
+    nuevos = [(d.isoformat(), {k: {"precio_eur_kg": p} for k, p in zip(HIST_KEYS, precios)})
+              for d, precios in serie[dias:]]
+
+    def _medir():
+        for fecha_iso, precios in nuevos:
+            _append_history_if_needed(store, precios, fecha_iso)
+    return _medir
+
+
+# (nombre, preparar, depende del formato)
+ETAPAS = [
+    ("a_float_eur", _etapa_a_float, False),
+    ("leer_precios", _etapa_leer_precios, True),
+    ("convertir_historico", _etapa_convertir, True),
+    ("fusionar_historico", _etapa_fusionar, True),
+    ("append_historico", _etapa_append, False),
+]
+
+
+def calibrar(repeticiones: int = 7) -> float:
+    """Segundos de un trabajo fijo de Python puro (parseo de texto y aritmética)."""
+    textos = [f"{i % 1000}.{i % 997:03d}" for i in range(100_000)]
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        total = 0.0
+        for t in textos:
+            total += float(t.split(".")[0]) + len(t)
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor
+
+
+def _silencio():
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def medir(preparar, path, directorio, dias, repeticiones=REPETICIONES, memoria=True,
+          calibracion: float = None) -> dict:
+    tiempos = []
+    # la primera vuelta calienta importaciones, cachés de regex y del sistema de ficheros
+    for _ in range(repeticiones + 1):
+        fn = preparar(path, directorio, dias)
+        with _silencio():
+            t0 = time.perf_counter()
+            fn()
+            tiempos.append(time.perf_counter() - t0)
+    resultado = {"s": round(min(tiempos[1:]), 4)}
+    if calibracion:
+        resultado["rel"] = round(min(tiempos[1:]) / calibracion, 3)
+    if memoria:
+        fn = preparar(path, directorio, dias)
+        tracemalloc.start()
+        try:
+            with _silencio():
+                fn()
+            resultado["mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        finally:
+            tracemalloc.stop()
+    return resultado
+
+
+def ejecutar(escalas=ESCALAS, formatos=FORMATOS, etapas=None, repeticiones=REPETICIONES, memoria=True) -> dict:
+    seleccion = [e for e in ETAPAS if not etapas or e[0] in etapas]
+    calibracion = calibrar()
+    print(f"⏱️ calibración: {calibracion:.4f} s")
+    resultados = {CLAVE_CALIBRACION: {"s": round(calibracion, 4)}}
+    with tempfile.TemporaryDirectory(prefix="bench-aceite-") as tmp:
+        directorio = Path(tmp)
+        for escala in escalas:
+            dias = DIAS_BASE * escala
+            for formato in formatos:
+                path = directorio / f"{formato}-{escala}x.txt"
+                generar(path, formato, dias)
+                for nombre, preparar, por_formato in seleccion:
+                    if not por_formato and formato != formatos[0]:
+                        continue
+                    clave = f"{nombre}/{formato if por_formato else '-'}/{escala}x"
+                    resultados[clave] = medir(preparar, path, directorio, dias, repeticiones, memoria, calibracion)
+                    r = resultados[clave]
+                    mb = f"{r['mb']:>9.2f} MB" if "mb" in r else ""
+                    print(f"⏱️ {clave:<42} {r['s']:>9.4f} s {mb}", flush=True)
+    return resultados
+
+
+def comparar(resultados: dict, baseline: dict, tolerancia=TOLERANCIA_TIEMPO,
+             tolerancia_memoria=TOLERANCIA_MEMORIA):
+    """Lista de regresiones [(clave, medida, base, actual)] frente a la línea base."""
+    regresiones = []
+    for clave, r in resultados.items():
+        base = baseline.get(clave)
+        if not base or clave == CLAVE_CALIBRACION:
+            continue
+        medida = "rel" if "rel" in r and "rel" in base else "s"
+        if r[medida] > base[medida] * (1 + tolerancia) and r["s"] - base["s"] > MARGEN_S:
+            regresiones.append((clave, medida, base[medida], r[medida]))
+        if "mb" in r and "mb" in base and r["mb"] > base["mb"] * (1 + tolerancia_memoria) \
+                and r["mb"] - base["mb"] > MARGEN_MB:
+            regresiones.append((clave, "mb", base["mb"], r["mb"]))
+    return regresiones
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Banco de rendimiento sobre históricos sintéticos.")
+    ap.add_argument("--escalas", default=",".join(map(str, ESCALAS)), help="Múltiplos del tamaño actual, p. ej. 1,10,100")
+    ap.add_argument("--formatos", default=",".join(FORMATOS))
+    ap.add_argument("--etapas", default="", help="Solo estas etapas (separadas por comas)")
+    ap.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    ap.add_argument("--sin-memoria", action="store_true", help="No medir el pico de memoria (más rápido)")
+    ap.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    ap.add_argument("--guardar-baseline", action="store_true", help="Guardar los resultados como nueva línea base")
+    ap.add_argument("--tolerancia", type=float, default=TOLERANCIA_TIEMPO, help="Empeoramiento de tiempo admitido (0.5 = +50 %%)")
+    args = ap.parse_args(argv)
+
+    resultados = ejecutar(
+        escalas=[int(e) for e in args.escalas.split(",") if e],
+        formatos=[f for f in args.formatos.split(",") if f],
+        etapas={e for e in args.etapas.split(",") if e},
+        repeticiones=args.repeticiones,
+        memoria=not args.sin_memoria,
+    )
+
+    if args.guardar_baseline:
+        baseline = {}
+        if args.baseline.exists():
+            baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        baseline.update(resultados)
+        escritura.escribir_json(args.baseline, baseline, sort_keys=True)
+        print(f"✅ Línea base guardada en {args.baseline} ({len(resultados)} medidas).")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"ℹ️ No hay línea base ({args.baseline}); usa --guardar-baseline para crearla.")
+        return 0
+    regresiones = comparar(resultados, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerancia)
+    for clave, medida, base, actual in regresiones:
+        print(f"❌ Regresión en {clave}: {medida} {base} → {actual}")
+    if regresiones:
+        return 1
+    print(f"✅ Sin regresiones frente a {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+# calculadora.py
+# Precio de la aceituna por lotes: rendimiento / 100 × precio del aceite (lo mismo que
+# calcular() en app.js, pero para miles de entregas de una vez).
+#
+#   python3 calculadora.py entregas.csv > liquidacion.csv
+#   python3 calculadora.py entregas.jsonl --salida liquidacion.jsonl
+#   python3 calculadora.py --rejilla rejilla-precios.json
+#
+# Cada entrega (fila de un CSV con cabecera o línea de un JSON-lines) trae:
+#   rendimiento  % de rendimiento graso (0–100)
+#   tipo         virgen_extra / virgen / lampante (las claves de app.js), extra, o el
+#                nombre completo del tipo de aceite
+#   fecha        opcional (AAAA-MM-DD): último precio del histórico en esa fecha o
+#                antes; sin fecha, el precio actual de precio-aceite.json
+#   kg           opcional: añade el importe de la entrega
+# y sale con sus campos más fecha_precio, precio_aceite_eur_kg, precio_aceituna_eur_kg
+# (e importe_eur), o con "error" si no se puede liquidar (la fila no para el lote).
+#
+# La entrada se lee en bloques; en cada bloque la búsqueda del precio de cada fecha y
+# la multiplicación se hacen de una vez (NumPy si está instalado, bisect si no).
+#
+# La rejilla (rendimiento × tipo con el precio actual) solo se genera a petición
+# (--rejilla); la web calcula la suya a partir de precio-aceite.json.
+
+import argparse
+import bisect
+import csv
+import json
+import sys
+import time
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+
+import escritura
+from consulta_precios import IndicePrecios
+from historico_store import HIST_KEYS
+from serie_binaria import BIN_FILE
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional
+    np = None
+
+PRECIO_ACTUAL_FILE = Path("precio-aceite.json")
+REJILLA_FILE = Path("rejilla-precios.json")
+BLOQUE = 4096
+PASO_REJILLA = 0.5
+PRECIO_MAX = 20  # mismo rango razonable que normalizaPrecios() en app.js
+
+# claves de app.js (TIPO_LABEL) → tipo canónico del histórico
+TIPOS_APP = {"virgen_extra": HIST_KEYS[0], "virgen": HIST_KEYS[1], "lampante": HIST_KEYS[2]}
+CAMPOS_SALIDA = ("fecha_precio", "precio_aceite_eur_kg", "precio_aceituna_eur_kg", "importe_eur", "error")
+
+
+def _precio_valido(v) -> bool:
+    return v is not None and 0 < v < PRECIO_MAX
+
+
+def precios_actuales(datos: dict) -> dict:
+    """{tipo canónico: precio} de un precio-aceite.json, solo los precios en rango."""
+    salida = {}
+    for k in HIST_KEYS:
+        try:
+            v = float((datos.get("precios") or {}).get(k, {}).get("precio_eur_kg"))
+        except (TypeError, ValueError):
+            continue
+        if _precio_valido(v):
+            salida[k] = v
+    return salida
+
+
+def rejilla(datos: dict, paso: float = PASO_REJILLA) -> dict:
+    """Precio de la aceituna para cada rendimiento de 0 a 100 (cada `paso`) y tipo de app.js."""
+    actuales = precios_actuales(datos)
+    n = int(round(100 / paso)) + 1
+    rendimientos = [round(i * paso, 3) for i in range(n)]
+    tabla = {}
+    for clave_app, k in TIPOS_APP.items():
+        if k in actuales:
+            p = actuales[k]
+            tabla[clave_app] = [round(r / 100 * p, 3) for r in rendimientos]
+    return {
+        "fecha": datos.get("ultima_actualizacion") or datos.get("fecha"),
+        "rendimientos": rendimientos,
+        "precios": tabla,
+    }
+
+
+def escribir_rejilla(path: Path, datos: dict) -> int:
+    return escritura.escribir_json(path, rejilla(datos), separators=(",", ":"))
+
+
+@lru_cache(maxsize=None)
+def _tipo(texto: str):
+    t = (texto or "").strip()
+    if t.lower() in TIPOS_APP:
+        return TIPOS_APP[t.lower()]
+    return IndicePrecios.clave(t)  # ValueError si no se reconoce
+
+
+class Calculadora:
+    def __init__(self, indice: IndicePrecios, actual: dict):
+        self.actual = actual
+        self.fecha_actual = str(actual.get("fecha") or "")[:10]
+        self.actuales = precios_actuales(actual)
+        self._series = {}
+        for k in HIST_KEYS:
+            ords, vals = indice.serie(k)
+            if np is not None:
+                ords, vals = np.asarray(ords, dtype=np.int64), np.asarray(vals, dtype=np.float64)
+            self._series[k] = (ords, vals)
+
+    def _buscar(self, clave, objetivos):
+        """Para cada ordinal objetivo, (ordinal, precio) del último día con dato, o None."""
+        ords, vals = self._series[clave]
+        if np is not None:
+            idx = np.searchsorted(ords, np.asarray(objetivos, dtype=np.int64), side="right") - 1
+            return [(int(ords[i]), float(vals[i])) if i >= 0 else None for i in idx.tolist()]
+        salida = []
+        for o in objetivos:
+            i = bisect.bisect_right(ords, o) - 1
+            salida.append((ords[i], vals[i]) if i >= 0 else None)
+        return salida
+
+    def liquidar(self, entregas):
+        """Liquida un bloque de entregas (lista de dicts); devuelve las filas de salida."""
+        n = len(entregas)
+        rend = [0.0] * n
+        precio = [0.0] * n
+        kg = [0.0] * n
+        salida = [dict(e) for e in entregas]
+        por_tipo = {}  # clave → [(posición, ordinal)]
+
+        for i, e in enumerate(entregas):
+            fila = salida[i]
+            try:
+                clave = _tipo(e.get("tipo") or "")
+                r = float(str(e.get("rendimiento", "")).replace(",", "."))
+                if not 0 <= r <= 100:
+                    raise ValueError(f"rendimiento fuera de 0–100: {r}")
+                rend[i] = r
+                if e.get("kg") not in (None, ""):
+                    kg[i] = float(str(e["kg"]).replace(",", "."))
+                fecha = (e.get("fecha") or "").strip()
+                if fecha:
+                    por_tipo.setdefault(clave, []).append((i, date.fromisoformat(fecha).toordinal()))
+                elif clave in self.actuales:
+                    precio[i] = self.actuales[clave]
+                    fila["fecha_precio"] = self.fecha_actual
+                else:
+                    raise ValueError(f"sin precio actual para {clave}")
+            except (TypeError, ValueError) as ex:
+                fila["error"] = str(ex)
+
+        for clave, posiciones in por_tipo.items():
+            encontrados = self._buscar(clave, [o for _, o in posiciones])
+            for (i, _), hallado in zip(posiciones, encontrados):
+                if hallado is None or not _precio_valido(hallado[1]):
+                    salida[i]["error"] = f"sin precio de {clave} en esa fecha"
+                else:
+                    precio[i] = hallado[1]
+                    salida[i]["fecha_precio"] = date.fromordinal(hallado[0]).isoformat()
+
+        if np is not None:
+            aceituna = np.round(np.asarray(rend) / 100 * np.asarray(precio), 3).tolist()
+            importe = np.round(np.asarray(aceituna) * np.asarray(kg), 2).tolist()
+        else:
+            aceituna = [round(r / 100 * p, 3) for r, p in zip(rend, precio)]
+            importe = [round(a * k, 2) for a, k in zip(aceituna, kg)]
+
+        for i, fila in enumerate(salida):
+            if "error" in fila:
+                continue
+            fila["precio_aceite_eur_kg"] = precio[i]
+            fila["precio_aceituna_eur_kg"] = aceituna[i]
+            if kg[i]:
+                fila["importe_eur"] = importe[i]
+        return salida
+
+
+def _formato(path: str, formato: str = None) -> str:
+    if formato:
+        return formato
+    return "jsonl" if path and Path(path).suffix.lower() in (".jsonl", ".ndjson", ".json") else "csv"
+
+
+def leer_entregas(f, formato: str):
+    if formato == "csv":
+        yield from csv.DictReader(f)
+    else:
+        for linea in f:
+            if linea.strip():
+                yield json.loads(linea)
+
+
+def _bloques(filas, n: int = BLOQUE):
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) >= n:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def liquidar_fichero(calc: Calculadora, entrada, salida, formato_entrada: str, formato_salida: str):
+    """Lee, liquida y escribe por bloques. Devuelve (nº de entregas, nº con error)."""
+    total = errores = 0
+    escritor = None
+    for bloque in _bloques(leer_entregas(entrada, formato_entrada)):
+        filas = calc.liquidar(bloque)
+        total += len(filas)
+        errores += sum("error" in f for f in filas)
+        if formato_salida == "csv":
+            if escritor is None:
+                campos = list(bloque[0].keys()) + [c for c in CAMPOS_SALIDA if c not in bloque[0]]
+                escritor = csv.DictWriter(salida, fieldnames=campos, extrasaction="ignore")
+                escritor.writeheader()
+            escritor.writerows(filas)
+        else:
+            salida.writelines(json.dumps(f, ensure_ascii=False) + "\n" for f in filas)
+    return total, errores
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Precio de la aceituna por lotes (rendimiento × precio del aceite).")
+    ap.add_argument("entrada", nargs="?", help="CSV o JSON-lines de entregas ('-' para stdin)")
+    ap.add_argument("--salida", help="Fichero de salida (por defecto, stdout)")
+    ap.add_argument("--formato", choices=("csv", "jsonl"), help="Formato de entrada (por defecto, según la extensión)")
+    ap.add_argument("--formato-salida", choices=("csv", "jsonl"), help="Por defecto, el de la salida o el de entrada")
+    ap.add_argument("--actual", type=Path, default=PRECIO_ACTUAL_FILE, help="JSON con los precios actuales")
+    ap.add_argument("--bin", type=Path, default=BIN_FILE, help="Serie binaria del histórico")
+    ap.add_argument("--rejilla", type=Path, help="Escribe la rejilla rendimiento × tipo en este fichero")
+    args = ap.parse_args(argv)
+
+    if not args.entrada and not args.rejilla:
+        ap.error("indica un fichero de entregas o --rejilla")
+
+    actual = json.loads(args.actual.read_text(encoding="utf-8")) if args.actual.exists() else {}
+
+    if args.rejilla:
+        n = escribir_rejilla(args.rejilla, actual)
+        print(f"✅ Rejilla guardada en {args.rejilla} ({n} bytes).", file=sys.stderr)
+    if not args.entrada:
+        return 0
+
+    t0 = time.perf_counter()
+    calc = Calculadora(IndicePrecios(args.bin), actual)
+    formato_entrada = _formato(args.entrada, args.formato)
+    formato_salida = args.formato_salida or (_formato(args.salida) if args.salida else formato_entrada)
+    entrada = sys.stdin if args.entrada == "-" else open(args.entrada, encoding="utf-8", newline="")
+    salida = open(args.salida, "w", encoding="utf-8", newline="") if args.salida else sys.stdout
+    try:
+        total, errores = liquidar_fichero(calc, entrada, salida, formato_entrada, formato_salida)
+    finally:
+        if entrada is not sys.stdin:
+            entrada.close()
+        if salida is not sys.stdout:
+            salida.close()
+    ms = (time.perf_counter() - t0) * 1000
+    print(f"✅ {total} entregas liquidadas ({errores} con error) en {ms:.1f} ms.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
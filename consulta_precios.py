@@ -0,0 +1,258 @@
+# consulta_precios.py
+# Servicio local de solo lectura para consultar el histórico sin volver a parsear
+# los ficheros en cada petición.
+#
+#   GET /latest                                   último precio de cada tipo
+#   GET /range?type=extra&from=2024-01-01&to=2024-06-30&resolution=semanal
+#       type        nombre completo o abreviado (extra, virgen, lampante); sin él, todos
+#       from / to   fechas ISO (por defecto, todo el histórico)
+#       resolution  diario (defecto), semanal, mensual o anual (OHLC + media, como rollups/;
+#                   se devuelven los periodos completos que tocan el rango)
+#
+# Al arrancar se carga la serie (precios2015.bin + días posteriores del almacén del
+# histórico) en arrays ordenados por tipo, con los ordinales de día como índice; cada
+# consulta es una bisección y un corte. Las respuestas ya serializadas se guardan en
+# una caché LRU. Cada pocos segundos se comprueba si los ficheros han cambiado: si
+# solo ha crecido el .log del almacén se leen únicamente las líneas nuevas; si cambia
+# la serie binaria o la base .dat, se recarga todo. IndicePrecios se puede usar
+# también desde otros scripts de Python.
+
+import argparse
+import asyncio
+import bisect
+from collections import OrderedDict
+from datetime import date
+from pathlib import Path
+
+import http_local
+import remuestreo
+import rollups
+from historico_store import DAT_FILE, HIST_KEYS, LOG_FILE, HistoricoStore, _parsear
+from serie_binaria import BIN_FILE, cargar_serie
+
+PUERTO = 8788
+LRU_MAX = 256
+REVISAR_CADA = 5.0  # segundos
+
+# "extra", "virgen", "lampante" → clave canónica
+ALIAS = {k.split()[-1].lower(): k for k in HIST_KEYS}
+
+
+def _firma(path: Path):
+    try:
+        st = path.stat()
+        return st.st_size, st.st_mtime_ns
+    except OSError:
+        return None
+
+
+class IndicePrecios:
+    def __init__(self, bin_path=BIN_FILE, dat_path=DAT_FILE, log_path=LOG_FILE):
+        self.bin_path, self.dat_path, self.log_path = Path(bin_path), Path(dat_path), Path(log_path)
+        self.version = 0
+        self.cargar()
+
+    def cargar(self):
+        """Carga completa: la serie diaria y, por tipo, ordinales y precios de los días con dato."""
+        fechas, cols = cargar_serie(self.bin_path, HistoricoStore(self.dat_path, self.log_path))
+        self._fechas = fechas
+        self._cols = cols
+        self._series = {k: ([], []) for k in HIST_KEYS}
+        for i, d in enumerate(fechas):
+            self._anadir_dia(d, [cols[k][i] for k in HIST_KEYS], columnas=False)
+        self._agregados = {}
+        self._firmas = (_firma(self.bin_path), _firma(self.dat_path))
+        self._log_offset = _firma(self.log_path)[0] if self.log_path.exists() else 0
+        self.version += 1
+
+    def _anadir_dia(self, d: date, valores, columnas: bool = True):
+        if columnas:
+            self._fechas.append(d)
+            for k, v in zip(HIST_KEYS, valores):
+                self._cols[k].append(v)
+        o = d.toordinal()
+        for k, v in zip(HIST_KEYS, valores):
+            if v is not None:
+                ords, vals = self._series[k]
+                ords.append(o)
+                vals.append(v)
+
+    def actualizar(self):
+        """Aplica los cambios en disco. Devuelve "completa", "incremental" o None."""
+        if (_firma(self.bin_path), _firma(self.dat_path)) != self._firmas:
+            self.cargar()
+            return "completa"
+        tam = _firma(self.log_path)[0] if self.log_path.exists() else 0
+        if tam == self._log_offset:
+            return None
+        if tam < self._log_offset:  # compactado o reescrito
+            self.cargar()
+            return "completa"
+
+        with self.log_path.open("rb") as f:
+            f.seek(self._log_offset)
+            nuevo = f.read(tam - self._log_offset)
+        corte = nuevo.rfind(b"\n") + 1  # una línea a medio escribir se lee la próxima vez
+        ultima = self._fechas[-1].isoformat() if self._fechas else ""
+        dias = []
+        for linea in nuevo[:corte].decode("ascii").splitlines():
+            if linea.strip():
+                fecha_iso, valores = _parsear(linea)
+                if fecha_iso <= ultima or (dias and fecha_iso <= dias[-1][0]):
+                    # corrige un día ya cargado o llega desordenado: recarga completa
+                    self.cargar()
+                    return "completa"
+                dias.append((fecha_iso, valores))
+        for fecha_iso, valores in dias:
+            self._anadir_dia(date.fromisoformat(fecha_iso), valores)
+        self._log_offset += corte
+        if dias:
+            self._agregados = {}
+            self.version += 1
+            return "incremental"
+        return None
+
+    # ---------- consultas ----------
+
+    @staticmethod
+    def clave(tipo: str):
+        if not tipo:
+            return None
+        k = ALIAS.get(tipo.lower()) or next((k for k in HIST_KEYS if k.lower() == tipo.lower()), None)
+        if k is None:
+            raise ValueError(f"tipo desconocido: {tipo!r} (admite {', '.join(ALIAS)})")
+        return k
+
+    def serie(self, clave: str):
+        """(ordinales, precios) ascendentes de los días con dato del tipo `clave`."""
+        return self._series[clave]
+
+    def ultimo(self) -> dict:
+        salida = {}
+        for k, (ords, vals) in self._series.items():
+            if ords:
+                salida[k] = {"fecha": date.fromordinal(ords[-1]).isoformat(), "precio_eur_kg": vals[-1]}
+        return salida
+
+    def _agregado(self, resolucion: str):
+        if resolucion not in self._agregados:
+            self._agregados[resolucion] = rollups.agregar(
+                self._fechas, self._cols, rollups.RESOLUCIONES[resolucion])
+        return self._agregados[resolucion]
+
+    def rango(self, tipo: str = None, desde: date = None, hasta: date = None,
+              resolucion: str = "diario") -> dict:
+        if resolucion not in rollups.RESOLUCIONES:
+            raise ValueError(f"resolución desconocida: {resolucion!r}")
+        claves = [self.clave(tipo)] if tipo else HIST_KEYS
+        desde = desde or date.min
+        hasta = hasta or date.max
+        if desde > hasta:
+            raise ValueError("'from' es posterior a 'to'")
+
+        if resolucion == "diario":
+            series = {}
+            for k in claves:
+                ords, vals = self._series[k]
+                i = bisect.bisect_left(ords, desde.toordinal())
+                j = bisect.bisect_right(ords, hasta.toordinal())
+                series[k] = {"fechas": remuestreo.fechas_para(ords[i:j]), "precios": vals[i:j]}
+            return {"resolucion": resolucion, "series": series}
+
+        periodos, agregadas = self._agregado(resolucion)
+        clave_periodo = rollups.RESOLUCIONES[resolucion]
+        i = bisect.bisect_left(periodos, clave_periodo(max(desde, self._fechas[0]))) if self._fechas else 0
+        j = bisect.bisect_right(periodos, clave_periodo(min(hasta, self._fechas[-1]))) if self._fechas else 0
+        return {
+            "resolucion": resolucion,
+            "periodos": periodos[i:j],
+            "series": {k: {campo: v[i:j] for campo, v in agregadas[k].items()} for k in claves},
+        }
+
+
+class _LRU:
+    def __init__(self, maximo: int = LRU_MAX):
+        self.maximo = maximo
+        self._datos = OrderedDict()
+
+    def get(self, clave):
+        valor = self._datos.get(clave)
+        if valor is not None:
+            self._datos.move_to_end(clave)
+        return valor
+
+    def put(self, clave, valor):
+        self._datos[clave] = valor
+        self._datos.move_to_end(clave)
+        if len(self._datos) > self.maximo:
+            self._datos.popitem(last=False)
+
+    def clear(self):
+        self._datos.clear()
+
+
+def _fecha(parametros: dict, nombre: str):
+    valor = parametros.get(nombre)
+    return date.fromisoformat(valor) if valor else None
+
+
+def rutas(indice: IndicePrecios, cache: _LRU) -> dict:
+    def _con_cache(ruta, fn):
+        def _atender(parametros):
+            clave = (ruta, tuple(sorted(parametros.items())))
+            respuesta = cache.get(clave)
+            if respuesta is None:
+                try:
+                    respuesta = http_local.respuesta_json(fn(parametros))
+                except ValueError as e:
+                    return http_local.error_json(400, str(e))
+                cache.put(clave, respuesta)
+            return respuesta
+        return _atender
+
+    def _range(p):
+        return indice.rango(p.get("type"), _fecha(p, "from"), _fecha(p, "to"), p.get("resolution") or "diario")
+
+    return {
+        "/latest": _con_cache("/latest", lambda p: indice.ultimo()),
+        "/range": _con_cache("/range", _range),
+    }
+
+
+async def _vigilar(indice: IndicePrecios, cache: _LRU, cada: float):
+    while True:
+        await asyncio.sleep(cada)
+        try:
+            cambio = indice.actualizar()
+        except (OSError, ValueError) as e:
+            print(f"⚠️ No se pudo recargar el histórico: {e}")
+            continue
+        if cambio:
+            cache.clear()
+            print(f"🔄 Histórico recargado ({cambio}); {len(indice._fechas)} días.")
+
+
+async def servir(host: str = "127.0.0.1", puerto: int = PUERTO, bin_path=BIN_FILE, revisar: float = REVISAR_CADA):
+    indice = IndicePrecios(bin_path)
+    cache = _LRU()
+    servidor = await http_local.servir(rutas(indice, cache), host, puerto)
+    print(f"✅ {len(indice._fechas)} días cargados; escuchando en http://{host}:{puerto}/range y /latest")
+    vigilante = asyncio.create_task(_vigilar(indice, cache, revisar))
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        vigilante.cancel()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Servicio local de consulta de precios del histórico.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--puerto", type=int, default=PUERTO)
+    ap.add_argument("--bin", type=Path, default=BIN_FILE, help="Serie binaria del histórico")
+    ap.add_argument("--revisar", type=float, default=REVISAR_CADA, help="Segundos entre comprobaciones de cambios")
+    args = ap.parse_args()
+    try:
+        asyncio.run(servir(args.host, args.puerto, args.bin, args.revisar))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,245 @@
+# conversion_incremental.py
+# Modo incremental para convertir_historico_completo.py y fusionar_historico.py.
+#
+# Se guarda un checkpoint con:
+#   - el fichero de texto de origen, el byte hasta el que se ha leído y la huella
+#     (sha256) de los últimos bytes leídos, para comprobar que solo se ha añadido texto;
+#   - por serie, su última entrada REAL (no rellenada) y dos posiciones en bytes del
+#     JSON de salida: dónde empieza esa entrada y dónde acaba la última de la serie;
+#   - la fecha del último bloque;
+#   - tamaño y mtime del JSON de salida (y del fichero que escribe `exportar`, si lo
+#     hay), para saber que nadie los ha tocado.
+#
+# Si todo cuadra, solo se parsea la cola añadida del texto y, por serie, solo se
+# rellena y se serializa el tramo que va desde la última fecha real. El resto del
+# JSON no se vuelve a leer como JSON: se copia tal cual, byte a byte, entre esos
+# tramos. La salida es la misma que daría json.dump(..., indent=2). Si no cuadra
+# (fichero editado, fechas antiguas corregidas, salida distinta...), se hace la
+# conversión completa.
+#
+# Coste de una ejecución incremental: el trabajo en Python (parseo, relleno,
+# serialización) es proporcional a los días nuevos, pero la salida se sigue
+# reescribiendo entera (copia secuencial de los bytes sin cambios, O(histórico) en
+# E/S): un JSON con una lista por tipo no se puede ampliar por el final sin mover lo
+# que va detrás, y la escritura es atómica (temporal + rename). Lo mismo vale para
+# la serie binaria de `exportar` (columnar: cada columna se copia entera).
+
+import hashlib
+import json
+from datetime import date
+from pathlib import Path
+
+import escritura
+from historico_store import HIST_KEYS
+from parser_historico import detectar_formato, fecha_de_linea, parsear_lineas, series_por_clave
+
+CHECKPOINT_FILE = Path(".conversion-checkpoint.json")
+_VENTANA_HUELLA = 4096
+
+
+def _huella(path: Path, offset: int) -> str:
+    with path.open("rb") as f:
+        inicio = max(0, offset - _VENTANA_HUELLA)
+        f.seek(inicio)
+        return hashlib.sha256(f.read(offset - inicio)).hexdigest()
+
+
+def _firma_salida(path: Path):
+    st = path.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _cargar_checkpoint(checkpoint: Path, input_file: Path, output_file: Path):
+    """Devuelve el checkpoint si sigue siendo válido para (input, output); si no, None."""
+    try:
+        cp = json.loads(checkpoint.read_text(encoding="utf-8"))
+        if cp.get("fuente") != str(input_file) or cp.get("salida") != str(output_file):
+            return None
+        if input_file.stat().st_size < cp["offset"]:
+            return None
+        if _huella(input_file, cp["offset"]) != cp["huella"]:
+            return None
+        if not output_file.exists() or _firma_salida(output_file) != cp["firma_salida"]:
+            return None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return cp
+
+
+def _leer_hasta_linea_completa(path: Path, offset: int):
+    """Texto desde `offset` hasta el último salto de línea y el nuevo offset."""
+    with path.open("rb") as f:
+        f.seek(offset)
+        cola = f.read()
+    # una línea a medio escribir se leerá en la siguiente ejecución
+    corte = cola.rfind(b"\n") + 1
+    return cola[:corte].decode("utf-8", errors="replace"), offset + corte
+
+
+def _ultima_fecha_bloque(lineas, previa):
+    for linea in reversed(lineas):
+        f = fecha_de_linea(linea)
+        if f:
+            return f.isoformat()
+    return previa
+
+
+def _entrada(e: dict) -> bytes:
+    # como json.dump(..., indent=2) a dos niveles de profundidad
+    return ('    {\n      "fecha": ' + json.dumps(e["fecha"]) + ',\n      "precio_eur_kg": '
+            + json.dumps(e["precio_eur_kg"]) + "\n    }").encode("utf-8")
+
+
+class _Salida:
+    """Fichero binario que lleva la cuenta de la posición escrita."""
+
+    def __init__(self, f):
+        self.f = f
+        self.pos = 0
+
+    def write(self, datos: bytes):
+        self.f.write(datos)
+        self.pos += len(datos)
+
+    def copiar(self, origen, desde: int, hasta: int = None, bloque: int = 1 << 20):
+        """Copia los bytes [desde, hasta) de `origen` (hasta el final si hasta es None)."""
+        origen.seek(desde)
+        pendiente = None if hasta is None else hasta - desde
+        while pendiente is None or pendiente > 0:
+            datos = origen.read(bloque if pendiente is None else min(bloque, pendiente))
+            if not datos:
+                break
+            self.write(datos)
+            if pendiente is not None:
+                pendiente -= len(datos)
+
+
+def _escribir_entradas(out: _Salida, entradas, ultima_real: dict, separador: bytes = b"\n") -> dict:
+    """Escribe las entradas de una serie; devuelve la posición de la última real y el final."""
+    pos = {"ultima_real": ultima_real, "corte": None}
+    for i, e in enumerate(entradas):
+        if i:
+            out.write(b",\n")
+        elif separador:
+            out.write(separador)
+        if ultima_real is not None and e["fecha"] == ultima_real["fecha"]:
+            pos["corte"] = out.pos
+        out.write(_entrada(e))
+    pos["fin"] = out.pos
+    return pos
+
+
+def _escribir(output_file: Path, data: dict, ultimas: dict) -> dict:
+    """Escribe la salida completa; devuelve las posiciones de cada serie para el checkpoint."""
+    series = {}
+    with escritura.abrir(output_file, "wb") as f:
+        out = _Salida(f)
+        out.write(b"{")
+        for n, (k, lista) in enumerate(data.items()):
+            out.write((",\n" if n else "\n").encode() + b"  " + json.dumps(k, ensure_ascii=False).encode("utf-8") + b": ")
+            if not lista:
+                out.write(b"[]")
+                continue
+            out.write(b"[")
+            series[k] = _escribir_entradas(out, lista, ultimas.get(k))
+            out.write(b"\n  ]")
+        out.write(b"\n}" if data else b"}")
+    return series
+
+
+def _escribir_colas(output_file: Path, series: dict, tramos: dict, ultimas: dict) -> dict:
+    """
+    Sustituye en la salida, por serie, lo que va desde su última entrada real por
+    `tramos[k]`, copiando el resto de bytes sin cambios.
+    """
+    nuevas = {}
+    with output_file.open("rb") as viejo, escritura.abrir(output_file, "wb") as f:
+        out = _Salida(f)
+        pos = 0
+        for k in sorted(tramos, key=lambda k: series[k]["corte"]):
+            out.copiar(viejo, pos, series[k]["corte"])
+            nuevas[k] = _escribir_entradas(out, tramos[k], ultimas[k], separador=b"")
+            pos = series[k]["fin"]
+        out.copiar(viejo, pos)
+    return nuevas
+
+
+def _guardar_checkpoint(checkpoint: Path, input_file: Path, output_file: Path, offset: int,
+                        formato: str, series: dict, fecha_bloque, exportado: Path = None):
+    escritura.escribir(checkpoint, json.dumps({
+        "fuente": str(input_file),
+        "salida": str(output_file),
+        "offset": offset,
+        "huella": _huella(input_file, offset),
+        "formato": formato,
+        "series": series,
+        "fecha_bloque": fecha_bloque,
+        "firma_salida": _firma_salida(output_file),
+        "exportado": None if exportado is None else [str(exportado), _firma_salida(exportado)],
+    }, ensure_ascii=False, indent=2))
+
+
+def convertir(input_file, output_file, rellenar, checkpoint=CHECKPOINT_FILE, exportar=None, exportado=None):
+    """
+    Convierte `input_file` en el JSON {clave: [{fecha, precio_eur_kg}]} de `output_file`
+    rellenando cada serie con `rellenar(lista)` (la función del script que llama).
+    Devuelve "incremental" o "completa".
+    `exportar(data, desde)`, si se indica, se llama tras escribir la salida (p. ej. la
+    serie binaria, en el fichero `exportado`): en la conversión completa `data` son las
+    series enteras y `desde` None; en la incremental, solo los tramos reescritos y
+    `desde` la primera fecha (ISO) que cambia.
+    """
+    input_file, output_file, checkpoint = Path(input_file), Path(output_file), Path(checkpoint)
+    exportado = Path(exportado) if exportado else None
+    cp = _cargar_checkpoint(checkpoint, input_file, output_file)
+    if cp is not None and exportado is not None:
+        previo = cp.get("exportado")
+        if (previo is None or previo[0] != str(exportado) or not exportado.exists()
+                or _firma_salida(exportado) != previo[1]):
+            cp = None
+
+    modo = None
+    if cp is not None and set(cp.get("series", {})) == set(HIST_KEYS) \
+            and all(s["corte"] is not None for s in cp["series"].values()):
+        series = cp["series"]
+        texto, offset = _leer_hasta_linea_completa(input_file, cp["offset"])
+        lineas = texto.splitlines()
+        fecha_bloque = cp.get("fecha_bloque")
+        inicial = date.fromisoformat(fecha_bloque) if fecha_bloque else None
+        nuevas = series_por_clave(parsear_lineas(lineas, cp["formato"], fecha_inicial=inicial))
+
+        # una fecha anterior a la última real es una corrección del pasado: reconstrucción completa
+        retroactivo = any(nuevas[k] and nuevas[k][0]["fecha"] < series[k]["ultima_real"]["fecha"]
+                          for k in HIST_KEYS)
+        if not retroactivo:
+            tramos, ultimas = {}, {}
+            for k in HIST_KEYS:
+                ultima = series[k]["ultima_real"]
+                # la última real se vuelve a escribir: el bloque abierto puede haberla cambiado
+                previa = [] if nuevas[k] and nuevas[k][0]["fecha"] == ultima["fecha"] else [ultima]
+                tramos[k] = rellenar(previa + nuevas[k])
+                ultimas[k] = nuevas[k][-1] if nuevas[k] else ultima
+            series = _escribir_colas(output_file, series, tramos, ultimas)
+            data = tramos
+            desde = min(t[0]["fecha"] for t in tramos.values() if t)
+            fecha_bloque = _ultima_fecha_bloque(lineas, fecha_bloque)
+            formato = cp["formato"]
+            modo = "incremental"
+
+    if modo is None:
+        formato = detectar_formato(input_file)["formato"]
+        texto, offset = _leer_hasta_linea_completa(input_file, 0)
+        lineas = texto.splitlines()
+        data = series_por_clave(parsear_lineas(lineas, formato))
+        ultimas = {k: (v[-1] if v else None) for k, v in data.items()}
+        for k in data:
+            data[k] = rellenar(data[k])
+        series = _escribir(output_file, data, ultimas)
+        desde = None
+        fecha_bloque = _ultima_fecha_bloque(lineas, None)
+        modo = "completa"
+
+    if exportar is not None:
+        exportar(data, desde)
+    _guardar_checkpoint(checkpoint, input_file, output_file, offset, formato, series, fecha_bloque, exportado)
+    return modo
@@ -1,50 +1,52 @@
+# convertir_historico.py
+# Convierte precios2015.txt en precio-aceite-historico.json (un registro por fecha
+# con los tres tipos; los bloques incompletos o sin cierre se omiten).
+# Con --bin escribe también la serie columnar binaria. Nunca por defecto en
+# precios2015.bin: esa es la serie canónica que mantiene el pipeline diario, y esta
+# salida no trae los días incompletos.
+
+import argparse
 import json
-from datetime import datetime
+from datetime import date
+
+import escritura
+import serie_binaria
+from historico_store import HIST_KEYS
+from parser_historico import agrupar_por_fecha, parsear_archivo
 
 INPUT_FILE = "precios2015.txt"
 OUTPUT_FILE = "precio-aceite-historico.json"
 
-def convertir():
+def convertir(input_file=INPUT_FILE, output_file=OUTPUT_FILE, bin_file=None):
     historico = []
 
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
-        lineas = [line.strip() for line in f if line.strip()]
-
-    i = 0
-    while i < len(lineas):
-        try:
-            # La primera línea es la fecha
-            fecha_str = lineas[i]
-            fecha = datetime.strptime(fecha_str, "%d-%m-%Y").date().isoformat()
-
-            # Las tres siguientes son precios
-            ve_line = lineas[i+1]
-            v_line  = lineas[i+2]
-            l_line  = lineas[i+3]
-
-            ve = float(ve_line.split()[-1])
-            v  = float(v_line.split()[-1])
-            l  = float(l_line.split()[-1])
-
-            historico.append({
-                "fecha": fecha,
-                "Aceite de oliva virgen extra": ve,
-                "Aceite de oliva virgen": v,
-                "Aceite de oliva lampante": l
-            })
-
-            i += 4  # saltamos a la siguiente fecha
-        except Exception as e:
-            print(f"⚠️ Error en bloque a partir de la línea {i+1}: {e}")
-            i += 1  # avanzamos para no quedar en bucle infinito
+    # El parser común admite cualquier formato (espacios, tabulado, coma decimal)
+    por_fecha = agrupar_por_fecha(parsear_archivo(input_file))
+
+    for fecha, precios in por_fecha.items():
+        if any(precios.get(k) is None for k in HIST_KEYS):
+            print(f"⚠️ {fecha.strftime('%d-%m-%Y')}: bloque incompleto o sin cierre, se omite")
+            continue
+        historico.append({"fecha": fecha.isoformat(), **{k: precios[k] for k in HIST_KEYS}})
 
     # Ordenar por fecha ascendente
     historico.sort(key=lambda x: x["fecha"])
 
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+    with escritura.abrir(output_file) as f:
         json.dump(historico, f, indent=2, ensure_ascii=False)
 
-    print(f"✅ Histórico generado: {OUTPUT_FILE} con {len(historico)} registros")
+    print(f"✅ Histórico generado: {output_file} con {len(historico)} registros")
+
+    if bin_file:
+        serie_binaria.escribir_por_fecha(bin_file, {
+            date.fromisoformat(h["fecha"]): {k: h[k] for k in HIST_KEYS} for h in historico
+        })
+        print(f"✅ Serie binaria generada: {bin_file}")
 
 if __name__ == "__main__":
-    convertir()
+    ap = argparse.ArgumentParser(description="Convierte el histórico en texto a JSON (un registro por fecha).")
+    ap.add_argument("input_file", nargs="?", default=INPUT_FILE)
+    ap.add_argument("output_file", nargs="?", default=OUTPUT_FILE)
+    ap.add_argument("--bin", metavar="FICHERO", help="Escribir también la serie columnar binaria en FICHERO")
+    args = ap.parse_args()
+    convertir(args.input_file, args.output_file, args.bin)
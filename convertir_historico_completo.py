@@ -2,86 +2,91 @@
 # Convierte "precios 2015.txt" en "precio-aceite-historico.json"
 # Incluye TODOS los días desde la primera fecha hasta hoy.
 # Si falta algún día, se rellena con el precio del día anterior.
+# El texto se lee con parser_historico (cualquier formato: espacios, tabulado, coma decimal).
+# Con --rle escribe también la serie por tramos (serie_rle.py), que separa los cierres
+# reales de los días rellenados, y con --bin la serie columnar binaria. La serie binaria
+# solo se escribe si se pide y nunca por defecto en precios2015.bin, que es la serie
+# canónica que mantiene el pipeline diario (otro texto de entrada la sustituiría).
 
+import argparse
 import json
-import re
-from datetime import datetime, timedelta
+from datetime import date
+from pathlib import Path
+
+import conversion_incremental
+import escritura
+import remuestreo
+import serie_binaria
+import serie_rle
+from parser_historico import parsear_archivo, series_por_clave
 
 INPUT_FILE = "precios 2015.txt"
 OUTPUT_FILE = "precio-aceite-historico.json"
 
-# Estructura base
-data = {
-    "Aceite de oliva virgen extra": [],
-    "Aceite de oliva virgen": [],
-    "Aceite de oliva lampante": []
-}
-
-regex_fecha = re.compile(r"(\d{2}-\d{2}-\d{4})")  # dd-mm-aaaa
-regex_precio = re.compile(r"([0-9]+,[0-9]+)")     # 3,25
-
-def normaliza_precio(txt):
-    return float(txt.replace(",", "."))
-
-def categoria_de_linea(line):
-    l = line.lower()
-    if "virgen extra" in l:
-        return "Aceite de oliva virgen extra"
-    if re.search(r"\bvirgen\b(?!\s*extra)", l):  # virgen pero NO "virgen extra"
-        return "Aceite de oliva virgen"
-    if "lampante" in l:
-        return "Aceite de oliva lampante"
-    return None
-
-# Leer archivo
-with open(INPUT_FILE, "r", encoding="utf-8") as f:
-    lines = f.readlines()
-
-fecha_actual_iso = None
-
-for raw in lines:
-    line = raw.strip()
-
-    m_fecha = regex_fecha.search(line)
-    if m_fecha:
-        dd, mm, yyyy = m_fecha.group(1).split("-")
-        try:
-            fecha_actual_iso = datetime(int(yyyy), int(mm), int(dd)).strftime("%Y-%m-%d")
-        except ValueError:
-            fecha_actual_iso = None
-        continue
-
-    if fecha_actual_iso:
-        cat = categoria_de_linea(line)
-        m_precio = regex_precio.search(line)
-        if cat and m_precio:
-            precio = normaliza_precio(m_precio.group(1))
-            data[cat].append({"fecha": fecha_actual_iso, "precio_eur_kg": precio})
-
-# Ordenar y completar fechas faltantes
-for cat in data:
-    data[cat].sort(key=lambda d: d["fecha"])
-    completos = []
-    if data[cat]:
-        start_date = datetime.strptime(data[cat][0]["fecha"], "%Y-%m-%d")
-        end_date = datetime.today()
-        i = 0
-        last_precio = data[cat][0]["precio_eur_kg"]
-
-        current_date = start_date
-        while current_date <= end_date:
-            fecha_iso = current_date.strftime("%Y-%m-%d")
-            if i < len(data[cat]) and data[cat][i]["fecha"] == fecha_iso:
-                last_precio = data[cat][i]["precio_eur_kg"]
-                completos.append(data[cat][i])
-                i += 1
-            else:
-                completos.append({"fecha": fecha_iso, "precio_eur_kg": last_precio})
-            current_date += timedelta(days=1)
-        data[cat] = completos
-
-# Guardar JSON
-with open(OUTPUT_FILE, "w", encoding="utf-8") as out:
-    json.dump(data, out, ensure_ascii=False, indent=2)
-
-print(f"✅ Generado {OUTPUT_FILE} con datos diarios completos hasta hoy.")
+
+def completar(lista):
+    """Ordena y completa fechas faltantes hasta hoy con el último precio."""
+    return remuestreo.rellenar_serie(sorted(lista, key=lambda d: d["fecha"]), hasta=date.today())
+
+
+def exportar_binario(data, bin_file, desde=None):
+    """
+    Serie binaria desde {clave: [{fecha, precio_eur_kg}]}. Con `desde` (conversión
+    incremental), `data` solo trae los días >= desde y se sustituye la cola de `bin_file`.
+    """
+    por_fecha = {}
+    for cat, lista in data.items():
+        for d in lista:
+            por_fecha.setdefault(date.fromisoformat(d["fecha"]), {})[cat] = d["precio_eur_kg"]
+    if desde is not None and Path(bin_file).exists():
+        escritura.escribir(bin_file, serie_binaria.con_cola(bin_file, date.fromisoformat(desde), por_fecha))
+    else:
+        serie_binaria.escribir_por_fecha(bin_file, por_fecha)
+    print(f"✅ Serie binaria generada: {bin_file}")
+
+
+def exportar_rle(data, rle_file=serie_rle.RLE_FILE):
+    """Serie por tramos desde los cierres reales ({clave: [{fecha, precio_eur_kg}]} sin rellenar)."""
+    n = serie_rle.escribir(rle_file, serie_rle.desde_series(data, hasta=date.today()))
+    print(f"✅ Serie por tramos generada: {rle_file} ({n} bytes)")
+
+
+def main(input_file=INPUT_FILE, output_file=OUTPUT_FILE, incremental=False, rle_file=None, bin_file=None):
+    if incremental and rle_file:
+        print("ℹ️ La serie por tramos necesita los cierres reales: se hace la conversión completa.")
+        incremental = False
+    if incremental:
+        # Solo se parsea la cola nueva del texto (o todo si el checkpoint no cuadra)
+        exportar = (lambda d, desde: exportar_binario(d, bin_file, desde)) if bin_file else None
+        modo = conversion_incremental.convertir(input_file, output_file, completar,
+                                                exportar=exportar, exportado=bin_file)
+        print(f"✅ Generado {output_file} (conversión {modo}) con datos diarios completos hasta hoy.")
+        return
+
+    data = series_por_clave(parsear_archivo(input_file))
+    if rle_file:
+        exportar_rle(data, rle_file)
+    for cat in data:
+        data[cat] = completar(data[cat])
+
+    # Guardar JSON
+    with escritura.abrir(output_file) as out:
+        json.dump(data, out, ensure_ascii=False, indent=2)
+    print(f"✅ Generado {output_file} con datos diarios completos hasta hoy.")
+
+    # Exportar también la serie columnar binaria (si se pide)
+    if bin_file:
+        exportar_binario(data, bin_file)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Convierte el histórico en texto a JSON diario completo.")
+    ap.add_argument("input_file", nargs="?", default=INPUT_FILE)
+    ap.add_argument("output_file", nargs="?", default=OUTPUT_FILE)
+    ap.add_argument("--incremental", action="store_true",
+                    help="Procesar solo lo añadido desde la última conversión (checkpoint)")
+    ap.add_argument("--rle", nargs="?", const=str(serie_rle.RLE_FILE), metavar="FICHERO",
+                    help="Escribir también la serie por tramos (solo cambios de precio, observado/rellenado)")
+    ap.add_argument("--bin", metavar="FICHERO", help="Escribir también la serie columnar binaria en FICHERO")
+    args = ap.parse_args()
+    main(args.input_file, args.output_file, args.incremental, args.rle, args.bin)
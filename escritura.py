@@ -0,0 +1,268 @@
+# escritura.py
+# Capa de escritura común para los ficheros de datos (precio-aceite.json, histórico,
+# precios2015.txt/.bin, agregados...), pensada para que dos procesos sobre el mismo
+# directorio (un cron y un workflow_dispatch, un scraper y un backfill) no se pisen
+# y para que un proceso matado a mitad no deje ficheros a medias.
+#
+#   escribir(path, contenido)      atómica: temporal en el mismo directorio + fsync +
+#                                  rename + fsync del directorio; nunca se ve a medias
+#   abrir(path)                    lo mismo como fichero (escritores en streaming)
+#   anexar(path, contenido)        append + fsync
+#   bloqueo()                      cerrojo consultivo (flock) sobre .datos.lock; es
+#                                  reentrante dentro del proceso y, al entrar, rehace
+#                                  lo que haya quedado en el diario
+#   transaccion()                  varias escrituras/añadidos que se aplican todos o
+#                                  ninguno, con diario de escritura anticipada
+#
+# Diario (.escrituras.journal, JSON-lines): primero se dejan los contenidos nuevos en
+# temporales con fsync y se anota cada operación; después una línea {"confirmada": true}
+# y solo entonces se aplican (renames y añadidos). Si el proceso muere antes de
+# confirmar, la recuperación descarta los temporales; si muere después, la
+# recuperación vuelve a aplicarlo todo (los añadidos se rehacen truncando al tamaño
+# anotado, así que repetirlos no duplica nada). Si un fichero con añadidos es más corto
+# que el tamaño anotado, alguien lo ha cambiado después: no se rehace nada (truncar
+# lo rellenaría con ceros), se deja el diario y la recuperación falla con ValueError.
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin flock, el cerrojo solo protege dentro del proceso
+    fcntl = None
+
+LOCK_FILE = Path(".datos.lock")
+JOURNAL_FILE = Path(".escrituras.journal")
+
+_cerrojo_local = threading.RLock()
+_tenidos = {}  # path del cerrojo → [fichero, profundidad]
+
+
+def _fsync_directorio(path: Path):
+    if os.name != "posix":
+        return
+    fd = os.open(path.parent if str(path.parent) else ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _temporal(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def _a_bytes(contenido, encoding: str = "utf-8") -> bytes:
+    return contenido if isinstance(contenido, bytes) else contenido.encode(encoding)
+
+
+def _volcar(path: Path, datos: bytes):
+    with path.open("wb") as f:
+        f.write(datos)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def escribir(path, contenido, encoding: str = "utf-8") -> int:
+    """Sustituye `path` de forma atómica. Devuelve los bytes escritos."""
+    path = Path(path)
+    datos = _a_bytes(contenido, encoding)
+    tmp = _temporal(path)
+    try:
+        _volcar(tmp, datos)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    _fsync_directorio(path)
+    return len(datos)
+
+
+def escribir_json(path, data, **opciones) -> int:
+    """JSON atómico; por defecto como _write_json del scraper (indent=2, sin escapar acentos)."""
+    opciones.setdefault("ensure_ascii", False)
+    if "separators" not in opciones:
+        opciones.setdefault("indent", 2)
+    return escribir(path, json.dumps(data, **opciones))
+
+
+@contextmanager
+def abrir(path, modo: str = "w", encoding: str = "utf-8", newline: str = None):
+    """Fichero temporal que sustituye a `path` al cerrarse sin error (y se descarta si falla)."""
+    path = Path(path)
+    tmp = _temporal(path)
+    binario = "b" in modo
+    f = tmp.open(modo, **({} if binario else {"encoding": encoding, "newline": newline}))
+    try:
+        yield f
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        os.replace(tmp, path)
+        _fsync_directorio(path)
+    finally:
+        f.close()
+        tmp.unlink(missing_ok=True)
+
+
+def anexar(path, contenido, encoding: str = "utf-8") -> int:
+    """Añade al final de `path` y hace fsync. Devuelve los bytes escritos."""
+    datos = _a_bytes(contenido, encoding)
+    with Path(path).open("ab") as f:
+        f.write(datos)
+        f.flush()
+        os.fsync(f.fileno())
+    return len(datos)
+
+
+# ---------- cerrojo ----------
+
+@contextmanager
+def bloqueo(path=LOCK_FILE, diario=JOURNAL_FILE):
+    """
+    Cerrojo exclusivo (consultivo) del directorio de datos. Espera si otro proceso lo
+    tiene. Reentrante en el mismo proceso. Al tomarlo se recupera el diario pendiente.
+    """
+    clave = str(Path(path).resolve())
+    with _cerrojo_local:
+        tenido = _tenidos.get(clave)
+        if tenido is None:
+            f = open(path, "a+b")
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                recuperar(diario)
+            except BaseException:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                f.close()
+                raise
+            tenido = _tenidos[clave] = [f, 0]
+        tenido[1] += 1
+        try:
+            yield
+        finally:
+            tenido[1] -= 1
+            if tenido[1] == 0:
+                del _tenidos[clave]
+                if fcntl is not None:
+                    fcntl.flock(tenido[0].fileno(), fcntl.LOCK_UN)
+                tenido[0].close()
+
+
+# ---------- diario ----------
+
+def _comprobar(op: dict):
+    """ValueError si un añadido no se puede rehacer: el fichero es más corto que antes de añadir."""
+    if op["op"] != "anexar":
+        return
+    destino = Path(op["destino"])
+    tamano = destino.stat().st_size if destino.exists() else 0
+    if tamano < op["tamano"]:
+        raise ValueError(f"{destino} tiene {tamano} bytes y el diario esperaba al menos {op['tamano']}: "
+                         "no se rehace la transacción")
+
+
+def _aplicar(op: dict):
+    _comprobar(op)
+    if op["op"] == "escribir":
+        tmp, destino = Path(op["temporal"]), Path(op["destino"])
+        if tmp.exists():
+            os.replace(tmp, destino)
+            _fsync_directorio(destino)
+    else:  # anexar: idempotente, se trunca al tamaño previo antes de añadir
+        destino = Path(op["destino"])
+        with destino.open("ab") as f:
+            f.truncate(op["tamano"])
+            f.write(bytes.fromhex(op["datos"]))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def recuperar(diario=JOURNAL_FILE) -> int:
+    """Rehace (si estaba confirmada) o descarta (si no) la transacción del diario. Devuelve nº de operaciones rehechas."""
+    diario = Path(diario)
+    if not diario.exists():
+        return 0
+    ops, confirmada = [], False
+    for linea in diario.read_text(encoding="utf-8").splitlines():
+        try:
+            registro = json.loads(linea)
+        except ValueError:
+            break  # línea cortada: no llegó a confirmarse
+        if registro.get("confirmada"):
+            confirmada = True
+        else:
+            ops.append(registro)
+    if confirmada:
+        # antes de tocar nada (o se rehace todo o nada); de los añadidos a un mismo
+        # fichero basta el primero: los siguientes cuentan con lo que añade ese
+        primeros = {}
+        for op in ops:
+            if op["op"] == "anexar":
+                primeros.setdefault(op["destino"], op)
+        for op in primeros.values():
+            _comprobar(op)
+        for op in ops:
+            _aplicar(op)
+        print(f"🩹 Diario de escritura: {len(ops)} operación(es) rehechas tras una interrupción.")
+    else:
+        for op in ops:
+            if op["op"] == "escribir":
+                Path(op["temporal"]).unlink(missing_ok=True)
+    diario.unlink()
+    _fsync_directorio(diario)
+    return len(ops) if confirmada else 0
+
+
+class Transaccion:
+    def __init__(self, diario=JOURNAL_FILE):
+        self.diario = Path(diario)
+        self.ops = []
+
+    def escribir(self, path, contenido, encoding: str = "utf-8"):
+        path = Path(path)
+        tmp = path.with_name(f".{path.name}.diario.tmp")
+        _volcar(tmp, _a_bytes(contenido, encoding))
+        self.ops.append({"op": "escribir", "destino": str(path), "temporal": str(tmp)})
+
+    def anexar(self, path, contenido, encoding: str = "utf-8"):
+        path = Path(path)
+        previas = [op for op in self.ops if op["op"] == "anexar" and op["destino"] == str(path)]
+        if previas:
+            tamano = previas[-1]["tamano"] + len(previas[-1]["datos"]) // 2
+        else:
+            tamano = path.stat().st_size if path.exists() else 0
+        self.ops.append({"op": "anexar", "destino": str(path), "tamano": tamano,
+                         "datos": _a_bytes(contenido, encoding).hex()})
+
+    def _confirmar(self):
+        if not self.ops:
+            return
+        lineas = [json.dumps(op) for op in self.ops] + [json.dumps({"confirmada": True})]
+        _volcar(self.diario, ("\n".join(lineas) + "\n").encode("utf-8"))
+        _fsync_directorio(self.diario)
+        for op in self.ops:
+            _aplicar(op)
+        self.diario.unlink()
+        _fsync_directorio(self.diario)
+
+    def _descartar(self):
+        for op in self.ops:
+            if op["op"] == "escribir":
+                Path(op["temporal"]).unlink(missing_ok=True)
+
+
+@contextmanager
+def transaccion(diario=JOURNAL_FILE, lock=LOCK_FILE):
+    """Escrituras y añadidos que se aplican todos juntos al salir sin error (bajo el cerrojo)."""
+    with bloqueo(lock, diario):
+        t = Transaccion(diario)
+        try:
+            yield t
+        except BaseException:
+            t._descartar()
+            raise
+        t._confirmar()
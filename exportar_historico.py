@@ -0,0 +1,97 @@
+# exportar_historico.py
+# Exporta el histórico diario en ficheros inmutables por año, con el hash del
+# contenido en el nombre, para que la CDN y el navegador los guarden para siempre:
+#
+#   historico/2015.3f2a9c1e.json      (+ .json.gz y .json.br)
+#   ...
+#   historico-manifest.json           único fichero que cambia a diario
+#
+# Cada año: {"anio": 2025, "fechas": ["2025-01-01", ...], "series": {tipo: [precio | null]}}
+# JSON compacto. Un año cerrado no vuelve a cambiar de hash; una actualización diaria
+# solo genera un fichero nuevo para el año en curso y reescribe el manifiesto.
+# El .br se genera si el paquete `brotli` está instalado.
+
+import gzip
+import hashlib
+import json
+from pathlib import Path
+
+import escritura
+from historico_store import HIST_KEYS, HistoricoStore
+from serie_binaria import BIN_FILE, cargar_serie
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional
+    brotli = None
+
+HISTORICO_DIR = Path("historico")
+MANIFEST_FILE = Path("historico-manifest.json")
+_LONGITUD_HASH = 10
+
+
+def _json_compacto(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _por_anio(fechas, cols):
+    """Agrupa la serie por año: {anio: (fechas_iso, {tipo: [..]})} en una pasada."""
+    anios = {}
+    for i, d in enumerate(fechas):
+        fs, cs = anios.setdefault(d.year, ([], {k: [] for k in HIST_KEYS}))
+        fs.append(d.isoformat())
+        for k in HIST_KEYS:
+            cs[k].append(cols[k][i])
+    return anios
+
+
+def _escribir_si_no_existe(path: Path, contenido: bytes) -> bool:
+    if path.exists():
+        return False
+    escritura.escribir(path, contenido)
+    return True
+
+
+def _escribir_anio(directorio: Path, anio: int, contenido: bytes):
+    """Escribe YYYY.<hash>.json y sus versiones comprimidas; borra versiones antiguas del año."""
+    digest = hashlib.sha256(contenido).hexdigest()[:_LONGITUD_HASH]
+    nombre = f"{anio}.{digest}.json"
+    nuevo = _escribir_si_no_existe(directorio / nombre, contenido)
+    # mtime=0 → .gz reproducible: mismo contenido, mismos bytes
+    _escribir_si_no_existe(directorio / (nombre + ".gz"), gzip.compress(contenido, 9, mtime=0))
+    if brotli is not None:
+        _escribir_si_no_existe(directorio / (nombre + ".br"), brotli.compress(contenido))
+
+    for viejo in directorio.glob(f"{anio}.*.json*"):
+        if not viejo.name.startswith(nombre):
+            viejo.unlink()
+    return nombre, nuevo
+
+
+def exportar(directorio=HISTORICO_DIR, manifest=MANIFEST_FILE, bin_path=BIN_FILE,
+             store: HistoricoStore = None, serie=None) -> dict:
+    """Genera los ficheros por año que falten y el manifiesto (`serie`: (fechas, cols) ya cargada). Devuelve el manifiesto."""
+    directorio, manifest = Path(directorio), Path(manifest)
+    directorio.mkdir(parents=True, exist_ok=True)
+    fechas, cols = serie or cargar_serie(bin_path, store)
+
+    anios = {}
+    cambiados = []
+    for anio, (fs, cs) in sorted(_por_anio(fechas, cols).items()):
+        contenido = _json_compacto({"anio": anio, "fechas": fs, "series": cs})
+        nombre, nuevo = _escribir_anio(directorio, anio, contenido)
+        anios[str(anio)] = {"archivo": f"{directorio.as_posix()}/{nombre}", "dias": len(fs),
+                            "desde": fs[0], "hasta": fs[-1]}
+        if nuevo:
+            cambiados.append(anio)
+
+    data = {"tipos": HIST_KEYS, "anios": anios}
+    escritura.escribir(manifest, _json_compacto(data))
+    data["cambiados"] = cambiados
+    return data
+
+
+if __name__ == "__main__":
+    m = exportar(store=HistoricoStore())
+    print(f"✅ {len(m['anios'])} años en {HISTORICO_DIR}/ ({len(m['cambiados'])} nuevos o cambiados); "
+          f"manifiesto: {MANIFEST_FILE}")
@@ -0,0 +1,203 @@
+# fuentes.py
+# Adaptadores de fuentes de precios para el scraper.
+#
+# Cada fuente define:
+#   - id, nombre y URL;
+#   - cómo localizar su tabla en el snapshot de la página (el mismo snapshot sale
+#     del HTML estático o de Playwright: {"tablas": [...], "candidatos": [...]});
+#   - qué columnas son tipo / variedad / precio;
+#   - cómo llevar cada fila a un tipo canónico del histórico (HIST_KEYS);
+#   - su timeout por intento y su número de reintentos.
+#
+# La fuente "principal" (Infaoliva) es la que alimenta el histórico y los campos de
+# nivel superior de precio-aceite.json. Las demás se describen en un JSON
+# (scraper.py --fuentes fuentes.json), una lista de objetos como:
+#
+#   {"id": "mercado-x", "nombre": "Mercado X", "url": "https://...",
+#    "cabeceras": ["tipo", "precio"],          palabras que deben estar en los <th>
+#    "encabezado": ["precios", "aceite"],      o en el título previo a la tabla
+#    "columnas": {"tipo": 0, "variedad": 1, "precio": 2},
+#    "mapeo": {"AOVE": "Aceite de oliva virgen extra"},
+#    "timeout": 10, "reintentos": 1, "navegador": false}
+
+import json
+import re
+from pathlib import Path
+
+import metricas
+from historico_store import HIST_KEYS
+
+HTTP_TIMEOUT = 15  # segundos por intento
+TIMEOUT_NAVEGADOR = 45  # segundos por intento (arranque compartido aparte)
+REINTENTOS = 2
+
+OBSERVATORIO_KEYS = ("observatorio", "precios", "aceite")
+
+
+def a_float_eur(texto: str) -> float:
+    """
+    Convierte '3.600 €' / '3,600 €' / '3.6' a float.
+    Mantiene '.' como decimal y cambia ',' a '.'
+    """
+    m = re.search(r"\d+(?:[.,]\d+)?", texto)
+    if not m:
+        raise ValueError(f"No se encontró número en: {texto!r}")
+    n = m.group(0).replace(",", ".")
+    return float(n)
+
+
+def tabla_con_cabeceras(snapshot, palabras):
+    """Primera tabla cuyas cabeceras (<th>) contienen todas las `palabras`."""
+    for tabla in snapshot.get("tablas", []):
+        th_text = " ".join(t.lower().strip() for t in tabla.get("cabeceras", []))
+        if th_text and all(p in th_text for p in palabras):
+            return tabla
+    return None
+
+
+def tabla_despues_de_encabezado(snapshot, palabras):
+    """Tabla que sigue al primer encabezado candidato que contiene todas las `palabras`."""
+    tablas = snapshot.get("tablas", [])
+    for cand in snapshot.get("candidatos", []):
+        txt = (cand.get("texto") or "").strip().lower()
+        if all(k in txt for k in palabras):
+            idx = cand.get("tabla", -1)
+            if 0 <= idx < len(tablas):
+                return tablas[idx]
+    return None
+
+
+def tiene_filas_de_datos(tabla, columnas_min: int = 3) -> bool:
+    return any(len(celdas) >= columnas_min for celdas in tabla.get("filas", [])[1:])
+
+
+def clave_canonica(tipo: str, mapeo: dict = None):
+    """
+    Tipo de la fila → clave de HIST_KEYS (o None). Primero el mapeo propio de la
+    fuente, luego coincidencia exacta y por último la clave canónica más larga
+    contenida en el texto ("virgen extra" antes que "virgen").
+    """
+    t = " ".join(tipo.split()).lower()
+    for texto, clave in (mapeo or {}).items():
+        if texto.lower() == t:
+            return clave
+    for k in HIST_KEYS:
+        if k.lower() == t:
+            return k
+    contenidas = [k for k in HIST_KEYS if k.lower() in t]
+    return max(contenidas, key=len) if contenidas else None
+
+
+class Fuente:
+    """Fuente con una tabla tipo / variedad / precio. Las subclases cambian cómo localizarla."""
+
+    id = ""
+    nombre = ""
+    url = ""
+    principal = False
+    navegador = True  # si el HTML estático no trae la tabla, probar con Playwright
+    timeout = HTTP_TIMEOUT
+    timeout_navegador = TIMEOUT_NAVEGADOR
+    reintentos = REINTENTOS
+    columnas = {"tipo": 0, "variedad": 1, "precio": 2}
+    mapeo = {}
+
+    def __init__(self, **opciones):
+        for nombre, valor in opciones.items():
+            if not hasattr(self, nombre):
+                raise ValueError(f"Opción de fuente desconocida: {nombre!r}")
+            setattr(self, nombre, valor)
+
+    def __repr__(self):
+        return f"<Fuente {self.id} {self.url}>"
+
+    def localizar_tabla(self, snapshot):
+        raise NotImplementedError
+
+    def tabla_valida(self, tabla) -> bool:
+        return tabla is not None and tiene_filas_de_datos(tabla, max(self.columnas.values()) + 1)
+
+    def filas(self, tabla):
+        """
+        Recorre las filas de datos de la tabla (ya extraída) y devuelve (filas, sin_cierre),
+        filas = [{"tipo", "variedad", "clave", "precio_eur_kg"}].
+        """
+        filas = []
+        sin_cierre = False
+
+        datos = tabla.get("filas", [])
+        if len(datos) <= 1:
+            # solo cabecera => no hay datos
+            print(f"ℹ️ [{self.id}] Tabla sin filas de datos (posible día sin cierre).")
+            return filas, True
+
+        metricas.actual.contar(f"{self.id}.filas_recorridas", len(datos) - 1)
+        c_tipo, c_var, c_precio = (self.columnas.get(c) for c in ("tipo", "variedad", "precio"))
+        ancho = max(self.columnas.values()) + 1
+        for celdas in datos[1:]:  # saltar cabecera
+            if len(celdas) < ancho:
+                continue
+
+            tipo = celdas[c_tipo].strip()
+            variedad = celdas[c_var].strip() if c_var is not None else ""
+            precio_txt = celdas[c_precio].strip()
+
+            # Detectar “sin cierre de operaciones”
+            if "sin cierre" in precio_txt.lower():
+                sin_cierre = True
+                continue
+
+            try:
+                precio = a_float_eur(precio_txt)
+            except ValueError:
+                # celdas con guiones o texto no numérico
+                continue
+
+            if tipo:
+                filas.append({"tipo": tipo, "variedad": variedad,
+                              "clave": clave_canonica(tipo, self.mapeo), "precio_eur_kg": precio})
+
+        return filas, sin_cierre
+
+
+class Infaoliva(Fuente):
+    id = "infaoliva"
+    nombre = "Infaoliva"
+    url = "https://www.infaoliva.com/"
+    principal = True
+
+    def localizar_tabla(self, snapshot):
+        # cabeceras tipo/variedad/precio; si no, la tabla tras "Observatorio de precios del aceite"
+        tabla = tabla_con_cabeceras(snapshot, ("tipo", "variedad", "precio"))
+        if tabla is None:
+            tabla = tabla_despues_de_encabezado(snapshot, OBSERVATORIO_KEYS)
+            metricas.actual.marcar(f"{self.id}.tabla_por_encabezado", tabla is not None)
+        return tabla
+
+
+class FuenteTabla(Fuente):
+    """Fuente genérica descrita por configuración (cabeceras y/o encabezado previo)."""
+
+    cabeceras = ()
+    encabezado = ()
+
+    def localizar_tabla(self, snapshot):
+        tabla = None
+        if self.cabeceras:
+            tabla = tabla_con_cabeceras(snapshot, [p.lower() for p in self.cabeceras])
+        if tabla is None and self.encabezado:
+            tabla = tabla_despues_de_encabezado(snapshot, [p.lower() for p in self.encabezado])
+        return tabla
+
+
+def cargar_fuentes(config: Path = None, url: str = None):
+    """Infaoliva (con `url` si se indica) más las fuentes declaradas en el JSON `config`."""
+    fuentes = [Infaoliva(url=url) if url else Infaoliva()]
+    if config:
+        for opciones in json.loads(Path(config).read_text(encoding="utf-8")):
+            fuentes.append(FuenteTabla(**opciones))
+    ids = [f.id for f in fuentes]
+    repetidos = {i for i in ids if ids.count(i) > 1}
+    if repetidos or not all(ids):
+        raise ValueError(f"Ids de fuente vacíos o repetidos: {sorted(repetidos) or ids}")
+    return fuentes
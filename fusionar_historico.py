@@ -1,98 +1,73 @@
 # fusionar_historico.py
 # Convierte "precios 2015.txt" en un JSON histórico completo (2015 → hoy)
 # Rellena días faltantes con el precio del día anterior.
+# Admite varios ficheros de entrada (cualquier formato de parser_historico):
+# se leen en una sola pasada lineal y, para una misma fecha, manda el último.
+# Con --rle escribe también la serie por tramos (serie_rle.py) y con --bin la serie
+# columnar binaria (nunca por defecto: precios2015.bin es la serie canónica del pipeline).
 
+import argparse
 import json
-import re
-from datetime import datetime, timedelta
+from datetime import date
+from itertools import chain
+
+import conversion_incremental
+import escritura
+import remuestreo
+import serie_rle
+from convertir_historico_completo import exportar_binario, exportar_rle
+from parser_historico import parsear_archivo, series_por_clave
 
 INPUT_FILE = "precios 2015.txt"
 OUTPUT_FILE = "precio-aceite-historico.json"
 
-# Estructura base
-data = {
-    "Aceite de oliva virgen extra": [],
-    "Aceite de oliva virgen": [],
-    "Aceite de oliva lampante": []
-}
-
-# Regex
-regex_fecha = re.compile(r"(\d{2}-\d{2}-\d{4})")           # dd-mm-aaaa
-regex_precio = re.compile(r"([0-9]+,[0-9]+)")              # 3,25 por ejemplo
-
-def normaliza_precio(txt):
-    return float(txt.replace(",", "."))
-
-def categoria_de_linea(line):
-    l = line.lower()
-    if "virgen extra" in l:
-        return "Aceite de oliva virgen extra"
-    if re.search(r"\bvirgen\b(?!\s*extra)", l):
-        return "Aceite de oliva virgen"
-    if "lampante" in l:
-        return "Aceite de oliva lampante"
-    return None
-
-# Leer archivo TXT
-with open(INPUT_FILE, "r", encoding="utf-8") as f:
-    lines = f.readlines()
-
-fecha_actual = None
-pendiente = {k: None for k in data}
-
-for raw in lines:
-    line = raw.strip()
-
-    m_fecha = regex_fecha.search(line)
-    if m_fecha:
-        dd, mm, yyyy = m_fecha.group(1).split("-")
-        try:
-            fecha_actual = datetime(int(yyyy), int(mm), int(dd))
-        except ValueError:
-            fecha_actual = None
-        pendiente = {k: None for k in pendiente}
-        continue
-
-    if fecha_actual:
-        cat = categoria_de_linea(line)
-        m_precio = regex_precio.search(line)
-        if cat and m_precio:
-            precio = normaliza_precio(m_precio.group(1))
-            pendiente[cat] = precio
-            data[cat].append({"fecha": fecha_actual.strftime("%Y-%m-%d"),
-                              "precio_eur_kg": precio})
-
-# Ordenar por fecha
-for cat in data:
-    data[cat].sort(key=lambda d: d["fecha"])
 
 # --- Rellenar días faltantes ---
-def rellenar_faltantes(lista):
-    if not lista:
-        return lista
-    fechas = {datetime.strptime(d["fecha"], "%Y-%m-%d"): d["precio_eur_kg"] for d in lista}
-    fecha_inicio = min(fechas.keys())
-    fecha_fin = datetime.today()
-
-    completa = []
-    precio_anterior = None
-    fecha = fecha_inicio
-    while fecha <= fecha_fin:
-        if fecha in fechas:
-            precio_anterior = fechas[fecha]
-        if precio_anterior is not None:
-            completa.append({
-                "fecha": fecha.strftime("%Y-%m-%d"),
-                "precio_eur_kg": precio_anterior
-            })
-        fecha += timedelta(days=1)
-    return completa
-
-for cat in data:
-    data[cat] = rellenar_faltantes(data[cat])
-
-# Guardar JSON final
-with open(OUTPUT_FILE, "w", encoding="utf-8") as out:
-    json.dump(data, out, ensure_ascii=False, indent=2)
-
-print(f"✅ Generado {OUTPUT_FILE} con histórico desde 2015 hasta hoy.")
+def rellenar_faltantes(lista, politica=remuestreo.FFILL):
+    return remuestreo.rellenar_serie(sorted(lista, key=lambda d: d["fecha"]),
+                                     hasta=date.today(), politica=politica)
+
+
+def main(input_files=(INPUT_FILE,), output_file=OUTPUT_FILE, incremental=False, rle_file=None, bin_file=None):
+    if incremental and rle_file:
+        print("ℹ️ La serie por tramos necesita los cierres reales: se hace la fusión completa.")
+        incremental = False
+    if incremental and len(input_files) == 1:
+        # Solo se parsea la cola nueva del texto (o todo si el checkpoint no cuadra)
+        exportar = (lambda d, desde: exportar_binario(d, bin_file, desde)) if bin_file else None
+        modo = conversion_incremental.convertir(input_files[0], output_file, rellenar_faltantes,
+                                                exportar=exportar, exportado=bin_file)
+        print(f"✅ Generado {output_file} (conversión {modo}) con histórico desde 2015 hasta hoy.")
+        return
+    if incremental:
+        print("ℹ️ El modo incremental admite un único fichero de entrada; se hace la fusión completa.")
+
+    eventos = chain.from_iterable(parsear_archivo(f) for f in input_files)
+    data = series_por_clave(eventos)
+    if rle_file:
+        exportar_rle(data, rle_file)
+
+    for cat in data:
+        data[cat] = rellenar_faltantes(data[cat])
+
+    # Guardar JSON final
+    with escritura.abrir(output_file) as out:
+        json.dump(data, out, ensure_ascii=False, indent=2)
+    print(f"✅ Generado {output_file} con histórico desde 2015 hasta hoy.")
+
+    # Exportar también la serie columnar binaria (si se pide)
+    if bin_file:
+        exportar_binario(data, bin_file)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Fusiona uno o varios históricos en texto en un JSON diario.")
+    ap.add_argument("input_files", nargs="*", default=[INPUT_FILE])
+    ap.add_argument("-o", "--output", default=OUTPUT_FILE)
+    ap.add_argument("--incremental", action="store_true",
+                    help="Procesar solo lo añadido desde la última conversión (un único fichero)")
+    ap.add_argument("--rle", nargs="?", const=str(serie_rle.RLE_FILE), metavar="FICHERO",
+                    help="Escribir también la serie por tramos (solo cambios de precio, observado/rellenado)")
+    ap.add_argument("--bin", metavar="FICHERO", help="Escribir también la serie columnar binaria en FICHERO")
+    args = ap.parse_args()
+    main(args.input_files, args.output, args.incremental, args.rle, args.bin)
@@ -0,0 +1,273 @@
+# historico_store.py
+# Almacén del histórico de precios con coste constante por ejecución.
+#
+# Formato en disco (texto, registros de ancho fijo, una línea por fecha):
+#   2025-10-28;  4.100;  3.650;  3.500
+# Columnas: fecha ISO y un precio por cada clave de HIST_KEYS ("       " = sin dato).
+#
+#  - precio-aceite-historico.dat  base compacta, ordenada por fecha.
+#  - precio-aceite-historico.log  registros nuevos añadidos en modo append.
+#
+# Al ser de ancho fijo, la base se consulta por posición: si los días son
+# consecutivos, el registro de una fecha está en (ordinal - ordinal0) * ANCHO;
+# si hay huecos se recurre a búsqueda binaria con seek. El log es pequeño
+# (se compacta cada COMPACTAR_CADA registros) y se indexa en un dict.
+# Compactar un log que va entero detrás de la base (lo normal: un día nuevo por
+# ejecución) solo añade sus registros al final de la base; la base se reescribe
+# entera únicamente si algún día del log cae dentro de su rango (backfill).
+# El JSON que consume la web se genera a partir de la cola de la base + log.
+
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import escritura
+
+# Claves canónicas para el histórico
+HIST_KEYS = [
+    "Aceite de oliva virgen extra",
+    "Aceite de oliva virgen",
+    "Aceite de oliva lampante",
+]
+
+DAT_FILE = Path("precio-aceite-historico.dat")
+LOG_FILE = Path("precio-aceite-historico.log")
+
+COMPACTAR_CADA = 64
+_ANCHO_PRECIO = 7
+_VACIO = " " * _ANCHO_PRECIO
+ANCHO = 10 + (1 + _ANCHO_PRECIO) * len(HIST_KEYS) + 1  # incluye "\n"
+
+
+def _formatear(fecha_iso: str, valores) -> str:
+    celdas = [_VACIO if v is None else f"{v:{_ANCHO_PRECIO}.3f}" for v in valores]
+    linea = fecha_iso + ";" + ";".join(celdas) + "\n"
+    if len(linea) != ANCHO:
+        raise ValueError(f"Registro fuera de formato: {linea!r}")
+    return linea
+
+
+def _parsear(linea: str):
+    partes = linea.rstrip("\n").split(";")
+    valores = []
+    for txt in partes[1:1 + len(HIST_KEYS)]:
+        txt = txt.strip()
+        valores.append(float(txt) if txt else None)
+    valores += [None] * (len(HIST_KEYS) - len(valores))
+    return partes[0], valores
+
+
+def _combinar(actual, nuevo):
+    """Mezcla dos filas de valores: los huecos de `actual` se rellenan con `nuevo`."""
+    return [a if a is not None else n for a, n in zip(actual, nuevo)]
+
+
+class HistoricoStore:
+    """Histórico indexado por fecha con escrituras append-only y compactación periódica."""
+
+    def __init__(self, dat_path: Path = DAT_FILE, log_path: Path = LOG_FILE):
+        self.dat_path = Path(dat_path)
+        self.log_path = Path(log_path)
+        self._log = None  # {fecha_iso: [valores]} cargado bajo demanda
+
+    # ---------- lectura de la base (ancho fijo) ----------
+
+    def _n_registros(self) -> int:
+        try:
+            return self.dat_path.stat().st_size // ANCHO
+        except FileNotFoundError:
+            return 0
+
+    def _leer_registro(self, f, i: int):
+        f.seek(i * ANCHO)
+        return _parsear(f.read(ANCHO).decode("ascii"))
+
+    def _posicion(self, f, n: int, fecha_iso: str) -> int:
+        """Primer índice cuyo registro tiene fecha >= fecha_iso (acceso directo o bisección)."""
+        if n == 0:
+            return 0
+        primera, _ = self._leer_registro(f, 0)
+        try:
+            i = (date.fromisoformat(fecha_iso) - date.fromisoformat(primera)).days
+        except ValueError:
+            i = -1
+        if 0 <= i < n and self._leer_registro(f, i)[0] == fecha_iso:
+            return i  # días consecutivos: acceso O(1)
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._leer_registro(f, mid)[0] < fecha_iso:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _buscar_base(self, fecha_iso: str):
+        n = self._n_registros()
+        if n == 0:
+            return None
+        with self.dat_path.open("rb") as f:
+            i = self._posicion(f, n, fecha_iso)
+            if i < n:
+                fecha, valores = self._leer_registro(f, i)
+                if fecha == fecha_iso:
+                    return valores
+        return None
+
+    def _iter_base(self, desde_iso: str = None):
+        n = self._n_registros()
+        if n == 0:
+            return
+        with self.dat_path.open("rb") as f:
+            i = self._posicion(f, n, desde_iso) if desde_iso else 0
+            f.seek(i * ANCHO)
+            for linea in f:
+                yield _parsear(linea.decode("ascii"))
+
+    # ---------- log append-only ----------
+
+    def _indice_log(self) -> dict:
+        if self._log is None:
+            self._log = {}
+            if self.log_path.exists():
+                with self.log_path.open("r", encoding="ascii") as f:
+                    for linea in f:
+                        if linea.endswith("\n") and linea.strip():  # sin "\n": registro cortado
+                            fecha, valores = _parsear(linea)
+                            previo = self._log.get(fecha)
+                            self._log[fecha] = valores if previo is None else _combinar(valores, previo)
+        return self._log
+
+    def _reparar(self, path: Path):
+        """Un registro cortado al final (proceso matado a mitad) se descarta."""
+        try:
+            tam = path.stat().st_size
+        except FileNotFoundError:
+            return
+        if tam % ANCHO:
+            with path.open("r+b") as f:
+                f.truncate(tam - tam % ANCHO)
+            self._log = None
+
+    # ---------- API ----------
+
+    def recargar(self):
+        """Olvida el índice del log en memoria (otro proceso puede haber añadido registros)."""
+        self._log = None
+
+    def valores(self, fecha_iso: str):
+        """Lista de precios (uno por clave de HIST_KEYS, None si falta) o None si la fecha no existe."""
+        base = self._buscar_base(fecha_iso)
+        log = self._indice_log().get(fecha_iso)
+        if base is None:
+            return log
+        return base if log is None else _combinar(log, base)
+
+    def tiene(self, fecha_iso: str, clave: str) -> bool:
+        vals = self.valores(fecha_iso)
+        return vals is not None and vals[HIST_KEYS.index(clave)] is not None
+
+    def _ultima_base(self):
+        n = self._n_registros()
+        if n == 0:
+            return None
+        with self.dat_path.open("rb") as f:
+            return self._leer_registro(f, n - 1)[0]
+
+    def ultima_fecha(self):
+        """Fecha ISO más reciente del almacén (None si está vacío)."""
+        candidatas = list(self._indice_log().keys())
+        base = self._ultima_base()
+        if base is not None:
+            candidatas.append(base)
+        return max(candidatas) if candidatas else None
+
+    def anadir(self, fecha_iso: str, precios: dict) -> bool:
+        """
+        Añade los precios {clave: float} de una fecha escribiendo solo el nuevo
+        registro al log. Ignora las claves que ya existían. Devuelve True si hubo cambios.
+        """
+        actual = self.valores(fecha_iso) or [None] * len(HIST_KEYS)
+        nuevo = [None] * len(HIST_KEYS)
+        for i, k in enumerate(HIST_KEYS):
+            if actual[i] is None and precios.get(k) is not None:
+                nuevo[i] = round(float(precios[k]), 3)
+        if all(v is None for v in nuevo):
+            return False
+
+        self._reparar(self.log_path)
+        escritura.anexar(self.log_path, _formatear(fecha_iso, nuevo), encoding="ascii")
+        log = self._indice_log()
+        log[fecha_iso] = _combinar(log.get(fecha_iso, [None] * len(HIST_KEYS)), nuevo)
+
+        if len(log) >= COMPACTAR_CADA:
+            self.compactar()
+        return True
+
+    def iterar(self, desde_iso: str = None):
+        """Genera (fecha_iso, valores) en orden ascendente, mezclando base y log."""
+        pendientes = sorted((f, v) for f, v in self._indice_log().items()
+                            if desde_iso is None or f >= desde_iso)
+        j = 0
+        for fecha, valores in self._iter_base(desde_iso):
+            while j < len(pendientes) and pendientes[j][0] < fecha:
+                yield pendientes[j]
+                j += 1
+            if j < len(pendientes) and pendientes[j][0] == fecha:
+                valores = _combinar(pendientes[j][1], valores)
+                j += 1
+            yield fecha, valores
+        yield from pendientes[j:]
+
+    def compactar(self):
+        """
+        Fusiona el log en la base. Si todos sus días van detrás del último de la base,
+        se añaden al final (coste proporcional al log); si no, reescritura completa.
+        """
+        log = self._indice_log()
+        self._reparar(self.dat_path)
+        ultima = self._ultima_base()
+        if log and (ultima is None or min(log) > ultima):
+            # si el proceso muere antes de borrar el log, sus días repetidos se
+            # combinan al leer y la siguiente compactación los reescribe
+            escritura.anexar(self.dat_path, "".join(_formatear(f, v) for f, v in sorted(log.items())),
+                             encoding="ascii")
+        elif log or not self.dat_path.exists():
+            with escritura.abrir(self.dat_path, encoding="ascii", newline="\n") as f:
+                for fecha, valores in self.iterar():
+                    f.write(_formatear(fecha, valores))
+        self.log_path.unlink(missing_ok=True)
+        self._log = {}
+
+    def importar_json(self, hist: dict):
+        """Carga un histórico con la forma {clave: [{fecha, precio_eur_kg}]} (migración inicial)."""
+        por_fecha = {}
+        for i, k in enumerate(HIST_KEYS):
+            for item in hist.get(k, []) or []:
+                try:
+                    fecha = date.fromisoformat(item["fecha"]).isoformat()
+                    val = float(item["precio_eur_kg"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                por_fecha.setdefault(fecha, [None] * len(HIST_KEYS))[i] = round(val, 3)
+        log = self._indice_log()
+        for fecha, valores in por_fecha.items():
+            log[fecha] = _combinar(log.get(fecha, [None] * len(HIST_KEYS)), valores)
+        self.compactar()
+
+    def a_json(self, dias: int = None) -> dict:
+        """
+        Genera la estructura que consume la web: {clave: [{fecha, precio_eur_kg}]}.
+        Con `dias`, solo los últimos `dias` días (lectura desde la cola de la base).
+        """
+        desde = None
+        if dias is not None:
+            desde = (datetime.now(timezone.utc).date() - timedelta(days=dias)).isoformat()
+        hist = {k: [] for k in HIST_KEYS}
+        for fecha, valores in self.iterar(desde):
+            for k, v in zip(HIST_KEYS, valores):
+                if v is not None:
+                    hist[k].append({"fecha": fecha, "precio_eur_kg": v})
+        return hist
+
+    def exportar_json(self, path: Path, dias: int = None):
+        escritura.escribir_json(path, self.a_json(dias))
@@ -0,0 +1,67 @@
+# http_local.py
+# Servidor HTTP mínimo (asyncio, solo GET/HEAD, una petición por conexión) para
+# los servicios locales de solo lectura: el demonio del scraper y la consulta de
+# precios. No pretende ser un servidor web: se escucha en 127.0.0.1 por defecto.
+#
+# Rutas: {"/ruta": fn(parametros) -> (estado, cuerpo_bytes, cabeceras)}, con
+# parametros = {nombre: valor} de la query string (último valor si se repite).
+
+import asyncio
+import json
+import urllib.parse
+
+MOTIVOS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 500: "Internal Server Error", 503: "Service Unavailable"}
+_MAX_CABECERAS = 100
+
+
+def respuesta_json(data, estado: int = 200, cabeceras: dict = None):
+    cuerpo = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return estado, cuerpo, {"Content-Type": "application/json; charset=utf-8", **(cabeceras or {})}
+
+
+def error_json(estado: int, mensaje: str):
+    return respuesta_json({"error": mensaje}, estado)
+
+
+async def _atender(reader, writer, rutas):
+    metodo = "GET"
+    try:
+        try:
+            linea = await reader.readline()
+            metodo, objetivo, _ = linea.decode("latin-1").split(" ", 2)
+            for _ in range(_MAX_CABECERAS):
+                if (await reader.readline()) in (b"\r\n", b"\n", b""):
+                    break
+        except ValueError:
+            estado, cuerpo, cabeceras = error_json(400, "petición mal formada")
+        else:
+            url = urllib.parse.urlsplit(objetivo)
+            fn = rutas.get(url.path)
+            if metodo not in ("GET", "HEAD"):
+                estado, cuerpo, cabeceras = error_json(405, "solo GET")
+            elif fn is None:
+                estado, cuerpo, cabeceras = error_json(404, f"ruta desconocida: {url.path}")
+            else:
+                parametros = dict(urllib.parse.parse_qsl(url.query))
+                try:
+                    estado, cuerpo, cabeceras = fn(parametros)
+                except Exception as e:  # un fallo en una ruta no tumba el servicio
+                    estado, cuerpo, cabeceras = error_json(500, f"{type(e).__name__}: {e}")
+
+        cabecera = [f"HTTP/1.1 {estado} {MOTIVOS.get(estado, '')}",
+                    f"Content-Length: {len(cuerpo)}", "Connection: close"]
+        cabecera += [f"{k}: {v}" for k, v in cabeceras.items()]
+        writer.write(("\r\n".join(cabecera) + "\r\n\r\n").encode("latin-1"))
+        if metodo != "HEAD":
+            writer.write(cuerpo)
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def servir(rutas: dict, host: str = "127.0.0.1", puerto: int = 8787):
+    """Arranca el servidor y lo devuelve (asyncio.Server); se para con .close()."""
+    return await asyncio.start_server(lambda r, w: _atender(r, w, rutas), host, puerto)
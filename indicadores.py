@@ -0,0 +1,348 @@
+# indicadores.py
+# Indicadores técnicos del histórico mantenidos de forma incremental:
+#
+#   sma_7 / sma_30 / sma_90  media de los precios del tipo en los últimos 7 / 30 / 90 días
+#   vol_30                   volatilidad: desviación típica (muestral) de los últimos 30
+#                            rendimientos logarítmicos diarios, anualizada (× √365)
+#   var_anual                variación frente al último precio de hace 365 días o más
+#   diferencial              virgen extra − lampante del último día con los dos
+#                            (en €/kg y en % sobre el lampante)
+#
+# Las ventanas son de días naturales: la serie de partida (cargar_serie) arrastra el
+# último cierre a fines de semana y días sin cierre, y los huecos que aún queden (días
+# que faltan en la serie o en el almacén) se rellenan igual al calcular. Un día sin
+# cierre cuenta, con rendimiento 0; por eso la volatilidad se anualiza con √365 y no
+# con los √252 días de mercado.
+#
+# El estado (indicadores-estado.json) es de tamaño fijo: por tipo, las ventanas de
+# precios con su suma, la de rendimientos con media y M2 (varianza de Welford con
+# entrada y salida), el último precio y el último año de precios para la variación
+# anual. Cada día nuevo cuesta O(1) sea cual sea la longitud del histórico. El
+# scraper (y el pipeline) lo actualizan al añadir días al almacén y escriben
+# indicadores.json, compacto, para la web y las APIs.
+#
+# Recalcular todo (tras un backfill, o si falta el estado) es un modo por lotes sobre
+# la serie completa, vectorizado con NumPy si está instalado:
+#   python3 indicadores.py                       estado + indicadores.json desde cero
+#   python3 indicadores.py --serie indic.csv     y la serie diaria de indicadores en CSV
+
+import argparse
+import csv
+import json
+import math
+from collections import deque
+from datetime import date
+from pathlib import Path
+
+import escritura
+from historico_store import HIST_KEYS, HistoricoStore
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional
+    np = None
+
+ESTADO_FILE = Path("indicadores-estado.json")
+INDICADORES_FILE = Path("indicadores.json")
+
+VENTANAS_SMA = (7, 30, 90)
+VENTANA_VOL = 30
+DIAS_ANIO = 365
+ANUALIZAR = math.sqrt(DIAS_ANIO)  # rendimientos de días naturales
+VERSION = 1
+EXTRA, LAMPANTE = HIST_KEYS[0], HIST_KEYS[-1]
+CAMPOS = tuple(f"sma_{w}" for w in VENTANAS_SMA) + ("vol_30", "var_anual")
+
+
+def _redondear(v, n: int = 4):
+    return None if v is None else round(v, n)
+
+
+class _Tipo:
+    """Estado de un tipo: ventanas de precios y rendimientos, último precio y último año."""
+
+    def __init__(self):
+        self.ventanas = {w: deque() for w in VENTANAS_SMA}
+        self.sumas = {w: 0.0 for w in VENTANAS_SMA}
+        self.rend = deque()
+        self.media = 0.0
+        self.m2 = 0.0
+        self.ultimo = None   # [ordinal, precio]
+        self.anio = deque()  # [(ordinal, precio)] desde el último de hace >= DIAS_ANIO
+
+    def anadir(self, o: int, p: float):
+        """Añade el precio del día `o`; los días que falten desde el último repiten su precio."""
+        if self.ultimo is not None:
+            previo = self.ultimo[1]
+            for hueco in range(self.ultimo[0] + 1, o):
+                self._sumar(hueco, previo)
+        self._sumar(o, p)
+
+    def _sumar(self, o: int, p: float):
+        for w, ventana in self.ventanas.items():
+            ventana.append(p)
+            self.sumas[w] += p
+            if len(ventana) > w:
+                self.sumas[w] -= ventana.popleft()
+
+        if self.ultimo is not None and self.ultimo[1] > 0 and p > 0:
+            r = math.log(p / self.ultimo[1])
+            # Welford con ventana deslizante: entra r y, si sobra, sale el más antiguo
+            self.rend.append(r)
+            d = r - self.media
+            self.media += d / len(self.rend)
+            self.m2 += d * (r - self.media)
+            if len(self.rend) > VENTANA_VOL:
+                x = self.rend.popleft()
+                d = x - self.media
+                self.media -= d / len(self.rend)
+                self.m2 -= d * (x - self.media)
+        self.ultimo = [o, p]
+
+        self.anio.append((o, p))
+        while len(self.anio) > 1 and self.anio[1][0] <= o - DIAS_ANIO:
+            self.anio.popleft()
+
+    def valores(self) -> dict:
+        salida = {}
+        for w, ventana in self.ventanas.items():
+            salida[f"sma_{w}"] = self.sumas[w] / w if len(ventana) == w else None
+        n = len(self.rend)
+        salida["vol_30"] = math.sqrt(max(self.m2, 0.0) / (n - 1)) * ANUALIZAR if n == VENTANA_VOL else None
+        o_ref, p_ref = self.anio[0] if self.anio else (None, None)
+        if self.ultimo and o_ref is not None and o_ref <= self.ultimo[0] - DIAS_ANIO and p_ref:
+            salida["var_anual"] = self.ultimo[1] / p_ref - 1
+        else:
+            salida["var_anual"] = None
+        return salida
+
+    def a_json(self) -> dict:
+        return {
+            "ventanas": {str(w): list(v) for w, v in self.ventanas.items()},
+            "sumas": {str(w): s for w, s in self.sumas.items()},
+            "rend": list(self.rend), "media": self.media, "m2": self.m2,
+            "ultimo": self.ultimo, "anio": [list(x) for x in self.anio],
+        }
+
+    @classmethod
+    def de_json(cls, d: dict):
+        t = cls()
+        t.ventanas = {w: deque(d["ventanas"][str(w)]) for w in VENTANAS_SMA}
+        t.sumas = {w: d["sumas"][str(w)] for w in VENTANAS_SMA}
+        t.rend = deque(d["rend"])
+        t.media, t.m2 = d["media"], d["m2"]
+        t.ultimo = d["ultimo"]
+        t.anio = deque(tuple(x) for x in d["anio"])
+        return t
+
+
+class Indicadores:
+    def __init__(self):
+        self.tipos = {k: _Tipo() for k in HIST_KEYS}
+        self.ultima_fecha = None  # ISO del último día incorporado
+
+    def anadir(self, fecha: date, valores: dict) -> bool:
+        """
+        Incorpora los precios {clave: precio} de un día en O(1). Un tipo que ya tiene
+        ese día (o uno posterior) no cambia. Devuelve True si cambió algún tipo.
+        """
+        o = fecha.toordinal()
+        cambio = False
+        for k, v in valores.items():
+            t = self.tipos.get(k)
+            if t is None or v is None or (t.ultimo is not None and o <= t.ultimo[0]):
+                continue
+            t.anadir(o, float(v))
+            cambio = True
+        if cambio and (self.ultima_fecha is None or fecha.isoformat() > self.ultima_fecha):
+            self.ultima_fecha = fecha.isoformat()
+        return cambio
+
+    def diferencial(self):
+        """(fecha ISO, extra − lampante, en % del lampante) si el último día de los dos coincide."""
+        e, l = self.tipos[EXTRA].ultimo, self.tipos[LAMPANTE].ultimo
+        if not e or not l or e[0] != l[0]:
+            return None
+        return date.fromordinal(e[0]).isoformat(), e[1] - l[1], (e[1] / l[1] - 1) if l[1] else None
+
+    def resumen(self) -> dict:
+        """Lo que se publica en indicadores.json."""
+        tipos = {}
+        for k, t in self.tipos.items():
+            if t.ultimo is None:
+                continue
+            tipos[k] = {"fecha": date.fromordinal(t.ultimo[0]).isoformat(), "precio": t.ultimo[1],
+                        **{c: _redondear(v) for c, v in t.valores().items()}}
+        dif = self.diferencial()
+        return {
+            "fecha": self.ultima_fecha,
+            "tipos": tipos,
+            "diferencial": None if dif is None else {
+                "fecha": dif[0], "eur_kg": round(dif[1], 3), "pct": _redondear(dif[2])},
+        }
+
+    # ---------- estado en disco ----------
+
+    def a_json(self) -> dict:
+        return {"version": VERSION, "ultima_fecha": self.ultima_fecha,
+                "tipos": {k: t.a_json() for k, t in self.tipos.items()}}
+
+    @classmethod
+    def de_json(cls, d: dict):
+        if d.get("version") != VERSION:
+            raise ValueError(f"versión de estado {d.get('version')!r}, se esperaba {VERSION}")
+        ind = cls()
+        ind.ultima_fecha = d["ultima_fecha"]
+        for k in HIST_KEYS:
+            if k in d["tipos"]:
+                ind.tipos[k] = _Tipo.de_json(d["tipos"][k])
+        return ind
+
+    @classmethod
+    def cargar(cls, path: Path = ESTADO_FILE):
+        """Estado guardado, o None si no hay o no vale (entonces hay que recalcular)."""
+        try:
+            return cls.de_json(json.loads(Path(path).read_text(encoding="utf-8")))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def guardar(self, path: Path = ESTADO_FILE, salida: Path = INDICADORES_FILE):
+        escritura.escribir_json(path, self.a_json(), separators=(",", ":"))
+        return escritura.escribir_json(salida, self.resumen(), separators=(",", ":"))
+
+
+# ---------- modo por lotes ----------
+
+def _serie_python(ords, precios):
+    """Indicadores de cada precio de un tipo, pasándolos uno a uno por _Tipo."""
+    t = _Tipo()
+    filas = []
+    for o, p in zip(ords, precios):
+        t.anadir(o, p)
+        filas.append(t.valores())
+    return {c: [f[c] for f in filas] for c in CAMPOS}
+
+
+def _serie_numpy(ords, precios):
+    """Lo mismo que _serie_python, vectorizado (sumas acumuladas y searchsorted)."""
+    o = np.asarray(ords, dtype=np.int64)
+    p = np.asarray(precios, dtype=np.float64)
+    n = len(p)
+    salida = {}
+    acum = np.concatenate(([0.0], np.cumsum(p)))
+    for w in VENTANAS_SMA:
+        sma = np.full(n, np.nan)
+        if n >= w:
+            sma[w - 1:] = (acum[w:] - acum[:-w]) / w
+        salida[f"sma_{w}"] = sma
+
+    vol = np.full(n, np.nan)
+    if n > VENTANA_VOL:
+        r = np.log(p[1:] / p[:-1])
+        a1 = np.concatenate(([0.0], np.cumsum(r)))
+        a2 = np.concatenate(([0.0], np.cumsum(r * r)))
+        s1 = a1[VENTANA_VOL:] - a1[:-VENTANA_VOL]
+        s2 = a2[VENTANA_VOL:] - a2[:-VENTANA_VOL]
+        var = np.maximum(s2 - s1 * s1 / VENTANA_VOL, 0.0) / (VENTANA_VOL - 1)
+        vol[VENTANA_VOL:] = np.sqrt(var) * ANUALIZAR  # el rendimiento i acaba en el precio i + 1
+    salida["vol_30"] = vol
+
+    ref = np.searchsorted(o, o - DIAS_ANIO, side="right") - 1
+    var_anual = np.full(n, np.nan)
+    hay = ref >= 0
+    var_anual[hay] = p[hay] / p[ref[hay]] - 1
+    salida["var_anual"] = var_anual
+    return {c: [None if math.isnan(v) else v for v in salida[c].tolist()] for c in CAMPOS}
+
+
+def _rellenar(pares):
+    """[(ordinal, precio)] con los días que faltan rellenados con el precio anterior (como _Tipo.anadir)."""
+    salida = []
+    for o, p in pares:
+        if salida:
+            previo_o, previo_p = salida[-1]
+            salida.extend((hueco, previo_p) for hueco in range(previo_o + 1, o))
+        salida.append((o, p))
+    return salida
+
+
+def recalcular(fechas, cols, serie: Path = None) -> Indicadores:
+    """
+    Recalcula desde la serie completa (fechas, {clave: [precio | None]}), como cargar_serie.
+    Devuelve el estado al final de la serie; con `serie` escribe además los indicadores
+    de cada día en CSV.
+    """
+    ind = Indicadores()
+    por_tipo = {}
+    for k in HIST_KEYS:
+        pares = _rellenar([(d.toordinal(), v) for d, v in zip(fechas, cols[k]) if v is not None and v > 0])
+        ords = [o for o, _ in pares]
+        precios = [v for _, v in pares]
+        por_tipo[k] = (ords, precios)
+        # el estado solo necesita la cola: las ventanas y el último año
+        desde = max(0, len(ords) - max(max(VENTANAS_SMA), VENTANA_VOL + 1) - DIAS_ANIO)
+        t = ind.tipos[k]
+        for o, v in zip(ords[desde:], precios[desde:]):
+            t.anadir(o, v)
+    if fechas:
+        ind.ultima_fecha = max(date.fromordinal(t.ultimo[0]) for t in ind.tipos.values() if t.ultimo).isoformat()
+
+    if serie is not None:
+        calcular = _serie_numpy if np is not None else _serie_python
+        _escribir_serie(serie, {k: (ords, calcular(ords, precios)) for k, (ords, precios) in por_tipo.items()})
+    return ind
+
+
+def _escribir_serie(path: Path, por_tipo: dict):
+    with escritura.abrir(path, newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["fecha", "tipo"] + list(CAMPOS))
+        for k, (ords, valores) in por_tipo.items():
+            for i, o in enumerate(ords):
+                w.writerow([date.fromordinal(o).isoformat(), k]
+                           + ["" if valores[c][i] is None else _redondear(valores[c][i]) for c in CAMPOS])
+
+
+# ---------- uso desde el scraper ----------
+
+def actualizar(store: HistoricoStore, estado: Path = ESTADO_FILE, salida: Path = INDICADORES_FILE,
+               bin_path=None, completa: bool = False) -> str:
+    """
+    Lleva los indicadores al día con el almacén: solo los días posteriores al estado
+    (O(1) por día). Sin estado válido, o con `completa` (días añadidos por detrás, como
+    en un backfill), recalcula desde la serie completa. Devuelve "incremental",
+    "completa" o None (ya estaban al día).
+    """
+    ind = None if completa else Indicadores.cargar(estado)
+    if ind is None:
+        from serie_binaria import BIN_FILE, cargar_serie
+
+        ind = recalcular(*cargar_serie(bin_path or BIN_FILE, store))
+        ind.guardar(estado, salida)
+        return "completa"
+
+    cambio = False
+    for fecha_iso, valores in store.iterar(ind.ultima_fecha):
+        cambio |= ind.anadir(date.fromisoformat(fecha_iso), dict(zip(HIST_KEYS, valores)))
+    if not cambio:
+        return None
+    ind.guardar(estado, salida)
+    return "incremental"
+
+
+if __name__ == "__main__":
+    from serie_binaria import BIN_FILE, cargar_serie
+
+    ap = argparse.ArgumentParser(description="Recalcula los indicadores técnicos desde el histórico completo.")
+    ap.add_argument("--bin", type=Path, default=BIN_FILE, help="Serie binaria (más el almacén del histórico)")
+    ap.add_argument("--estado", type=Path, default=ESTADO_FILE)
+    ap.add_argument("--salida", type=Path, default=INDICADORES_FILE, help="JSON compacto para la web")
+    ap.add_argument("--serie", type=Path, help="Escribir también los indicadores de cada día (CSV)")
+    args = ap.parse_args()
+
+    with escritura.bloqueo():
+        ind = recalcular(*cargar_serie(args.bin, HistoricoStore()), serie=args.serie)
+        n = ind.guardar(args.estado, args.salida)
+    print(f"✅ Indicadores hasta {ind.ultima_fecha} en {args.salida} ({n} bytes); estado en {args.estado}.")
+    if args.serie:
+        print(f"✅ Serie diaria de indicadores en {args.serie} ({'NumPy' if np is not None else 'Python'}).")
@@ -0,0 +1,103 @@
+# metricas.py
+# Métricas de una ejecución del scraper: duración de cada fase (reloj monotónico),
+# contadores (filas recorridas, llamadas a la página, bytes escritos...) e
+# indicadores del resultado (sin cierre, tabla por encabezado, datos reutilizados...).
+#
+# Cada ejecución añade una línea a metricas-scraper.jsonl:
+#   {"inicio": "...Z", "duracion_ms": 812.4, "fases_ms": {...}, "contadores": {...},
+#    "indicadores": {...}}
+# y, si se pide, reescribe un fichero en formato de texto de Prometheus (para el
+# textfile collector de node_exporter).
+#
+# `actual` es la ejecución en curso; los módulos la usan con `metricas.actual.contar(...)`.
+
+import json
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import escritura
+
+METRICAS_FILE = Path("metricas-scraper.jsonl")
+PREFIJO_PROMETHEUS = "scraper"
+
+
+class Metricas:
+    def __init__(self):
+        self.inicio = datetime.now(timezone.utc)
+        self._t0 = time.perf_counter()
+        self.fases = {}
+        self.contadores = {}
+        self.indicadores = {}
+
+    @contextmanager
+    def fase(self, nombre: str):
+        """Mide una fase en ms; si se repite (reintentos), se acumula."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            self.fases[nombre] = round(self.fases.get(nombre, 0.0) + ms, 1)
+
+    def contar(self, nombre: str, n: int = 1):
+        self.contadores[nombre] = self.contadores.get(nombre, 0) + n
+
+    def marcar(self, nombre: str, valor=True):
+        self.indicadores[nombre] = valor
+
+    def registro(self) -> dict:
+        return {
+            "inicio": self.inicio.isoformat(timespec="seconds").replace("+00:00", "Z"),
+            "duracion_ms": round((time.perf_counter() - self._t0) * 1000, 1),
+            "fases_ms": self.fases,
+            "contadores": self.contadores,
+            "indicadores": self.indicadores,
+        }
+
+    def escribir_jsonl(self, path: Path = METRICAS_FILE) -> dict:
+        reg = self.registro()
+        escritura.anexar(path, json.dumps(reg, ensure_ascii=False, separators=(",", ":")) + "\n")
+        return reg
+
+    def escribir_prometheus(self, path: Path):
+        """Formato de texto de Prometheus (escritura atómica)."""
+        reg = self.registro()
+        p = PREFIJO_PROMETHEUS
+        lineas = [
+            f"# HELP {p}_duracion_segundos Duración total de la ejecución.",
+            f"# TYPE {p}_duracion_segundos gauge",
+            f"{p}_duracion_segundos {reg['duracion_ms'] / 1000:.4f}",
+            f"# HELP {p}_ultima_ejecucion_timestamp_segundos Inicio de la ejecución (epoch).",
+            f"# TYPE {p}_ultima_ejecucion_timestamp_segundos gauge",
+            f"{p}_ultima_ejecucion_timestamp_segundos {self.inicio.timestamp():.0f}",
+            f"# HELP {p}_fase_segundos Duración de cada fase.",
+            f"# TYPE {p}_fase_segundos gauge",
+        ]
+        lineas += [f'{p}_fase_segundos{{fase="{_etiqueta(k)}"}} {v / 1000:.4f}' for k, v in sorted(reg["fases_ms"].items())]
+        lineas += [f"# HELP {p}_contador Contadores de la ejecución.", f"# TYPE {p}_contador gauge"]
+        lineas += [f'{p}_contador{{nombre="{_etiqueta(k)}"}} {v}' for k, v in sorted(reg["contadores"].items())]
+        lineas += [f"# HELP {p}_indicador Indicadores del resultado (1/0, o 1 con el valor como etiqueta).",
+                   f"# TYPE {p}_indicador gauge"]
+        for k, v in sorted(reg["indicadores"].items()):
+            if isinstance(v, (int, float)):  # incluye bool
+                lineas.append(f'{p}_indicador{{nombre="{_etiqueta(k)}"}} {float(v):g}')
+            else:
+                lineas.append(f'{p}_indicador{{nombre="{_etiqueta(k)}",valor="{_etiqueta(str(v))}"}} 1')
+        escritura.escribir(path, "\n".join(lineas) + "\n")
+
+
+def _etiqueta(texto: str) -> str:
+    return re.sub(r'["\\\n]', "_", texto)
+
+
+actual = Metricas()
+
+
+def reiniciar() -> Metricas:
+    """Empieza a medir una ejecución nueva."""
+    global actual
+    actual = Metricas()
+    return actual
@@ -16,33 +16,151 @@ const fechaHastaInput = document.getElementById("fecha-hasta");
 let datosHistoricos = [];
 
 // ===================
-// Leer precios2015.txt (normaliza fechas y evita duplicados por formato)
+// Agregados precalculados (rollups/*.json, generados por rollups.py)
+// ===================
+const ROLLUPS_DIR = "rollups/";
+const cacheResoluciones = new Map();
+
+// "2025-10-28" → "28-10-2025"; "2025-10" → "01-10-2025"; "2025" → "01-01-2025"
+function periodoAFecha(p) {
+  const [y, m = "01", d = "01"] = p.split("-");
+  return `${d}-${m}-${y}`;
+}
+
+// Descarga (una sola vez) una resolución y la aplana a [{fecha, tipo, precio}] con el cierre del periodo
+async function cargarResolucion(nombre) {
+  if (cacheResoluciones.has(nombre)) return cacheResoluciones.get(nombre);
+
+  const resp = await fetch(`${ROLLUPS_DIR}${nombre}.json`, { cache: "no-cache" });
+  if (!resp.ok) throw new Error(`HTTP ${resp.status}`);
+  const { periodos, series } = await resp.json();
+
+  const datos = [];
+  for (const [tipo, s] of Object.entries(series)) {
+    s.c.forEach((precio, i) => {
+      if (precio !== null) datos.push({ fecha: periodoAFecha(periodos[i]), tipo, precio });
+    });
+  }
+  cacheResoluciones.set(nombre, datos);
+  return datos;
+}
+
+// Rangos largos con menos puntos: diario hasta 1 año, semanal hasta 5, mensual a partir de ahí
+function resolucionPara(desde, hasta) {
+  const dias = (hasta - desde) / 86_400_000;
+  if (dias <= 366) return "diario";
+  if (dias <= 366 * 5) return "semanal";
+  return "mensual";
+}
+
+// ===================
+// Histórico diario por años (historico/AAAA.<hash>.json, inmutables y cacheables).
+// Solo el manifiesto se revalida; se descargan únicamente los años del rango pedido.
+// ===================
+const MANIFEST_HISTORICO = "historico-manifest.json";
+let manifestHistorico = null;
+const aniosCargados = new Set();
+let historicoCompleto = false; // true si se tuvo que cargar todo de golpe (fallback)
+
+async function cargarAnios(desde, hasta) {
+  if (!manifestHistorico) {
+    const resp = await fetch(MANIFEST_HISTORICO, { cache: "no-cache" });
+    if (!resp.ok) throw new Error(`HTTP ${resp.status}`);
+    manifestHistorico = await resp.json();
+  }
+
+  const nuevos = [];
+  for (let anio = desde.getFullYear(); anio <= hasta.getFullYear(); anio++) {
+    const info = manifestHistorico.anios[String(anio)];
+    if (!info || aniosCargados.has(anio)) continue;
+
+    const resp = await fetch(info.archivo);
+    if (!resp.ok) throw new Error(`HTTP ${resp.status}`);
+    const { fechas, series } = await resp.json();
+    for (const [tipo, precios] of Object.entries(series)) {
+      precios.forEach((precio, i) => {
+        if (precio !== null) nuevos.push({ fecha: periodoAFecha(fechas[i]), tipo, precio });
+      });
+    }
+    aniosCargados.add(anio);
+  }
+  return nuevos;
+}
+
+// Garantiza que datosHistoricos cubre [desde, hasta]
+async function asegurarHistorico(desde, hasta) {
+  if (historicoCompleto) return;
+  try {
+    const nuevos = await cargarAnios(desde, hasta);
+    if (nuevos.length) datosHistoricos = [...nuevos, ...datosHistoricos];
+  } catch (e) {
+    console.warn("Sin histórico por años, se carga completo:", e);
+    datosHistoricos = await cargarHistorico();
+    historicoCompleto = true;
+  }
+}
+
+// ===================
+// Cargar histórico diario completo: rollups/diario.json y, si no existe, precios2015.txt
 // ===================
 async function cargarHistorico() {
   try {
-    const resp = await fetch(`precios2015.txt?cacheBust=${Date.now()}`);
+    return await cargarResolucion("diario");
+  } catch (e) {
+    console.warn("Sin rollups, se usa precios2015.txt:", e);
+  }
+  return cargarHistoricoTexto();
+}
+
+// ===================
+// Leer precios2015.txt (normaliza fechas y evita duplicados por formato)
+// ===================
+async function cargarHistoricoTexto() {
+  try {
+    const resp = await fetch("precios2015.txt", { cache: "no-cache" });
     const texto = await resp.text();
 
+    // Mismas reglas que parser_historico.py: espacios o tabuladores, coma o
+    // punto decimal, "€" opcional y filas "Sin cierre de operaciones" (se omiten)
+    const RE_FECHA = /^(\d{1,2})-(\d{1,2})-(\d{4})$/;
+    const RE_TIPO = /aceite\s+de\s+oliva\s+(virgen\s+extra|virgen|lampante)\b/i;
+    const RE_PRECIO = /(\d+)[.,](\d+)|(\d+)/;
+    const TIPOS = {
+      "virgen extra": "Aceite de oliva virgen extra",
+      "virgen": "Aceite de oliva virgen",
+      "lampante": "Aceite de oliva lampante",
+    };
+
     const lineas = texto.split("\n").map(l => l.trim()).filter(l => l);
     let historico = [];
     let fechaActual = null;
 
     for (let linea of lineas) {
       // Detectar fecha y normalizarla (dd-mm-yyyy)
-      if (/^\d{1,2}-\d{1,2}-\d{4}$/.test(linea)) {
-        const [d, m, y] = linea.split("-").map(Number);
-        fechaActual = `${String(d).padStart(2, "0")}-${String(m).padStart(2, "0")}-${y}`;
-      } else if (fechaActual) {
-        // Si es un precio
-        const partes = linea.split(" ");
-        const tipo = partes.slice(0, -1).join(" ");
-        const precio = parseFloat(partes[partes.length - 1].replace(",", "."));
-        historico.push({
-          fecha: fechaActual,
-          tipo: tipo,
-          precio: precio
-        });
+      const mFecha = RE_FECHA.exec(linea);
+      if (mFecha) {
+        const [, d, m, y] = mFecha;
+        fechaActual = `${d.padStart(2, "0")}-${m.padStart(2, "0")}-${y}`;
+        continue;
       }
+      if (!fechaActual) continue;
+
+      const mTipo = RE_TIPO.exec(linea);
+      if (!mTipo) continue;
+      const resto = linea.slice(mTipo.index + mTipo[0].length).split("\t").pop();
+      if (/sin\s+cierre/i.test(resto)) continue;
+
+      const mPrecio = RE_PRECIO.exec(resto);
+      if (!mPrecio) continue;
+      const precio = mPrecio[3] !== undefined
+        ? parseFloat(mPrecio[3])
+        : parseFloat(`${mPrecio[1]}.${mPrecio[2]}`);
+
+      historico.push({
+        fecha: fechaActual,
+        tipo: TIPOS[mTipo[1].toLowerCase().replace(/\s+/g, " ")],
+        precio: precio
+      });
     }
 
     // 🔹 Eliminar duplicados exactos (fecha + tipo)
@@ -173,29 +291,31 @@ function renderHistorico(filtrado) {
 // ===================
 // Filtros
 // ===================
-function filtrarPorRango(desde, hasta) {
-  return datosHistoricos.filter(item => {
+function filtrarPorRango(desde, hasta, datos = datosHistoricos) {
+  return datos.filter(item => {
     const [d, m, y] = item.fecha.split("-").map(Number);
     const fechaItem = new Date(y, m - 1, d);
     return fechaItem >= desde && fechaItem <= hasta;
   });
 }
 
-filtro3m?.addEventListener("click", () => {
+filtro3m?.addEventListener("click", async () => {
   const hoy = new Date();
   const hace3m = new Date();
   hace3m.setMonth(hoy.getMonth() - 3);
+  await asegurarHistorico(hace3m, hoy);
   renderHistorico(filtrarPorRango(hace3m, hoy));
 });
 
-filtro1m?.addEventListener("click", () => {
+filtro1m?.addEventListener("click", async () => {
   const hoy = new Date();
   const hace1m = new Date();
   hace1m.setMonth(hoy.getMonth() - 1);
+  await asegurarHistorico(hace1m, hoy);
   renderHistorico(filtrarPorRango(hace1m, hoy));
 });
 
-filtroRango?.addEventListener("click", () => {
+filtroRango?.addEventListener("click", async () => {
   const desdeVal = fechaDesdeInput.value;
   const hastaVal = fechaHastaInput.value;
   if (!desdeVal || !hastaVal) return;
@@ -206,7 +326,19 @@ filtroRango?.addEventListener("click", () => {
   const desde = new Date(ay, am - 1, ad);
   const hasta = new Date(by, bm - 1, bd);
 
-  renderHistorico(filtrarPorRango(desde, hasta));
+  const resolucion = resolucionPara(desde, hasta);
+  if (resolucion === "diario") {
+    await asegurarHistorico(desde, hasta);
+    renderHistorico(filtrarPorRango(desde, hasta));
+    return;
+  }
+  try {
+    const datos = await cargarResolucion(resolucion);
+    renderHistorico(filtrarPorRango(desde, hasta, datos));
+  } catch (e) {
+    console.error("Error cargando agregados:", e);
+    renderHistorico(filtrarPorRango(desde, hasta));
+  }
 });
 
 // ===================
@@ -215,16 +347,15 @@ filtroRango?.addEventListener("click", () => {
 if (historicoBtn) {
   historicoBtn.addEventListener("click", async () => {
     historicoModal.classList.add("open");
-    if (datosHistoricos.length === 0) {
-      datosHistoricos = await cargarHistorico();
-    }
-    await actualizarConDatosDelDia();
 
     // ▶️ Al abrir: mostrar SIEMPRE el último mes y rellenar inputs
     const hoy = new Date();
     const hace1m = new Date();
     hace1m.setMonth(hoy.getMonth() - 1);
 
+    await asegurarHistorico(hace1m, hoy);
+    await actualizarConDatosDelDia();
+
     const toYMD = (d) =>
       [d.getFullYear(), String(d.getMonth() + 1).padStart(2, "0"), String(d.getDate()).padStart(2, "0")].join("-");
 
@@ -0,0 +1,213 @@
+# parser_historico.py
+# Parser único (en streaming) para todos los formatos de texto del histórico:
+#
+#   precios2015.txt / "precios 2015.txt"   fecha + "Aceite de oliva virgen 3.650"
+#   historico.txt                          igual, con variedad, "€", CRLF, cabeceras
+#                                          repetidas y filas "Sin cierre de operaciones"
+#   historico_completo.txt                 tabulado: tipo<TAB>variedad<TAB>precio €
+#
+# Todas las variantes son bloques "fecha" seguidos de líneas de precio, así que el
+# parser es una máquina de estados de una línea: genera tuplas
+# (date, clave_canonica, precio | None) sin cargar el fichero en memoria.
+# None = "Sin cierre de operaciones". Admite coma o punto decimal.
+#
+# dias_ordenados() da además los días en orden ascendente sea cual sea el orden del
+# fichero: los que van de nuevo a antiguo se leen desde el final, por bloques.
+
+import re
+from datetime import date
+from itertools import groupby, islice
+
+from historico_store import HIST_KEYS
+
+_RE_FECHA = re.compile(r"^\s*(\d{1,2})-(\d{1,2})-(\d{4})\s*$")
+_RE_TIPO = re.compile(r"aceite\s+de\s+oliva\s+(virgen\s+extra|virgen|lampante)\b", re.I)
+_RE_PRECIO = re.compile(r"(\d+)[.,](\d+)|(\d+)")
+_RE_SIN_CIERRE = re.compile(r"sin\s+cierre", re.I)
+
+BLOQUE_LECTURA = 1 << 16
+
+_CLAVE_POR_TIPO = {
+    "virgen extra": HIST_KEYS[0],
+    "virgen": HIST_KEYS[1],
+    "lampante": HIST_KEYS[2],
+}
+
+FORMATO_ESPACIOS = "espacios"
+FORMATO_TABULADO = "tabulado"
+
+
+def detectar_formato(path, muestra: int = 50):
+    """
+    Inspecciona las primeras líneas y devuelve un dict con:
+      formato  'tabulado' | 'espacios'
+      decimal  ',' | '.'
+      orden    'asc' (antiguo → nuevo) | 'desc' (nuevo → antiguo) | None
+    """
+    formato, decimal, fechas = FORMATO_ESPACIOS, ".", []
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for linea in islice(f, muestra):
+            m = _RE_FECHA.match(linea)
+            if m:
+                fechas.append(_fecha(m))
+                continue
+            if _RE_TIPO.search(linea):
+                if "\t" in linea:
+                    formato = FORMATO_TABULADO
+                p = _RE_PRECIO.search(linea, _RE_TIPO.search(linea).end())
+                if p and p.group(1) and "," in p.group(0):
+                    decimal = ","
+    fechas = [f for f in fechas if f]
+    orden = None
+    if len(fechas) >= 2:
+        orden = "asc" if fechas[-1] >= fechas[0] else "desc"
+    return {"formato": formato, "decimal": decimal, "orden": orden}
+
+
+def _fecha(m):
+    try:
+        return date(int(m.group(3)), int(m.group(2)), int(m.group(1)))
+    except ValueError:
+        return None
+
+
+def _precio_espacios(resto: str):
+    if _RE_SIN_CIERRE.search(resto):
+        return None
+    m = _RE_PRECIO.search(resto)
+    if not m:
+        raise ValueError(resto)
+    if m.group(3) is not None:
+        return float(m.group(3))
+    return float(f"{m.group(1)}.{m.group(2)}")
+
+
+def _precio_tabulado(resto: str):
+    # resto = "\tPicual\t4.080 €": el precio es siempre la última columna
+    return _precio_espacios(resto.rsplit("\t", 1)[-1])
+
+
+def fecha_de_linea(linea: str):
+    """date si la línea es una fecha dd-mm-aaaa, si no None."""
+    m = _RE_FECHA.match(linea)
+    return _fecha(m) if m else None
+
+
+def parsear_lineas(lineas, formato: str = FORMATO_ESPACIOS, fecha_inicial: date = None):
+    """
+    Genera (date, clave, precio|None) a partir de cualquier iterable de líneas.
+    Las líneas que no son fecha ni precio (cabeceras, pies de página) se ignoran.
+    `fecha_inicial` permite continuar un bloque empezado antes (lectura incremental).
+    """
+    precio_de = _precio_tabulado if formato == FORMATO_TABULADO else _precio_espacios
+    fecha_actual = fecha_inicial
+    for linea in lineas:
+        m = _RE_FECHA.match(linea)
+        if m:
+            fecha_actual = _fecha(m)
+            continue
+        if fecha_actual is None:
+            continue
+        t = _RE_TIPO.search(linea)
+        if not t:
+            continue
+        clave = _CLAVE_POR_TIPO[" ".join(t.group(1).lower().split())]
+        try:
+            precio = precio_de(linea[t.end():])
+        except ValueError:
+            continue
+        yield fecha_actual, clave, precio
+
+
+def parsear_archivo(path, formato: str = None):
+    """Abre `path`, detecta su formato (si no se indica) y genera las tuplas en streaming."""
+    if formato is None:
+        formato = detectar_formato(path)["formato"]
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        yield from parsear_lineas(f, formato)
+
+
+def lineas_al_reves(path, bloque: int = BLOQUE_LECTURA):
+    """Líneas de `path` de la última a la primera, leyendo desde el final por bloques."""
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        pos = f.tell()
+        resto = b""
+        while pos > 0:
+            n = min(bloque, pos)
+            pos -= n
+            f.seek(pos)
+            partes = (f.read(n) + resto).split(b"\n")
+            resto = partes[0]  # puede ser el final de una línea del bloque anterior
+            for linea in reversed(partes[1:]):
+                yield linea.decode("utf-8", errors="replace").rstrip("\r")
+        yield resto.decode("utf-8", errors="replace").rstrip("\r")
+
+
+def _dias_al_reves(path, formato: str):
+    # al revés, las líneas de precio de un día llegan antes que su fecha
+    pendientes = []
+    for linea in lineas_al_reves(path):
+        fecha = fecha_de_linea(linea)
+        if fecha is None:
+            pendientes.append(linea)
+            continue
+        valores = {}
+        for _, clave, precio in parsear_lineas(reversed(pendientes), formato, fecha):
+            valores[clave] = precio
+        pendientes = []
+        if valores:
+            yield fecha, valores
+
+
+def dias_ordenados(path):
+    """
+    Genera (date, {clave: precio | None}) en orden ascendente de fecha, en streaming.
+    Los bloques repetidos seguidos de una misma fecha se unen. ValueError si el
+    fichero no está ordenado (ni de antiguo a nuevo ni de nuevo a antiguo).
+    """
+    info = detectar_formato(path)
+    if info["orden"] == "desc":
+        dias = _dias_al_reves(path, info["formato"])
+    else:
+        eventos = parsear_archivo(path, info["formato"])
+        dias = ((f, {c: p for _, c, p in grupo}) for f, grupo in groupby(eventos, key=lambda e: e[0]))
+
+    anterior, acumulado = None, None
+    for fecha, valores in dias:
+        if fecha == anterior:
+            acumulado.update(valores)
+            continue
+        if anterior is not None:
+            if fecha < anterior:
+                raise ValueError(f"{path}: fechas desordenadas ({anterior} → {fecha})")
+            yield anterior, acumulado
+        anterior, acumulado = fecha, valores
+    if anterior is not None:
+        yield anterior, acumulado
+
+
+def agrupar_por_fecha(eventos, sin_cierre=None) -> dict:
+    """
+    Una pasada: {date: {clave: precio}}. Las filas sin cierre se guardan con el
+    valor `sin_cierre` (None por defecto); las repetidas se quedan con la última.
+    """
+    salida = {}
+    for fecha, clave, precio in eventos:
+        salida.setdefault(fecha, {})[clave] = sin_cierre if precio is None else precio
+    return salida
+
+
+def series_por_clave(eventos) -> dict:
+    """
+    Una pasada: {clave: [{"fecha": iso, "precio_eur_kg": float}]} ordenado por fecha,
+    omitiendo las filas sin cierre y quedándose con el último valor por fecha.
+    """
+    por_clave = {k: {} for k in HIST_KEYS}
+    for fecha, clave, precio in eventos:
+        if precio is not None:
+            por_clave[clave][fecha] = precio
+    return {
+        k: [{"fecha": f.isoformat(), "precio_eur_kg": v} for f, v in sorted(d.items())]
+        for k, d in por_clave.items()
+    }
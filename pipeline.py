@@ -0,0 +1,264 @@
+# pipeline.py
+# Toda la actualización diaria en un solo proceso, como un grafo de etapas:
+#
+#   lectura ─► actual ─► validacion ─► historico ─► texto ─► exportaciones
+#                                          ├─────────────────────────┘     └─► snapshots
+#                                          └─► indicadores ───────────────────┘
+#
+#   lectura        comprobación previa (cierres de hoy ya guardados) y lectura de las
+#                  fuentes (HTTP / Playwright, con la caché de snapshots)
+#   actual         precio-aceite.json
+#   validacion     precios de hoy por el validador (rechazos a la cuarentena)
+#   historico      almacén del histórico (.dat + .log)
+#   texto          precios2015.txt y precios2015.bin, con los valores del almacén
+#   exportaciones  precio-aceite-historico.json, rollups/ e historico/ por años
+#   indicadores    medias móviles, volatilidad... (indicadores.json), en O(1) por día
+#   snapshots      registra las tablas procesadas (al final, si todo lo anterior fue bien)
+#
+# Las etapas se pasan los datos en memoria (las tablas leídas, las filas, el almacén
+# abierto, los precios validados) en lugar de volver a leer del disco lo que acaba de
+# escribir la anterior, así que cada fichero se lee una vez por ejecución. Una etapa
+# se salta si ninguna de las que la preceden ha cambiado nada; las que tienen huella
+# (firma de sus entradas en disco) también se ejecutan si la huella no coincide con
+# la de su última ejecución (.pipeline-estado.json), por ejemplo tras un backfill o
+# una ejecución interrumpida. La huella es tamaño + mtime y el fichero de estado no se
+# versiona, así que eso solo vale donde el directorio de datos persiste entre
+# ejecuciones (una máquina con cron o el demonio). En CI cada ejecución parte de un
+# checkout limpio, sin estado, y las huellas no detectan nada pendiente: solo se
+# ejecuta lo que cambia en esa ejecución. Un backfill publica sus propias salidas al
+# terminar y se versionan junto con el almacén.
+# Desde la primera etapa que escribe hasta el final se tiene el cerrojo del
+# directorio de datos: lo que queda en disco es coherente entre sí.
+#
+#   python3 pipeline.py --solo-http         (sale con código 2 si hace falta Playwright)
+#   python3 pipeline.py --solo-navegador
+#   python3 pipeline.py --force             (consultar la web aunque hoy ya esté cerrado)
+
+import asyncio
+import json
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from graphlib import TopologicalSorter
+from pathlib import Path
+
+import escritura
+import metricas
+import scraper
+
+ESTADO_FILE = Path(".pipeline-estado.json")
+
+
+class Etapa:
+    def __init__(self, nombre: str, depende=(), escribe: bool = True, huella=None):
+        self.nombre = nombre
+        self.depende = tuple(depende)
+        self.escribe = escribe  # necesita el cerrojo del directorio de datos
+        self.huella = huella    # ctx → firma JSON de sus entradas, o None
+
+    def __call__(self, fn):
+        self.fn = fn  # ctx → True si ha cambiado algo
+        return self
+
+
+def _firma(path) -> list:
+    try:
+        st = Path(path).stat()
+        return [st.st_size, st.st_mtime_ns]
+    except OSError:
+        return None
+
+
+def _store(ctx: dict):
+    if "store" not in ctx:
+        ctx["store"] = scraper.abrir_historico()
+    return ctx["store"]
+
+
+# ---------- etapas ----------
+
+@Etapa("lectura", escribe=False)
+def _lectura(ctx: dict) -> bool:
+    args = ctx["args"]
+    ctx["previo"] = scraper.read_json(scraper.JSON_CURRENT, {})
+    if not args.force and not args.fuentes:
+        with scraper.fase("prevuelo"):
+            cerrado = scraper.ya_cerrado(ctx["hoy"], _store(ctx), ctx["previo"])
+        metricas.actual.marcar("ya_cerrado", cerrado)
+        if cerrado:
+            print(f"⏭️ Los cierres de {ctx['hoy']} ya están en el histórico y en precio-aceite.json; "
+                  "no se consulta la web (--force para hacerlo igualmente).")
+            ctx["resultado"] = "ya_cerrado"
+            return False
+
+    fuentes, modo, caches = scraper.preparar(args)
+    print(f"⚡ Leyendo {len(fuentes)} fuente(s) en paralelo (modo {modo})…")
+    with scraper.fase("recoger"):
+        resultados = asyncio.run(scraper.recoger(fuentes, modo, bloquear=not args.sin_bloqueo, caches=caches))
+    lectura = scraper.revisar_lecturas(resultados, caches, solo_http=args.solo_http)
+    if lectura is None:
+        ctx["resultado"] = "sin_cambios"
+        return False
+    ctx["resultados"], ctx["caches"] = resultados, caches
+    ctx["principal"], ctx["leidas"], ctx["hashes"] = lectura
+    return True
+
+
+@Etapa("actual", ["lectura"])
+def _actual(ctx: dict) -> bool:
+    ctx["datos"], ctx["filas"] = scraper.escribir_actual(ctx["resultados"], ctx["previo"])
+    if not ctx["filas"]:
+        print("ℹ️ No se añade al histórico porque hoy no hubo precios numéricos.")
+    return bool(ctx["filas"])
+
+
+@Etapa("validacion", ["actual"])
+def _validacion(ctx: dict) -> bool:
+    import validacion
+
+    store = _store(ctx)
+    validador = validacion.Validador.desde_store(store)
+    ctx["validos"] = scraper.precios_para_historico(
+        store, scraper.precios_canonicos(ctx["filas"]), ctx["hoy"], validador)
+    return bool(ctx["validos"])
+
+
+@Etapa("historico", ["validacion"])
+def _historico(ctx: dict) -> bool:
+    cambio = _store(ctx).anadir(ctx["hoy"], ctx["validos"])
+    metricas.actual.marcar("historico_actualizado", cambio)
+    if not cambio:
+        print("ℹ️ Histórico sin cambios (ya existían entradas de hoy).")
+    return cambio
+
+
+def _huella_texto(ctx: dict):
+    return [ctx["hoy"], _store(ctx).valores(ctx["hoy"])]
+
+
+@Etapa("texto", ["historico"], huella=_huella_texto)
+def _texto(ctx: dict) -> bool:
+    import actualiza_historico
+    from historico_store import HIST_KEYS
+
+    # lo que ya está validado y guardado en el almacén, no lo que diga precio-aceite.json
+    valores = _store(ctx).valores(ctx["hoy"])
+    if valores is None:
+        return False
+    hoy = datetime.fromisoformat(ctx["hoy"]).date()
+    return actualiza_historico.actualizar(dict(zip(HIST_KEYS, valores)), hoy)
+
+
+def _huella_exportaciones(ctx: dict):
+    from serie_binaria import BIN_FILE
+
+    store = _store(ctx)
+    return [_firma(p) for p in (BIN_FILE, store.dat_path, store.log_path)]
+
+
+@Etapa("exportaciones", ["historico", "texto"], huella=_huella_exportaciones)
+def _exportaciones(ctx: dict) -> bool:
+    scraper.publicar_historico(_store(ctx))
+    return True
+
+
+def _huella_almacen(ctx: dict):
+    store = _store(ctx)
+    return [_firma(store.dat_path), _firma(store.log_path)]
+
+
+@Etapa("indicadores", ["historico"], huella=_huella_almacen)
+def _indicadores(ctx: dict) -> bool:
+    scraper.actualizar_indicadores(_store(ctx))
+    return True
+
+
+@Etapa("snapshots", ["lectura", "exportaciones", "indicadores"])
+def _snapshots(ctx: dict) -> bool:
+    # al final: si algo falla antes, la próxima ejecución de hoy vuelve a procesar las tablas
+    if ctx.get("caches"):
+        scraper.guardar_snapshots(ctx["leidas"], ctx["hashes"], ctx["caches"])
+    return False
+
+
+ETAPAS = [_lectura, _actual, _validacion, _historico, _texto, _exportaciones, _indicadores, _snapshots]
+
+
+# ---------- ejecución ----------
+
+def _leer_estado(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def ejecutar(ctx: dict, etapas=ETAPAS, estado_path: Path = ESTADO_FILE) -> dict:
+    """Ejecuta las etapas en orden topológico. Devuelve {etapa: "cambio" | "sin_cambios" | "omitida"}."""
+    por_nombre = {e.nombre: e for e in etapas}
+    orden = TopologicalSorter({e.nombre: e.depende for e in etapas}).static_order()
+    estado = _leer_estado(estado_path)
+    informe, cambios = {}, {}
+    with ExitStack() as pila:
+        try:
+            for nombre in orden:
+                e = por_nombre[nombre]
+                entradas = not e.depende or any(cambios[d] for d in e.depende)
+                if e.escribe and (entradas or e.huella) and "cerrojo" not in ctx:
+                    pila.enter_context(escritura.bloqueo())
+                    ctx["cerrojo"] = True
+                    if "store" in ctx:
+                        ctx["store"].recargar()  # otro proceso pudo escribir mientras se leía la web
+                huella = e.huella(ctx) if e.huella else None
+                pendiente = huella is not None and nombre in estado and estado[nombre] != huella
+                if not entradas and not pendiente:
+                    cambios[nombre] = False
+                    informe[nombre] = "omitida"
+                    continue
+                with scraper.fase(f"etapa.{nombre}"):
+                    cambios[nombre] = bool(e.fn(ctx))
+                informe[nombre] = "cambio" if cambios[nombre] else "sin_cambios"
+                if huella is not None:
+                    estado[nombre] = e.huella(ctx)  # tras ejecutarse (la etapa puede cambiar sus entradas)
+        finally:
+            if "cerrojo" in ctx:
+                escritura.escribir_json(estado_path, estado)
+    return informe
+
+
+def _terminar(ctx: dict, informe: dict) -> str:
+    print("🧩 Etapas: " + ", ".join(f"{n}={r}" for n, r in informe.items()))
+    for nombre, r in informe.items():
+        metricas.actual.marcar(f"etapa_{nombre}", r)
+    if "resultado" in ctx:
+        return ctx["resultado"]
+    return scraper.terminar(ctx["datos"], ctx["principal"])
+
+
+def main(argv=None):
+    ap = scraper.construir_parser("Actualización diaria completa (lectura → validación → histórico → "
+                                  "texto → exportaciones) en un solo proceso.")
+    ap.add_argument("--estado", type=Path, default=ESTADO_FILE, help="Huellas de la última ejecución de cada etapa")
+    args = ap.parse_args(argv)
+
+    m = metricas.reiniciar()
+    m.marcar("comando", "pipeline")
+    resultado = "error"
+    # el almacén y el histórico van por fecha UTC: el texto usa la misma que el almacén
+    ctx = {"args": args, "hoy": datetime.now(timezone.utc).date().isoformat()}
+    try:
+        informe = ejecutar(ctx, estado_path=args.estado)
+        resultado = _terminar(ctx, informe)
+    except SystemExit as e:
+        m.marcar("codigo_salida", e.code if isinstance(e.code, int) else 1)
+        raise
+    finally:
+        m.marcar("resultado", resultado)
+        reg = m.escribir_jsonl(args.metricas)
+        if args.prometheus:
+            m.escribir_prometheus(args.prometheus)
+        print(f"📏 Métricas ({reg['duracion_ms']} ms) añadidas a {args.metricas}")
+    return resultado
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# reconciliar_historico.py
+# Una sola serie canónica a partir de todos los textos del histórico, que se solapan
+# y a veces no coinciden en el precio de un mismo día:
+#
+#   precios2015.txt         antiguo → nuevo (lo mantiene el pipeline diario)
+#   historico_completo.txt  tabulado, nuevo → antiguo
+#   historico.txt           nuevo → antiguo, con filas "Sin cierre de operaciones"
+#   precios 2015.txt        antiguo → nuevo
+#
+# Cada fichero se lee en streaming y en orden de fecha (parser_historico.dias_ordenados:
+# los que van de nuevo a antiguo se leen desde el final) y se mezclan con un montículo
+# (heapq.merge): en memoria solo hay un día por fichero, y el coste es lineal en el
+# total de días (× log del nº de ficheros).
+#
+# Para cada día y tipo manda el primer fichero de la lista de prioridad que lo trae
+# (un "Sin cierre" también cuenta). Si otro fichero da otro valor (diferencia mayor
+# que TOLERANCIA, o precio frente a sin cierre) se anota en el informe de conflictos,
+# JSON-lines:
+#   {"fecha": "2025-08-26", "tipo": "...", "elegido": 3.833, "fuente": "precios2015.txt",
+#    "valores": {"precios2015.txt": 3.833, "historico_completo.txt": 3.851},
+#    "arrastrados": ["historico_completo.txt"]}
+# (null = sin cierre; "arrastrados", los ficheros cuyo precio repite el del día
+# anterior en ese mismo fichero: puede ser un relleno o un cierre real que repite).
+#
+# Los ficheros de RELLENAN (precios2015.txt y "precios 2015.txt", que traen todos los
+# días naturales) arrastran el último cierre a fines de semana y días sin cierre. Solo
+# para ellos se sabe que un precio repetido es relleno, así que estas diferencias no
+# son conflictos y solo se cuentan en el resumen:
+#   sin_cierre  un fichero trae "Sin cierre de operaciones" y uno de RELLENAN un precio
+#   arrastrado  el precio de uno de RELLENAN repite el de su día anterior
+# Cualquier otra diferencia, también entre un sin cierre y un precio de otro fichero
+# o con un precio repetido fuera de RELLENAN, sí va al informe.
+#
+# La serie sale en el formato de precios2015.txt, de antiguo a nuevo, y opcionalmente
+# también como serie binaria.
+#
+#   python3 reconciliar_historico.py                        prioridad por defecto
+#   python3 reconciliar_historico.py historico_completo.txt precios2015.txt --bin precios2015.bin
+
+import argparse
+import heapq
+import json
+from array import array
+from itertools import groupby
+from pathlib import Path
+
+import escritura
+from historico_store import HIST_KEYS
+from parser_historico import dias_ordenados
+
+PRIORIDAD = ("precios2015.txt", "historico_completo.txt", "historico.txt", "precios 2015.txt")
+SALIDA_FILE = Path("historico-canonico.txt")
+CONFLICTOS_FILE = Path("historico-conflictos.jsonl")
+TOLERANCIA = 0.0005  # los textos traen 3 decimales
+
+RELLENAN = ("precios2015.txt", "precios 2015.txt")  # arrastran el último cierre
+
+SIN_CIERRE = "sin_cierre"
+ARRASTRADO = "arrastrado"
+
+
+def _distintos(a, b) -> bool:
+    if a is None or b is None:
+        return (a is None) != (b is None)
+    return abs(a - b) > TOLERANCIA
+
+
+def _flujo(path, rango: int):
+    # repetidos: claves con el mismo precio que el día anterior del fichero
+    previo, ayer = {}, None
+    for fecha, valores in dias_ordenados(path):
+        consecutivo = ayer is not None and fecha.toordinal() - ayer == 1
+        repetidos = {k for k, v in valores.items()
+                     if consecutivo and v is not None and previo.get(k) is not None
+                     and not _distintos(v, previo[k])}
+        yield fecha, rango, valores, repetidos
+        previo, ayer = valores, fecha.toordinal()
+
+
+def mezclar(paths):
+    """
+    Genera (date, [(rango, {clave: precio | None}, {claves repetidas})]) en orden de
+    fecha, con las entradas de cada fichero de `paths` que traen ese día (rango =
+    posición en `paths`).
+    """
+    flujos = [_flujo(p, rango) for rango, p in enumerate(paths)]
+    # (fecha, rango) es único, así que nunca se llegan a comparar los dicts
+    for fecha, grupo in groupby(heapq.merge(*flujos), key=lambda e: e[0]):
+        yield fecha, [(rango, valores, repetidos) for _, rango, valores, repetidos in grupo]
+
+
+def _diferencia(a, b):
+    """
+    Tipo de diferencia entre dos (precio, repetido, rellena): None, SIN_CIERRE,
+    ARRASTRADO o "conflicto".
+    """
+    if not _distintos(a[0], b[0]):
+        return None
+    if a[0] is None or b[0] is None:
+        con_precio = a if b[0] is None else b
+        return SIN_CIERRE if con_precio[2] else "conflicto"
+    if (a[1] and a[2]) or (b[1] and b[2]):
+        return ARRASTRADO
+    return "conflicto"
+
+
+def resolver(fecha, entradas, nombres, rellenan=RELLENAN):
+    """
+    ({clave: precio | None}, {clave: rango elegido}, conflictos,
+    {SIN_CIERRE: n, ARRASTRADO: n}) de un día. `entradas` va ordenada por rango (la
+    primera, la de más prioridad).
+    """
+    elegidos, fuentes, conflictos, otras = {}, {}, [], {SIN_CIERRE: 0, ARRASTRADO: 0}
+    for k in HIST_KEYS:
+        presentes = [(rango, valores[k], k in repetidos, nombres[rango] in rellenan)
+                     for rango, valores, repetidos in entradas if k in valores]
+        if not presentes:
+            continue
+        rango, elegido = presentes[0][:2]
+        elegidos[k], fuentes[k] = elegido, rango
+        tipos = {_diferencia(presentes[0][1:], p[1:]) for p in presentes[1:]} - {None}
+        if "conflicto" in tipos:
+            conflictos.append({"fecha": fecha.isoformat(), "tipo": k, "elegido": elegido,
+                               "fuente": nombres[rango],
+                               "valores": {nombres[r]: v for r, v, _, _ in presentes},
+                               "arrastrados": [nombres[r] for r, _, repetido, _ in presentes if repetido]})
+        elif tipos:
+            otras[SIN_CIERRE if SIN_CIERRE in tipos else ARRASTRADO] += 1
+    return elegidos, fuentes, conflictos, otras
+
+
+def _bloque(fecha, valores: dict) -> str:
+    lineas = [fecha.strftime("%d-%m-%Y")]
+    for k in HIST_KEYS:
+        if k in valores:
+            v = valores[k]
+            lineas.append(f"{k} Sin cierre de operaciones" if v is None else f"{k} {v:.3f}")
+    return "\n".join(lineas) + "\n\n"
+
+
+def reconciliar(paths=PRIORIDAD, salida=SALIDA_FILE, conflictos=CONFLICTOS_FILE, bin_path=None,
+                rellenan=RELLENAN) -> dict:
+    """
+    Mezcla `paths` (de más a menos prioridad), escribe la serie canónica en `salida`,
+    el informe en `conflictos` y, con `bin_path`, la serie binaria. `rellenan`: nombres
+    de los ficheros que arrastran el último cierre. Devuelve un resumen ("elegidos":
+    cuántos precios, día y tipo, salen de cada fichero).
+    """
+    import serie_binaria
+
+    nombres = [Path(p).name for p in paths]
+    resumen = {"dias": 0, "conflictos": 0, SIN_CIERRE: 0, ARRASTRADO: 0,
+               "por_fuente": {n: 0 for n in nombres}, "elegidos": {n: 0 for n in nombres}}
+    dias, columnas = array("i"), [[] for _ in HIST_KEYS]
+    # temporales hasta el final: se puede reconciliar sobre uno de los propios ficheros de entrada
+    with escritura.abrir(salida, newline="\n") as out, escritura.abrir(conflictos) as informe:
+        for fecha, entradas in mezclar(paths):
+            valores, fuentes, conflictos_dia, otras = resolver(fecha, entradas, nombres, rellenan)
+            if not valores:
+                continue
+            resumen["dias"] += 1
+            for clase, n in otras.items():
+                resumen[clase] += n
+            for rango, *_ in entradas:
+                resumen["por_fuente"][nombres[rango]] += 1
+            for rango in fuentes.values():
+                resumen["elegidos"][nombres[rango]] += 1
+            out.write(_bloque(fecha, valores))
+            for c in conflictos_dia:
+                informe.write(json.dumps(c, ensure_ascii=False) + "\n")
+            resumen["conflictos"] += len(conflictos_dia)
+            if bin_path is not None:
+                dias.append(fecha.toordinal())
+                for col, k in zip(columnas, HIST_KEYS):
+                    col.append(valores.get(k))
+    if bin_path is not None:
+        serie_binaria.escribir(bin_path, dias, columnas)
+    return resumen
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Mezcla los textos del histórico en una serie canónica con informe de conflictos.")
+    ap.add_argument("entradas", nargs="*", default=list(PRIORIDAD),
+                    help="Ficheros de más a menos prioridad (por defecto: %(default)s)")
+    ap.add_argument("-o", "--salida", type=Path, default=SALIDA_FILE, help="Serie canónica (formato de precios2015.txt)")
+    ap.add_argument("--conflictos", type=Path, default=CONFLICTOS_FILE, help="Informe de conflictos (JSON-lines)")
+    ap.add_argument("--bin", type=Path, help="Escribir también la serie binaria")
+    ap.add_argument("--rellenan", nargs="*", default=list(RELLENAN), metavar="FICHERO",
+                    help="Ficheros que arrastran el último cierre (por defecto: %(default)s)")
+    args = ap.parse_args()
+
+    entradas = [p for p in args.entradas if Path(p).exists()]
+    for p in set(args.entradas) - set(entradas):
+        print(f"⚠️ {p} no existe; se omite.")
+    with escritura.bloqueo():
+        r = reconciliar(entradas, args.salida, args.conflictos, args.bin, args.rellenan)
+    print(f"✅ {r['dias']} días en {args.salida}; {r['conflictos']} conflicto(s) en {args.conflictos} "
+          f"(no cuentan: {r[SIN_CIERRE]} precio frente a sin cierre, {r[ARRASTRADO]} con precio arrastrado).")
+    for nombre in r["por_fuente"]:
+        print(f"   {nombre}: {r['por_fuente'][nombre]} días, manda en {r['elegidos'][nombre]} precios")
+    if args.bin:
+        print(f"✅ Serie binaria {args.bin} actualizada.")
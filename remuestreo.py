@@ -0,0 +1,149 @@
+# remuestreo.py
+# Relleno de huecos por arrays de ordinales de día, compartido por validar_precios
+# y los convertidores.
+#
+# Las fechas se pasan a ordinales (date.toordinal()), los precios de todas las
+# series se colocan en columnas densas indexadas por (ordinal - inicio) y el
+# relleno es un único recorrido por índices (o np.maximum.accumulate si hay
+# NumPy). Las fechas de salida se formatean por meses, sin un datetime por día.
+#
+# Políticas:
+#   "ffill"      todos los días naturales, arrastrando el último precio
+#   "huecos"     todos los días naturales, None donde no hay dato
+#   "laborables" solo lunes a viernes, arrastrando el último precio
+
+import calendar
+import math
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional
+    np = None
+
+FFILL = "ffill"
+HUECOS = "huecos"
+LABORABLES = "laborables"
+POLITICAS = (FFILL, HUECOS, LABORABLES)
+
+_DD = [f"{d:02d}" for d in range(32)]
+
+
+def fechas_iso(inicio: int, n: int, formato: str = "iso"):
+    """
+    Lista de `n` fechas consecutivas desde el ordinal `inicio`, formateadas en bloque
+    por meses. formato: "iso" (AAAA-MM-DD) o "dmy" (DD-MM-AAAA).
+    """
+    salida = []
+    if n <= 0:
+        return salida
+    d0 = date.fromordinal(inicio)
+    y, m, dia = d0.year, d0.month, d0.day
+    while len(salida) < n:
+        ultimo = calendar.monthrange(y, m)[1]
+        cuantos = min(ultimo - dia + 1, n - len(salida))
+        if formato == "dmy":
+            sufijo = f"-{m:02d}-{y:04d}"
+            salida.extend(_DD[d] + sufijo for d in range(dia, dia + cuantos))
+        else:
+            prefijo = f"{y:04d}-{m:02d}-"
+            salida.extend(prefijo + _DD[d] for d in range(dia, dia + cuantos))
+        dia = 1
+        m += 1
+        if m == 13:
+            y, m = y + 1, 1
+    return salida
+
+
+def _ffill(col):
+    """Arrastra el último valor no-NaN hacia delante (in situ para listas)."""
+    if np is not None and isinstance(col, np.ndarray):
+        validos = ~np.isnan(col)
+        idx = np.where(validos, np.arange(col.size), 0)
+        np.maximum.accumulate(idx, out=idx)
+        out = col[idx]
+        out[~validos & (np.cumsum(validos) == 0)] = np.nan
+        return out
+    ultimo = math.nan
+    for i, v in enumerate(col):
+        if v != v:  # NaN
+            col[i] = ultimo
+        else:
+            ultimo = v
+    return col
+
+
+def rellenar(ordinales, columnas, inicio: int = None, fin: int = None, politica: str = FFILL):
+    """
+    ordinales: secuencia de ordinales observados (sin repetir, en cualquier orden).
+    columnas:  {clave: secuencia de precios (None/NaN = sin dato)} alineada con `ordinales`.
+    Devuelve (ordinales_salida, {clave: lista de precios | None}) del rango [inicio, fin].
+    """
+    if politica not in POLITICAS:
+        raise ValueError(f"Política de relleno desconocida: {politica!r}")
+    if not len(ordinales):
+        return [], {k: [] for k in columnas}
+    inicio = min(ordinales) if inicio is None else inicio
+    fin = max(ordinales) if fin is None else fin
+    n = fin - inicio + 1
+    if n <= 0:
+        return [], {k: [] for k in columnas}
+
+    posiciones = [o - inicio for o in ordinales]
+    salida = {}
+    for clave, valores in columnas.items():
+        if np is not None:
+            densa = np.full(n, np.nan)
+            pos = np.asarray(posiciones)
+            vals = np.asarray([math.nan if v is None else v for v in valores], dtype=float)
+            dentro = (pos >= 0) & (pos < n)
+            densa[pos[dentro]] = vals[dentro]
+        else:
+            densa = [math.nan] * n
+            for p, v in zip(posiciones, valores):
+                if 0 <= p < n and v is not None:
+                    densa[p] = v
+        if politica != HUECOS:
+            densa = _ffill(densa)
+        salida[clave] = densa
+
+    ords = range(inicio, fin + 1)
+    if politica == LABORABLES:
+        # date.fromordinal(1) es lunes: weekday = (ordinal - 1) % 7
+        desfase = (inicio - 1) % 7
+        indices = [i for i in range(n) if (i + desfase) % 7 < 5]
+        ords = [inicio + i for i in indices]
+        salida = {k: [col[i] for i in indices] for k, col in salida.items()}
+
+    return list(ords), {
+        k: [None if v != v else float(v) for v in col] for k, col in salida.items()
+    }
+
+
+def rellenar_serie(lista, hasta: date = None, politica: str = FFILL):
+    """
+    Serie [{fecha, precio_eur_kg}] (ISO) → serie diaria completa desde su primera fecha
+    hasta `hasta` (por defecto la última fecha de la serie). Los días sin dato se omiten
+    solo con la política "huecos"; al principio no hay nada que arrastrar.
+    """
+    if not lista:
+        return []
+    ordinales = [date.fromisoformat(d["fecha"]).toordinal() for d in lista]
+    valores = [d["precio_eur_kg"] for d in lista]
+    fin = hasta.toordinal() if hasta else None
+    ords, cols = rellenar(ordinales, {"p": valores}, fin=fin, politica=politica)
+    fechas = fechas_para(ords)
+    return [
+        {"fecha": f, "precio_eur_kg": v}
+        for f, v in zip(fechas, cols["p"]) if v is not None
+    ]
+
+
+def fechas_para(ords, formato: str = "iso"):
+    """Formatea en bloque una lista ascendente de ordinales (contiguos o no)."""
+    if not ords:
+        return []
+    todas = fechas_iso(ords[0], ords[-1] - ords[0] + 1, formato)
+    if len(todas) == len(ords):
+        return todas
+    return [todas[o - ords[0]] for o in ords]
@@ -0,0 +1,122 @@
+# rollups.py
+# Agregados diario/semanal/mensual/anual (apertura, máximo, mínimo, cierre y media)
+# por tipo de aceite, como JSON estáticos pequeños para que la web descargue solo
+# la resolución que necesita en lugar de todo precios2015.txt.
+#
+# Salida (carpeta rollups/):
+#   diario.json, semanal.json, mensual.json, anual.json
+#       {"periodos": [...], "series": {tipo: {"o": [], "h": [], "l": [], "c": [], "m": []}}}
+#       (en diario solo "c": un día tiene un único precio)
+#   indice.json
+#       por resolución: archivo, nº de periodos, rango y offsets {año: posición}
+#       para cortar un rango sin recorrer el array.
+#
+# Fuente: la serie binaria precios2015.bin y, si el almacén del histórico tiene
+# días posteriores (scrape de hoy aún no volcado al texto), se añaden al final.
+
+import json
+from datetime import timedelta
+from pathlib import Path
+
+import escritura
+from historico_store import HIST_KEYS, HistoricoStore
+from serie_binaria import BIN_FILE, cargar_serie
+
+ROLLUPS_DIR = Path("rollups")
+
+RESOLUCIONES = {
+    "diario": lambda d: d.isoformat(),
+    "semanal": lambda d: (d - timedelta(days=d.weekday())).isoformat(),  # lunes de la semana
+    "mensual": lambda d: f"{d.year:04d}-{d.month:02d}",
+    "anual": lambda d: f"{d.year:04d}",
+}
+
+
+def agregar(fechas, cols, clave_periodo):
+    """Una pasada: agrupa días consecutivos del mismo periodo y calcula OHLC + media."""
+    periodos = []
+    series = {k: {"o": [], "h": [], "l": [], "c": [], "m": []} for k in cols}
+    acumulado = {k: None for k in cols}  # [o, h, l, c, suma, n]
+
+    def _cerrar():
+        for k, acc in acumulado.items():
+            s = series[k]
+            if acc is None:
+                for campo in s:
+                    s[campo].append(None)
+            else:
+                o, h, l, c, suma, n = acc
+                s["o"].append(o)
+                s["h"].append(h)
+                s["l"].append(l)
+                s["c"].append(c)
+                s["m"].append(round(suma / n, 3))
+
+    actual = None
+    for i, d in enumerate(fechas):
+        p = clave_periodo(d)
+        if p != actual:
+            if actual is not None:
+                _cerrar()
+            actual = p
+            periodos.append(p)
+            acumulado = {k: None for k in cols}
+        for k, col in cols.items():
+            v = col[i]
+            if v is None:
+                continue
+            acc = acumulado[k]
+            if acc is None:
+                acumulado[k] = [v, v, v, v, v, 1]
+            else:
+                acc[1] = max(acc[1], v)
+                acc[2] = min(acc[2], v)
+                acc[3] = v
+                acc[4] += v
+                acc[5] += 1
+    if actual is not None:
+        _cerrar()
+    return periodos, series
+
+
+def _offsets_por_anio(periodos):
+    offsets = {}
+    for i, p in enumerate(periodos):
+        offsets.setdefault(p[:4], i)
+    return offsets
+
+
+def _escribir_compacto(path: Path, data) -> int:
+    texto = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return escritura.escribir(path, texto)
+
+
+def generar(salida=ROLLUPS_DIR, bin_path=BIN_FILE, store: HistoricoStore = None, serie=None) -> dict:
+    """Genera todos los agregados y el índice (`serie`: (fechas, cols) ya cargada). Devuelve el índice."""
+    salida = Path(salida)
+    salida.mkdir(parents=True, exist_ok=True)
+    fechas, cols = serie or cargar_serie(bin_path, store)
+
+    indice = {"tipos": HIST_KEYS, "resoluciones": {}}
+    for nombre, clave_periodo in RESOLUCIONES.items():
+        periodos, series = agregar(fechas, cols, clave_periodo)
+        if nombre == "diario":
+            series = {k: {"c": s["c"]} for k, s in series.items()}
+        archivo = f"{nombre}.json"
+        tam = _escribir_compacto(salida / archivo, {"periodos": periodos, "series": series})
+        indice["resoluciones"][nombre] = {
+            "archivo": archivo,
+            "n": len(periodos),
+            "desde": periodos[0] if periodos else None,
+            "hasta": periodos[-1] if periodos else None,
+            "offsets": _offsets_por_anio(periodos),
+            "bytes": tam,
+        }
+    _escribir_compacto(salida / "indice.json", indice)
+    return indice
+
+
+if __name__ == "__main__":
+    idx = generar(store=HistoricoStore())
+    for nombre, r in idx["resoluciones"].items():
+        print(f"✅ rollups/{r['archivo']}: {r['n']} periodos, {r['bytes']} bytes")
@@ -1,66 +1,432 @@
 # scraper.py
+import argparse
+import asyncio
+import bisect
 import json
+import os
 import re
-from datetime import datetime, timedelta
+import signal
+import time
+import urllib.error
+import urllib.parse
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from html.parser import HTMLParser
 from pathlib import Path
-from playwright.sync_api import sync_playwright, TimeoutError as PwTimeout, Error as PwError
+
+import backfill
+import escritura
+import metricas
+from fuentes import HTTP_TIMEOUT, Infaoliva, cargar_fuentes
+from historico_store import HIST_KEYS, HistoricoStore
+from snapshot_cache import SNAPSHOTS_DIR, SnapshotCache, hash_tabla
+
+INFAOLIVA_URL = Infaoliva.url
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124 Safari/537.36"
+)
+
+# Recursos que el navegador no necesita descargar para leer la tabla
+TIPOS_BLOQUEADOS = frozenset({"image", "media", "font"})
+TIMEOUT_NAVEGACION_MS = 30_000
+TIMEOUT_TABLA_MS = 15_000
+ESPERA_REINTENTO = 1.0  # segundos; se duplica en cada reintento
+
+# Modo demonio
+DEMONIO_CADA = 300  # segundos entre sondeos
+DEMONIO_MAX_USOS = 100  # lecturas con el navegador antes de reciclarlo
+DEMONIO_MAX_MEMORIA_MB = 1024
+DEMONIO_PUERTO = 8787
 
 JSON_CURRENT = Path("precio-aceite.json")
 JSON_HISTORY = Path("precio-aceite-historico.json")
 
-OBSERVATORIO_KEYS = ("observatorio", "precios", "aceite")
+# Días que se publican en precio-aceite-historico.json (~24 meses)
+DIAS_HISTORICO_WEB = 31 * 24
+
+
+# Una sola evaluación en la página: todas las tablas (cabeceras + celdas) y los
+# encabezados candidatos con el índice de la tabla que les sigue. Así evitamos
+# una ida y vuelta al navegador por cada tabla, fila o celda.
+_JS_SNAPSHOT = """
+(selector) => {
+  const tablas = Array.from(document.querySelectorAll("table"));
+  const snapTablas = tablas.map(t => ({
+    cabeceras: Array.from(t.querySelectorAll("th")).map(th => th.textContent || ""),
+    filas: Array.from(t.querySelectorAll("tr")).map(tr =>
+      Array.from(tr.querySelectorAll("td")).map(td => td.innerText || "")
+    ),
+  }));
+  const candidatos = Array.from(document.querySelectorAll(selector)).map(el => {
+    const sig = document.evaluate("following::table[1]", el, null,
+      XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    return { texto: el.innerText || "", tabla: sig ? tablas.indexOf(sig) : -1 };
+  });
+  return { tablas: snapTablas, candidatos: candidatos };
+}
+"""
+
+SELECTOR_CANDIDATOS = "h1,h2,h3,h4,p,section"
+
+
+class _SnapshotHTMLParser(HTMLParser):
+    """
+    Construye, a partir del HTML estático, el mismo snapshot que _JS_SNAPSHOT:
+    tablas con cabeceras y celdas, y encabezados candidatos con el índice de la
+    primera tabla que aparece después de que se cierran (eje XPath following::).
+    """
+
+    CANDIDATOS = frozenset(SELECTOR_CANDIDATOS.split(","))
+    BLOQUES = frozenset({"br", "p", "div", "tr", "li", "section",
+                         "h1", "h2", "h3", "h4", "h5", "h6"})
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tablas = []
+        self.candidatos = []
+        self._abiertos = []       # candidatos abiertos: (tag, partes_de_texto)
+        self._tablas_abiertas = []
+        self._celda = None        # partes de texto de la celda/th actual
+        self._celda_th = False
+        self._ignorar = 0         # dentro de <script>/<style>
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self._ignorar += 1
+            return
+        if tag in self.BLOQUES:
+            self._texto("\n")
+        if tag in self.CANDIDATOS:
+            self._abiertos.append((tag, []))
+        if tag == "table":
+            tabla = {"cabeceras": [], "filas": []}
+            self.tablas.append(tabla)
+            self._tablas_abiertas.append(tabla)
+        elif not self._tablas_abiertas:
+            return
+        elif tag == "tr":
+            self._cerrar_celda()
+            self._tablas_abiertas[-1]["filas"].append([])
+        elif tag in ("td", "th"):
+            self._cerrar_celda()
+            self._celda = []
+            self._celda_th = tag == "th"
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style"):
+            self._ignorar = max(0, self._ignorar - 1)
+            return
+        if tag in ("td", "th", "tr"):
+            self._cerrar_celda()
+        elif tag == "table" and self._tablas_abiertas:
+            self._cerrar_celda()
+            self._tablas_abiertas.pop()
+        if tag in self.CANDIDATOS:
+            for i in range(len(self._abiertos) - 1, -1, -1):
+                if self._abiertos[i][0] == tag:
+                    _, partes = self._abiertos.pop(i)
+                    # la siguiente tabla que se abra será la "following::table[1]"
+                    self.candidatos.append({"texto": "".join(partes), "tabla": len(self.tablas)})
+                    break
+
+    def handle_data(self, data):
+        if not self._ignorar:
+            self._texto(data)
+
+    def _texto(self, data):
+        for _, partes in self._abiertos:
+            partes.append(data)
+        if self._celda is not None:
+            self._celda.append(data)
+
+    def _cerrar_celda(self):
+        if self._celda is None or not self._tablas_abiertas:
+            return
+        texto = " ".join("".join(self._celda).split())
+        tabla = self._tablas_abiertas[-1]
+        if self._celda_th:
+            tabla["cabeceras"].append(texto)
+        else:
+            if not tabla["filas"]:
+                tabla["filas"].append([])
+            tabla["filas"][-1].append(texto)
+        self._celda = None
+
+    def snapshot(self):
+        total = len(self.tablas)
+        candidatos = [
+            {"texto": c["texto"], "tabla": c["tabla"] if c["tabla"] < total else -1}
+            for c in self.candidatos
+        ]
+        return {"tablas": self.tablas, "candidatos": candidatos}
+
+
+def _snapshot_desde_html(html: str):
+    """Snapshot de tablas y encabezados a partir de HTML estático (sin navegador)."""
+    parser = _SnapshotHTMLParser()
+    parser.feed(html)
+    parser.close()
+    return parser.snapshot()
+
+
+def _descargar_html(url: str, timeout: float = HTTP_TIMEOUT, cabeceras: dict = None):
+    """
+    Descarga la página. Devuelve (html, meta) con ETag/Last-Modified en `meta`;
+    si la petición condicional responde 304, html es None y meta["no_modificado"] = True.
+    """
+    import urllib.request  # solo en el camino que va a la red
+
+    req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT, **(cabeceras or {})})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            charset = resp.headers.get_content_charset() or "utf-8"
+            meta = {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+            return resp.read().decode(charset, errors="replace"), meta
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None, {"no_modificado": True}
+        raise
+
+
+@contextmanager
+def fase(nombre: str):
+    """Mide la duración (ms, reloj monotónico) de una fase en las métricas de la ejecución."""
+    t0 = time.perf_counter()
+    try:
+        with metricas.actual.fase(nombre):
+            yield
+    finally:
+        print(f"⏱️ {nombre}: {round((time.perf_counter() - t0) * 1000, 1)} ms")
+
+
+def _dominio_base(host: str) -> str:
+    """'www.infaoliva.com' -> 'infaoliva.com' (suficiente para distinguir terceros)."""
+    partes = (host or "").lower().split(".")
+    return ".".join(partes[-2:])
+
+
+def _filtro_recursos(url: str):
+    """
+    Manejador de peticiones para page.route: aborta imágenes, media, fuentes y
+    cualquier dominio de terceros (analítica, anuncios, CDNs externos).
+    Devuelve (handler, contador) con contador = {"abortadas": n, "permitidas": m}.
+    """
+    propio = _dominio_base(urllib.parse.urlsplit(url).hostname)
+    contador = {"abortadas": 0, "permitidas": 0}
+
+    def _handler(route):
+        req = route.request
+        host = urllib.parse.urlsplit(req.url).hostname or ""
+        tercero = host and _dominio_base(host) != propio
+        if req.resource_type in TIPOS_BLOQUEADOS or tercero:
+            contador["abortadas"] += 1
+            return route.abort()
+        contador["permitidas"] += 1
+        return route.continue_()
+
+    return _handler, contador
+
+
+async def _leer_tabla_http(fuente, cabeceras: dict = None):
+    """
+    Ruta rápida sin navegador: descarga el HTML (en un hilo, para no bloquear las
+    demás fuentes) y busca la tabla con las reglas de la fuente. Devuelve
+    (tabla, meta); tabla es None si la tabla no está en el HTML estático o si el
+    servidor respondió 304 (meta["no_modificado"]).
+    """
+    with fase(f"{fuente.id}.http_descarga"):
+        html, meta = await asyncio.wait_for(
+            asyncio.to_thread(_descargar_html, fuente.url, fuente.timeout, cabeceras),
+            fuente.timeout,
+        )
+    if html is None:
+        return None, meta
+    metricas.actual.contar(f"{fuente.id}.bytes_descargados", len(html.encode("utf-8")))
 
-# Claves canónicas para el histórico
-HIST_KEYS = [
-    "Aceite de oliva virgen extra",
-    "Aceite de oliva virgen",
-    "Aceite de oliva lampante",
-]
+    with fase(f"{fuente.id}.http_parseo"):
+        tabla = fuente.localizar_tabla(_snapshot_desde_html(html))
+    if not fuente.tabla_valida(tabla):
+        print(f"ℹ️ [{fuente.id}] La tabla no está en el HTML estático.")
+        return None, meta
+    return tabla, meta
 
 
-def _to_float_eur(texto: str) -> float:
+class _NavegadorCompartido:
     """
-    Convierte '3.600 €' / '3,600 €' / '3.6' a float.
-    Mantiene '.' como decimal y cambia ',' a '.'
+    Un único Chromium headless para todas las fuentes, con un contexto por fuente.
+    Solo se arranca si alguna fuente llega a necesitarlo.
+    Con `persistente` (modo demonio) cada fuente conserva su contexto y su página,
+    con las cookies ya aceptadas, y los siguientes sondeos solo recargan la página.
     """
-    m = re.search(r"\d+(?:[.,]\d+)?", texto)
-    if not m:
-        raise ValueError(f"No se encontró número en: {texto!r}")
-    n = m.group(0).replace(",", ".")
-    return float(n)
-
-
-def _tabla_con_cabeceras(page):
-    """Busca una tabla con cabeceras tipo/variedad/precio."""
-    tablas = page.locator("table")
-    count = tablas.count()
-    for i in range(count):
-        ths = tablas.nth(i).locator("th").all_text_contents()
-        th_text = " ".join(t.lower().strip() for t in ths)
-        if th_text and (("tipo" in th_text or "tipo de aceite" in th_text)
-                        and "variedad" in th_text
-                        and "precio" in th_text):
-            return tablas.nth(i)
-    return None
-
-
-def _tabla_despues_de_observatorio(page):
-    """Fallback: busca encabezado con 'observatorio', 'precios', 'aceite' y toma la tabla siguiente."""
-    candidatos = page.locator("h1,h2,h3,h4,p,section")
-    count = candidatos.count()
-    for i in range(count):
+
+    def __init__(self, bloquear: bool = True, persistente: bool = False):
+        self.bloquear = bloquear
+        self.persistente = persistente
+        self.usos = 0
+        self._pw = None
+        self._browser = None
+        self._paginas = {}  # id de fuente -> (contexto, página, contador de peticiones)
+        self._lock = asyncio.Lock()
+
+    async def _navegador(self):
+        async with self._lock:
+            if self._browser is None:
+                from playwright.async_api import async_playwright
+
+                with fase("navegador_arranque"):
+                    self._pw = await async_playwright().start()
+                    self._browser = await self._pw.chromium.launch(headless=True)
+        return self._browser
+
+    async def _abrir_pagina(self, fuente):
+        browser = await self._navegador()
+        print(f"🔎 [{fuente.id}] Abriendo {fuente.url} con Playwright…")
+        ctx = await browser.new_context(user_agent=USER_AGENT)
         try:
-            txt = candidatos.nth(i).inner_text().strip().lower()
-        except PwError:
-            continue
-        if all(k in txt for k in OBSERVATORIO_KEYS):
-            tabla = candidatos.nth(i).locator("xpath=following::table[1]")
-            if tabla.count() > 0:
-                return tabla.first
-    return None
+            page = await ctx.new_page()
+            contador = None
+            if self.bloquear:
+                handler, contador = _filtro_recursos(fuente.url)
+                await page.route("**/*", handler)
 
+            with fase(f"{fuente.id}.navegacion"):
+                await page.goto(fuente.url, wait_until="domcontentloaded", timeout=TIMEOUT_NAVEGACION_MS)
 
-def _read_json(path: Path, default):
+            # Pulsar el consentimiento de cookies solo si llega a tapar la tabla; no se espera por él
+            # (Playwright < 1.42 no tiene add_locator_handler: clic inmediato si ya está visible)
+            boton = page.get_by_role("button", name=re.compile("aceptar|accept|consent|consentir", re.I))
+            if hasattr(page, "add_locator_handler"):
+                async def _aceptar(loc):
+                    metricas.actual.contar(f"{fuente.id}.cookies_aceptadas")
+                    await loc.click()
+
+                await page.add_locator_handler(boton, _aceptar)
+                metricas.actual.contar(f"{fuente.id}.llamadas_locator")
+            elif await boton.first.is_visible():
+                await boton.first.click(timeout=1000)
+        except BaseException:
+            await ctx.close()
+            raise
+        return ctx, page, contador
+
+    async def leer_tabla(self, fuente):
+        from playwright.async_api import TimeoutError as PwTimeout
+
+        self.usos += 1
+        abierta = self._paginas.pop(fuente.id, None)
+        ctx, page, contador = abierta or await self._abrir_pagina(fuente)
+        try:
+            if abierta is not None:
+                with fase(f"{fuente.id}.recarga"):
+                    await page.reload(wait_until="domcontentloaded", timeout=TIMEOUT_NAVEGACION_MS)
+
+            # Esperar a que exista alguna tabla con celdas en lugar de dormir un tiempo fijo
+            metricas.actual.contar(f"{fuente.id}.llamadas_locator", 2)  # espera + evaluación
+            try:
+                with fase(f"{fuente.id}.espera_tabla"):
+                    await page.wait_for_selector("table tr td", state="attached", timeout=TIMEOUT_TABLA_MS)
+            except PwTimeout:
+                print(f"⚠️ [{fuente.id}] No apareció ninguna tabla con datos; se intenta leer igualmente.")
+
+            # Una sola evaluación en la página
+            with fase(f"{fuente.id}.extraccion"):
+                snapshot = await page.evaluate(_JS_SNAPSHOT, SELECTOR_CANDIDATOS)
+        except BaseException:
+            # una página rota no se reutiliza: el siguiente sondeo abre otra
+            await ctx.close()
+            raise
+
+        if self.persistente:
+            self._paginas[fuente.id] = (ctx, page, contador)
+        else:
+            await ctx.close()
+
+        if contador is not None:
+            metricas.actual.contar(f"{fuente.id}.peticiones_abortadas", contador["abortadas"])
+            metricas.actual.contar(f"{fuente.id}.peticiones_permitidas", contador["permitidas"])
+            print(f"🚫 [{fuente.id}] Peticiones abortadas: {contador['abortadas']} "
+                  f"(permitidas: {contador['permitidas']})")
+            contador.update(abortadas=0, permitidas=0)
+        return fuente.localizar_tabla(snapshot)
+
+    async def cerrar(self):
+        for ctx, _, _ in self._paginas.values():
+            await ctx.close()
+        self._paginas = {}
+        if self._browser is not None:
+            await self._browser.close()
+        if self._pw is not None:
+            await self._pw.stop()
+        self._browser = self._pw = None
+        self.usos = 0
+
+
+def _reintentable(e: Exception) -> bool:
+    """Errores transitorios: red, timeouts, 5xx/429. Un 404 o Playwright sin instalar no mejoran reintentando."""
+    if isinstance(e, urllib.error.HTTPError):
+        return e.code >= 500 or e.code == 429
+    return not isinstance(e, ImportError)
+
+
+async def _leer_fuente(fuente, modo: str, navegador: _NavegadorCompartido, cache: SnapshotCache = None):
+    """
+    Lee la tabla de una fuente con sus propios timeouts y reintentos (solo ante
+    errores transitorios; una tabla que no está no se reintenta). Nunca lanza: el error queda en el resultado y no afecta a las demás.
+    modo: "auto" (HTTP y, si hace falta, navegador), "http" o "navegador".
+    """
+    resultado = {"fuente": fuente, "tabla": None, "meta": {}, "error": None, "intentos": 0}
+    t0 = time.perf_counter()
+    for intento in range(fuente.reintentos + 1):
+        resultado["intentos"] = intento + 1
+        try:
+            tabla, meta, ruta = None, {}, None
+            if modo != "navegador":
+                cabeceras = cache.cabeceras_condicionales() if cache is not None else None
+                tabla, meta = await _leer_tabla_http(fuente, cabeceras)
+                ruta = "http"
+                if meta.get("no_modificado"):
+                    print(f"♻️ [{fuente.id}] 304 Not Modified: se usa el último snapshot guardado.")
+                    tabla = cache.tabla_guardada()
+                    ruta = "http_304"
+            if tabla is None and modo != "http" and fuente.navegador:
+                tabla = await asyncio.wait_for(navegador.leer_tabla(fuente), fuente.timeout_navegador)
+                ruta = "navegador"
+            metricas.actual.marcar(f"{fuente.id}.ruta", ruta if tabla is not None else "ninguna")
+            if tabla is None:
+                resultado["error"] = "tabla no encontrada"
+            else:
+                resultado.update(tabla=tabla, meta=meta, error=None)
+            break
+        except Exception as e:  # aislar la fuente: red, timeout, Playwright ausente o caído
+            resultado["error"] = f"{type(e).__name__}: {e}".rstrip(": ")
+            print(f"⚠️ [{fuente.id}] Intento {intento + 1} fallido ({resultado['error']}).")
+            if not _reintentable(e):
+                break
+            if intento < fuente.reintentos:
+                await asyncio.sleep(ESPERA_REINTENTO * 2 ** intento)
+    resultado["duracion_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    metricas.actual.contar(f"{fuente.id}.intentos", resultado["intentos"])
+    return resultado
+
+
+async def recoger(fuentes, modo: str = "auto", bloquear: bool = True, caches: dict = None):
+    """Lee todas las fuentes a la vez: el tiempo total es el de la más lenta."""
+    navegador = _NavegadorCompartido(bloquear)
+    try:
+        return await asyncio.gather(*(
+            _leer_fuente(f, modo, navegador, (caches or {}).get(f.id)) for f in fuentes
+        ))
+    finally:
+        await navegador.cerrar()
+
+
+def _precios_por_tipo(filas):
+    """Filas de la fuente principal → {tipo: {"variedad", "precio_eur_kg"}} (formato de la web)."""
+    return {f["tipo"]: {"variedad": f["variedad"], "precio_eur_kg": f["precio_eur_kg"]} for f in filas}
+
+
+def read_json(path: Path, default):
     try:
         if path.exists():
             return json.loads(path.read_text(encoding="utf-8"))
@@ -70,25 +436,73 @@ def _read_json(path: Path, default):
 
 
 def _write_json(path: Path, data):
-    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    metricas.actual.contar("bytes_escritos", escritura.escribir_json(path, data))
 
 
-def _ensure_history_structure(hist):
-    """Asegura el formato del archivo histórico."""
-    if not isinstance(hist, dict):
-        hist = {}
-    for k in HIST_KEYS:
-        if k not in hist or not isinstance(hist[k], list):
-            hist[k] = []
-    return hist
+def ya_cerrado(fecha_iso: str, store: HistoricoStore = None, actual: dict = None) -> bool:
+    """
+    Comprobación previa: ¿están ya los cierres de `fecha_iso`? Solo lee el registro de
+    esa fecha en el almacén del histórico (por posición, sin recorrerlo) y la fecha de
+    precio-aceite.json (o el `actual` ya leído); no abre la red ni importa Playwright.
+    """
+    valores = (store or HistoricoStore()).valores(fecha_iso)
+    if valores is None or any(v is None for v in valores):
+        return False
+    if actual is None:
+        actual = read_json(JSON_CURRENT, {})
+    return (str(actual.get("ultima_actualizacion", ""))[:10] == fecha_iso
+            and not actual.get("sin_cierre_operaciones"))
 
 
-def _append_history_if_needed(hist, precios_hoy, fecha_iso):
+def _conciliar_con_texto(hist: dict, txt_path) -> int:
     """
-    Añade una entrada al histórico por cada clave canónica si hay precio numérico hoy.
-    Evita duplicar por la misma fecha. Devuelve True si hubo cambios.
+    Pone en `hist` ({clave: [{fecha, precio_eur_kg}]}) el cierre de precios2015.txt en
+    las fechas que trae el texto: es la serie que mantiene el pipeline y la que lee la
+    web como respaldo, así que el almacén no puede contradecirla. Devuelve cuántos
+    precios se han corregido.
     """
-    changed = False
+    from parser_historico import dias_ordenados
+
+    if not Path(txt_path).exists():
+        return 0
+    fechas = {item.get("fecha") for lista in hist.values() for item in lista or []}
+    texto = {f.isoformat(): valores for f, valores in dias_ordenados(txt_path) if f.isoformat() in fechas}
+    corregidos = 0
+    for k, lista in hist.items():
+        for item in lista or []:
+            v = texto.get(item.get("fecha"), {}).get(k)
+            if v is not None and item.get("precio_eur_kg") != v:
+                item["precio_eur_kg"] = v
+                corregidos += 1
+    return corregidos
+
+
+def abrir_historico() -> HistoricoStore:
+    """
+    Abre el almacén del histórico; la primera vez lo migra desde el JSON existente,
+    con los cierres de precios2015.txt donde los dos no coinciden.
+    """
+    from serie_binaria import TXT_FILE
+
+    store = HistoricoStore()
+    if not store.dat_path.exists() and not store.log_path.exists():
+        hist = read_json(JSON_HISTORY, {})
+        if isinstance(hist, dict) and hist:
+            print("🗃️ Migrando precio-aceite-historico.json al almacén indexado…")
+            corregidos = _conciliar_con_texto(hist, TXT_FILE)
+            if corregidos:
+                print(f"🔧 {corregidos} precio(s) del JSON corregidos con {TXT_FILE}.")
+            store.importar_json(hist)
+    return store
+
+
+def precios_para_historico(store: HistoricoStore, precios_hoy, fecha_iso, validador=None, origen="scraper") -> dict:
+    """
+    {clave canónica: precio} de `precios_hoy` que pueden entrar en el histórico. Con
+    `validador` (validacion.Validador) se omiten las claves que ya tiene el almacén y
+    los precios rechazados van a la cuarentena en lugar de descartarse en silencio.
+    """
+    nuevos = {}
     for k in HIST_KEYS:
         val = precios_hoy.get(k, {}).get("precio_eur_kg")
         try:
@@ -96,109 +510,531 @@ def _append_history_if_needed(hist, precios_hoy, fecha_iso):
         except Exception:
             val = None
 
+        if validador is not None:
+            if val is not None and not store.tiene(fecha_iso, k):
+                nuevos[k] = val  # el rango lo comprueba el validador
+            continue
         if not (val and 0 < val < 20):
             continue  # no añadir si no hay precio válido
 
-        # evitar duplicado por fecha exacta
-        ya = any(item.get("fecha") == fecha_iso for item in hist[k])
-        if not ya:
-            hist[k].append({"fecha": fecha_iso, "precio_eur_kg": round(val, 3)})
-            changed = True
+        nuevos[k] = val
+
+    if validador is not None and nuevos:
+        import validacion
+
+        nuevos, rechazos = validador.validar(date.fromisoformat(fecha_iso), nuevos)
+        for r in rechazos:
+            print(f"🚫 {r['fecha']} {r['tipo']} = {r['precio']}: {r['motivo']} ({r['detalle']}); a cuarentena.")
+        metricas.actual.contar("precios_en_cuarentena", len(rechazos))
+        validacion.poner_en_cuarentena(rechazos, origen)
+    return nuevos
+
+
+def _append_history_if_needed(store: HistoricoStore, precios_hoy, fecha_iso, validador=None, origen="scraper"):
+    """
+    Añade una entrada al histórico por cada clave canónica si hay precio numérico hoy.
+    Evita duplicar por la misma fecha (índice por fecha del almacén). Devuelve True si hubo cambios.
+    """
+    nuevos = precios_para_historico(store, precios_hoy, fecha_iso, validador, origen)
+    return bool(nuevos) and store.anadir(fecha_iso, nuevos)
+
+
+def publicar_historico(store: HistoricoStore):
+    """Regenera lo que la web lee del histórico tras añadir días al almacén."""
+    import exportar_historico
+    import rollups
+    from serie_binaria import BIN_FILE, cargar_serie
+
+    # el JSON de la web solo cubre ~24 meses: su coste no crece con el histórico
+    m = metricas.actual
+    with fase("publicar.historico_json"):
+        store.exportar_json(JSON_HISTORY, dias=DIAS_HISTORICO_WEB)
+    m.contar("bytes_escritos", JSON_HISTORY.stat().st_size)
+    print("📈 precio-aceite-historico.json actualizado.")
+    with fase("publicar.serie"):
+        serie = cargar_serie(BIN_FILE, store)  # una sola lectura para agregados y años
+    with fase("publicar.rollups"):
+        indice = rollups.generar(store=store, serie=serie)
+    m.contar("bytes_escritos", sum(r["bytes"] for r in indice["resoluciones"].values()))
+    print("📊 Agregados diario/semanal/mensual/anual actualizados (rollups/).")
+    with fase("publicar.anios"):
+        manifest = exportar_historico.exportar(store=store, serie=serie)
+    m.contar("ficheros_anuales_nuevos", len(manifest["cambiados"]))
+    print(f"🗂️ Histórico por años exportado ({len(manifest['cambiados'])} ficheros nuevos).")
+
+
+def actualizar_indicadores(store: HistoricoStore, completa: bool = False):
+    """Medias móviles, volatilidad, variación anual y diferencial (indicadores.json)."""
+    import indicadores
+
+    with fase("indicadores"):
+        modo = indicadores.actualizar(store, completa=completa)
+    if modo:
+        print(f"📐 Indicadores actualizados ({modo}): {indicadores.INDICADORES_FILE}")
+
+
+def precios_canonicos(filas):
+    """Filas de un adaptador → {clave canónica: fila} (la primera fila de cada clave)."""
+    precios_map = {}
+    for fila in filas:
+        if fila["clave"] and fila["clave"] not in precios_map:
+            precios_map[fila["clave"]] = fila
+    return precios_map
+
+
+async def _leer_dia(fuente, url: str):
+    """
+    Página histórica de un día → (estado, filas). Reintenta solo errores transitorios;
+    una página inexistente (4xx), sin tabla o sin cierre es SIN_DATOS, no un error.
+    """
+    for intento in range(fuente.reintentos + 1):
+        try:
+            html, _ = await asyncio.wait_for(
+                asyncio.to_thread(_descargar_html, url, fuente.timeout), fuente.timeout
+            )
+            break
+        except Exception as e:
+            if isinstance(e, urllib.error.HTTPError) and not _reintentable(e):
+                return backfill.SIN_DATOS, []
+            if not _reintentable(e) or intento == fuente.reintentos:
+                print(f"⚠️ {url}: {type(e).__name__}: {e}")
+                return backfill.ERROR, []
+            await asyncio.sleep(ESPERA_REINTENTO * 2 ** intento)
+
+    tabla = fuente.localizar_tabla(_snapshot_desde_html(html))
+    if not fuente.tabla_valida(tabla):
+        return backfill.SIN_DATOS, []
+    filas, _ = fuente.filas(tabla)
+    return (backfill.OK if filas else backfill.SIN_DATOS), filas
 
-    # ordenar por fecha ascendente y podar a 24 meses (aprox 730 días)
-    if changed:
-        limite = datetime.utcnow() - timedelta(days=31 * 24)  # ~24 meses
+
+def _anotar(fechas, cols, fecha: date, valores: dict):
+    """Pone los precios de `fecha` en la serie (fechas, {clave: [precio]}) en memoria."""
+    i = bisect.bisect_left(fechas, fecha)
+    if i == len(fechas) or fechas[i] != fecha:
+        fechas.insert(i, fecha)
         for k in HIST_KEYS:
-            # parse y ordena
-            def _pdate(x):
-                try:
-                    return datetime.fromisoformat(x.get("fecha", "1970-01-01"))
-                except Exception:
-                    return datetime(1970, 1, 1)
+            cols[k].insert(i, None)
+    for k, v in valores.items():
+        if v is not None:
+            cols[k][i] = v
+
+
+def _backfill(args):
+    """Reconstruye cierres reales de [desde, hasta] desde las páginas históricas."""
+    plantilla = args.plantilla
+    try:
+        desde, hasta = date.fromisoformat(args.desde), date.fromisoformat(args.hasta)
+        plantilla.format(fecha="", dia="", mes="", anio="")
+    except (ValueError, KeyError, IndexError) as e:
+        print(f"❌ Parámetros de backfill no válidos: {e}")
+        raise SystemExit(2)
+
+    fuente = Infaoliva()
+    checkpoint = backfill.Checkpoint(args.checkpoint, origen=plantilla)
+    if args.reiniciar:
+        checkpoint.borrar()
+    todos = backfill.dias(desde, hasta, args.fines_de_semana)
+    pendientes = checkpoint.pendientes(todos)
+    print(f"⏪ Backfill {desde} → {hasta}: {len(pendientes)} días pendientes de {len(todos)} "
+          f"({args.trabajadores} trabajadores, {args.tasa} pet/s).")
 
-            hist[k].sort(key=_pdate)
-            hist[k] = [x for x in hist[k] if _pdate(x) >= limite]
+    import validacion
+    from serie_binaria import BIN_FILE, cargar_serie
 
-    return changed
+    store = abrir_historico()
+    # cada día se valida (salto, mediana, orden) contra los días anteriores a él, no
+    # contra la cola del histórico: la serie con el almacén encima, y los que se acepten
+    fechas, cols = cargar_serie(BIN_FILE, store)
+    nuevos = {}
 
+    def _url(d):
+        return plantilla.format(fecha=d.isoformat(), dia=f"{d.day:02d}", mes=f"{d.month:02d}", anio=f"{d.year:04d}")
 
-def main():
-    url = "https://www.infaoliva.com/"
-    print("🔎 Abriendo Infaoliva con Playwright…")
+    async def _tarea(d):
+        return await _leer_dia(fuente, _url(d))
 
-    precios = {}
-    sin_cierre_hoy = False  # bandera para cuando Infaoliva muestra “Sin cierre de operaciones”
+    def _al_resolver(d, estado, filas):
+        # mismo filtro y deduplicación por fecha que el scrape diario; el cerrojo deja
+        # que un scrape u otro backfill escriban entre día y día
+        if estado != backfill.OK:
+            return
+        with escritura.bloqueo():
+            store.recargar()
+            validador = validacion.Validador.antes_de(fechas, cols, d)
+            if _append_history_if_needed(store, precios_canonicos(filas), d.isoformat(), validador, origen="backfill"):
+                valores = dict(zip(HIST_KEYS, store.valores(d.isoformat())))
+                nuevos[d] = valores
+                _anotar(fechas, cols, d, valores)
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        ctx = browser.new_context(user_agent=(
-            "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
-            "(KHTML, like Gecko) Chrome/124 Safari/537.36"
+    t0 = time.perf_counter()
+    with fase("backfill"):
+        cuenta = asyncio.run(backfill.ejecutar(
+            pendientes, _tarea, _al_resolver, trabajadores=args.trabajadores,
+            limitador=backfill.TokenBucket(args.tasa, args.rafaga), checkpoint=checkpoint,
         ))
-        page = ctx.new_page()
+    for estado, n in cuenta.items():
+        metricas.actual.contar(f"backfill.dias_{estado}", n)
+    metricas.actual.contar("backfill.dias_nuevos", len(nuevos))
+    print(f"✅ Backfill en {time.perf_counter() - t0:.1f} s: {cuenta[backfill.OK]} días con precios "
+          f"({len(nuevos)} nuevos en el histórico), {cuenta[backfill.SIN_DATOS]} sin datos, "
+          f"{cuenta[backfill.ERROR]} con error (se reintentarán).")
+
+    if nuevos:
+        import actualiza_historico
+
+        with escritura.bloqueo():
+            store.recargar()
+            # el texto y la serie binaria llevan el precio arrastrado en esos días
+            actualiza_historico.incorporar(nuevos)
+            actualizar_indicadores(store, completa=True)
+            publicar_historico(store)
+    if cuenta[backfill.ERROR]:
+        raise SystemExit(1)
+    return cuenta
 
-        try:
-            page.goto(url, wait_until="load", timeout=60_000)
-        except PwTimeout:
-            print("❌ Timeout cargando Infaoliva.")
-            browser.close()
-            raise SystemExit(1)
 
-        # Aceptar cookies si aparece (best effort)
+def _seccion(resultado, filas, sin_cierre, previa: dict, ahora_utc: str):
+    """Sección de una fuente en precio-aceite.json; si falla o no trae precios, conserva los últimos."""
+    f = resultado["fuente"]
+    previa = previa or {}
+    seccion = {
+        "nombre": f.nombre,
+        "url": f.url,
+        "estado": "ok" if resultado["tabla"] is not None else "error",
+        "precios": filas or previa.get("precios", []),
+        "sin_cierre_operaciones": bool(sin_cierre),
+        "actualizado": ahora_utc if filas else previa.get("actualizado"),
+        "intentos": resultado["intentos"],
+        "duracion_ms": resultado["duracion_ms"],
+    }
+    if resultado["error"]:
+        seccion["error"] = resultado["error"]
+    return seccion
+
+
+def _memoria_mb() -> float:
+    """RSS (MB) de este proceso y sus descendientes (Chromium) según /proc; 0 si no hay /proc."""
+    try:
+        hijos, rss = {}, {}
+        for d in Path("/proc").iterdir():
+            if not d.name.isdigit():
+                continue
+            try:
+                campos = (d / "stat").read_text().rsplit(")", 1)[1].split()
+            except (OSError, IndexError):
+                continue
+            pid = int(d.name)
+            hijos.setdefault(int(campos[1]), []).append(pid)
+            rss[pid] = int(campos[21])
+    except OSError:
+        return 0.0
+    total, pendientes = 0, [os.getpid()]
+    while pendientes:
+        pid = pendientes.pop()
+        total += rss.get(pid, 0)
+        pendientes.extend(hijos.get(pid, []))
+    return round(total * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+
+
+async def _bucle_demonio(args):
+    import http_local
+
+    fuentes, modo, caches = preparar(args)
+    navegador = _NavegadorCompartido(bloquear=not args.sin_bloqueo, persistente=True)
+    estado = {"inicio": datetime.now(timezone.utc).isoformat(), "sondeos": 0, "reciclajes": 0,
+              "ultimo": None, "datos": read_json(JSON_CURRENT, None)}
+
+    def _ultimo(_):
+        return http_local.respuesta_json(estado)
+
+    def _salud(_):
+        return http_local.respuesta_json({"ok": True, "sondeos": estado["sondeos"],
+                                          "memoria_mb": estado.get("memoria_mb")})
+
+    servidor = await http_local.servir({"/": _ultimo, "/ultimo": _ultimo, "/salud": _salud},
+                                       args.host, args.puerto)
+    print(f"🛰️ Demonio: sondeo cada {args.cada} s (modo {modo}); último resultado en "
+          f"http://{args.host}:{args.puerto}/ultimo")
+
+    parar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
         try:
-            page.get_by_role("button", name=re.compile("aceptar|accept|consent|consentir", re.I)).click(timeout=3000)
-        except Exception:
+            loop.add_signal_handler(sig, parar.set)
+        except (NotImplementedError, RuntimeError):
             pass
 
-        page.wait_for_timeout(1500)
+    try:
+        while not parar.is_set():
+            m = metricas.reiniciar()
+            m.marcar("comando", "demonio")
+            t0 = time.perf_counter()
+            with fase("recoger"):
+                resultados = await asyncio.gather(*(
+                    _leer_fuente(f, modo, navegador, caches.get(f.id)) for f in fuentes
+                ))
+            try:
+                # escribir ficheros en un hilo: el endpoint sigue respondiendo
+                resultado = await asyncio.to_thread(_procesar_bloqueado, resultados, caches)
+            except SystemExit as e:
+                resultado = f"error ({e.code})"
+            m.marcar("resultado", resultado)
+            estado["sondeos"] += 1
+            estado["ultimo"] = {
+                "hora": datetime.now(timezone.utc).isoformat(),
+                "resultado": resultado,
+                "duracion_ms": round((time.perf_counter() - t0) * 1000, 1),
+                "fuentes": {r["fuente"].id: r["error"] or "ok" for r in resultados},
+            }
+            if resultado == "actualizado":
+                estado["datos"] = read_json(JSON_CURRENT, None)
+
+            # reciclar el navegador tras N usos o si la memoria crece demasiado
+            estado["memoria_mb"] = _memoria_mb()
+            m.marcar("memoria_mb", estado["memoria_mb"])
+            if navegador.usos >= args.max_sondeos or estado["memoria_mb"] > args.max_memoria_mb:
+                print(f"♻️ Reciclando el navegador ({navegador.usos} usos, {estado['memoria_mb']} MB).")
+                await navegador.cerrar()
+                estado["reciclajes"] += 1
+                m.contar("reciclajes_navegador")
+            m.escribir_jsonl(args.metricas)
+
+            try:
+                await asyncio.wait_for(parar.wait(), args.cada)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        servidor.close()
+        await servidor.wait_closed()
+        await navegador.cerrar()
+    print(f"🛑 Demonio detenido tras {estado['sondeos']} sondeos.")
+    return "detenido"
+
+
+def _demonio(args):
+    """Modo demonio: navegador y contextos calientes, sondeo periódico y endpoint local."""
+    return asyncio.run(_bucle_demonio(args))
 
-        # Localizar la tabla del observatorio
-        tabla = _tabla_con_cabeceras(page) or _tabla_despues_de_observatorio(page)
-        if tabla is None:
-            print("❌ No se encontró la tabla del Observatorio.")
-            browser.close()
-            raise SystemExit(1)
 
-        rows = tabla.locator("tr")
-        if rows.count() <= 1:
-            # solo cabecera => no hay datos
-            print("ℹ️ Tabla sin filas de datos (posible día sin cierre).")
-            sin_cierre_hoy = True
+def construir_parser(descripcion: str) -> argparse.ArgumentParser:
+    """Opciones comunes de lectura, caché y métricas (scraper.py y pipeline.py)."""
+    ap = argparse.ArgumentParser(description=descripcion)
+    ap.add_argument("--url", default=INFAOLIVA_URL, help="URL de Infaoliva (p. ej. un servidor local de pruebas)")
+    ap.add_argument("--fuentes", type=Path, help="JSON con fuentes adicionales (formato en fuentes.py)")
+    ap.add_argument("--solo-http", action="store_true",
+                    help="No usar navegador: sale con código 2 si la tabla de Infaoliva no está en el HTML estático")
+    ap.add_argument("--solo-navegador", action="store_true", help="Saltar la ruta HTTP y usar Playwright")
+    ap.add_argument("--sin-bloqueo", action="store_true",
+                    help="No bloquear imágenes, fuentes ni dominios de terceros en el navegador")
+    ap.add_argument("--sin-cache", action="store_true",
+                    help="Procesar aunque las tablas sean idénticas a las últimas procesadas hoy")
+    ap.add_argument("--force", action="store_true",
+                    help="Consultar la web aunque los cierres de hoy ya estén en el histórico")
+    ap.add_argument("--metricas", type=Path, default=metricas.METRICAS_FILE,
+                    help="Fichero JSON-lines al que se añaden las métricas de la ejecución")
+    ap.add_argument("--prometheus", type=Path, help="Escribir también las métricas en formato de texto de Prometheus")
+    return ap
+
+
+def main(argv=None):
+    ap = construir_parser("Scraper de precios del Observatorio de Infaoliva (y otras fuentes).")
+    ap.add_argument("--profile", nargs="?", const="scraper.prof", metavar="FICHERO",
+                    help="Ejecutar bajo cProfile, guardar las estadísticas y mostrar las funciones más costosas")
+
+    sub = ap.add_subparsers(dest="comando")
+    bf = sub.add_parser("backfill", help="Reconstruir cierres pasados desde las páginas históricas")
+    bf.add_argument("--desde", "--from", dest="desde", required=True, help="Primer día (AAAA-MM-DD)")
+    bf.add_argument("--hasta", "--to", dest="hasta", required=True, help="Último día (AAAA-MM-DD)")
+    bf.add_argument("--plantilla", required=True,
+                    help="URL de la página de un día con {fecha} (AAAA-MM-DD) o {dia}, {mes}, {anio}")
+    bf.add_argument("--trabajadores", type=int, default=backfill.TRABAJADORES, help="Descargas simultáneas")
+    bf.add_argument("--tasa", type=float, default=backfill.TASA, help="Peticiones por segundo")
+    bf.add_argument("--rafaga", type=int, default=backfill.RAFAGA, help="Peticiones seguidas permitidas")
+    bf.add_argument("--fines-de-semana", action="store_true", help="Pedir también sábados y domingos")
+    bf.add_argument("--checkpoint", type=Path, default=backfill.CHECKPOINT_FILE)
+    bf.add_argument("--reiniciar", action="store_true", help="Ignorar el checkpoint y empezar de cero")
+
+    dm = sub.add_parser("demonio", help="Sondear periódicamente con el navegador caliente")
+    dm.add_argument("--cada", type=float, default=DEMONIO_CADA, help="Segundos entre sondeos")
+    dm.add_argument("--max-sondeos", type=int, default=DEMONIO_MAX_USOS,
+                    help="Reciclar el navegador tras este número de lecturas con Playwright")
+    dm.add_argument("--max-memoria-mb", type=float, default=DEMONIO_MAX_MEMORIA_MB,
+                    help="Reciclar el navegador si el proceso y sus hijos superan esta memoria")
+    dm.add_argument("--host", default="127.0.0.1")
+    dm.add_argument("--puerto", type=int, default=DEMONIO_PUERTO)
+    args = ap.parse_args(argv)
+
+    m = metricas.reiniciar()
+    m.marcar("comando", args.comando or "scrape")
+    resultado = "error"
+    try:
+        if args.profile:
+            import cProfile
+            import pstats
+
+            perfil = cProfile.Profile()
+            try:
+                resultado = perfil.runcall(_ejecutar, args)
+            finally:
+                perfil.dump_stats(args.profile)
+                print(f"🧪 Perfil guardado en {args.profile}:")
+                pstats.Stats(perfil).sort_stats("cumulative").print_stats(20)
+        else:
+            resultado = _ejecutar(args)
+    except SystemExit as e:
+        m.marcar("codigo_salida", e.code if isinstance(e.code, int) else 1)
+        raise
+    finally:
+        m.marcar("resultado", resultado if isinstance(resultado, str) else "actualizado")
+        reg = m.escribir_jsonl(args.metricas)
+        if args.prometheus:
+            m.escribir_prometheus(args.prometheus)
+        print(f"📏 Métricas ({reg['duracion_ms']} ms) añadidas a {args.metricas}")
+    return resultado
+
+
+def preparar(args):
+    """Fuentes, modo de lectura y cachés de snapshots según la línea de órdenes."""
+    fuentes = cargar_fuentes(args.fuentes, url=args.url)
+    modo = "http" if args.solo_http else "navegador" if args.solo_navegador else "auto"
+    caches = {} if args.sin_cache else {f.id: SnapshotCache(SNAPSHOTS_DIR / f.id) for f in fuentes}
+    return fuentes, modo, caches
+
+
+def _ejecutar(args):
+    if args.comando == "backfill":
+        return _backfill(args)
+    if args.comando == "demonio":
+        return _demonio(args)
+
+    # Las ejecuciones posteriores del cron repiten lo que ya hizo la primera:
+    # si los cierres de hoy ya están guardados, terminar sin red ni navegador.
+    # Con fuentes adicionales no se aplica (pueden publicar más tarde).
+    if not args.force and not args.fuentes:
+        hoy = datetime.now(timezone.utc).date().isoformat()
+        with fase("prevuelo"):
+            cerrado = ya_cerrado(hoy)
+        metricas.actual.marcar("ya_cerrado", cerrado)
+        if cerrado:
+            print(f"⏭️ Los cierres de {hoy} ya están en el histórico y en precio-aceite.json; "
+                  "no se consulta la web (--force para hacerlo igualmente).")
+            return "ya_cerrado"
+
+    fuentes, modo, caches = preparar(args)
+    print(f"⚡ Leyendo {len(fuentes)} fuente(s) en paralelo (modo {modo})…")
+    with fase("recoger"):
+        resultados = asyncio.run(recoger(fuentes, modo, bloquear=not args.sin_bloqueo, caches=caches))
+    return _procesar_bloqueado(resultados, caches, solo_http=args.solo_http)
+
+
+def _procesar_bloqueado(resultados, caches: dict, solo_http: bool = False):
+    """_procesar con el cerrojo del directorio de datos (otro scraper o backfill espera)."""
+    with escritura.bloqueo():
+        return _procesar(resultados, caches, solo_http)
+
+
+def _procesar(resultados, caches: dict, solo_http: bool = False):
+    """
+    Del resultado de leer las fuentes a los ficheros: precio-aceite.json, histórico y
+    exportaciones. Devuelve "actualizado" o "sin_cambios" (no se toca nada).
+    """
+    import validacion
+
+    m = metricas.actual
+    lectura = revisar_lecturas(resultados, caches, solo_http)
+    if lectura is None:
+        return "sin_cambios"
+    principal, leidas, hashes = lectura
+
+    datos, filas_principal = escribir_actual(resultados)
+
+    # === Actualizar histórico (solo si HOY hubo precios numéricos nuevos en Infaoliva) ===
+    if filas_principal:
+        store = abrir_historico()
+
+        # Claves reales -> canónicas del histórico (resuelto por el adaptador de la fuente)
+        today_iso = datetime.now(timezone.utc).date().isoformat()
+        with fase("historico"):
+            validador = validacion.Validador.desde_store(store)
+            changed = _append_history_if_needed(store, precios_canonicos(filas_principal), today_iso, validador)
+        m.marcar("historico_actualizado", changed)
+
+        if changed:
+            actualizar_indicadores(store)
+            publicar_historico(store)
         else:
-            for r in range(1, rows.count()):  # saltar cabecera
-                celdas = rows.nth(r).locator("td")
-                if celdas.count() < 3:
-                    continue
-
-                try:
-                    tipo = celdas.nth(0).inner_text().strip()
-                    variedad = celdas.nth(1).inner_text().strip()
-                    precio_txt = celdas.nth(2).inner_text().strip()
-                except PwError:
-                    continue
-
-                # Detectar “sin cierre de operaciones”
-                if "sin cierre" in precio_txt.lower():
-                    sin_cierre_hoy = True
-                    continue
-
-                try:
-                    precio = _to_float_eur(precio_txt)
-                except ValueError:
-                    # celdas con guiones o texto no numérico
-                    continue
-
-                if tipo:
-                    precios[tipo] = {"variedad": variedad, "precio_eur_kg": precio}
-
-        browser.close()
+            print("ℹ️ Histórico sin cambios (ya existían entradas de hoy o los precios nuevos quedaron en cuarentena).")
+    else:
+        print("ℹ️ No se añade al histórico porque hoy no hubo precios numéricos.")
+
+    guardar_snapshots(leidas, hashes, caches)
+    return terminar(datos, principal)
+
+
+def revisar_lecturas(resultados, caches: dict, solo_http: bool = False):
+    """
+    Resume la lectura de las fuentes. Devuelve (principal, leidas, hashes) o None si
+    todas las tablas leídas coinciden con los snapshots ya procesados hoy.
+    """
+    m = metricas.actual
+    m.contar("fuentes", len(resultados))
+    m.contar("fuentes_fallidas", sum(r["tabla"] is None for r in resultados))
+    for r in resultados:
+        f = r["fuente"]
+        if r["tabla"] is None:
+            print(f"❌ [{f.id}] {r['error']} ({r['intentos']} intento(s), {r['duracion_ms']} ms)")
+        else:
+            print(f"✅ [{f.id}] tabla leída ({r['intentos']} intento(s), {r['duracion_ms']} ms)")
+
+    principal = next(r for r in resultados if r["fuente"].principal)
+    if principal["tabla"] is None and solo_http:
+        # el workflow reintenta con Playwright: no se escribe nada todavía
+        print("❌ Ruta HTTP sin resultado para Infaoliva y --solo-http activo.")
+        raise SystemExit(2)
+
+    # Mismo contenido que lo último procesado hoy en todas las fuentes leídas: no se parsea ni se escribe nada
+    leidas = [r for r in resultados if r["tabla"] is not None]
+    hashes = {r["fuente"].id: hash_tabla(r["tabla"]) for r in leidas}
+    if caches and leidas and all(caches[i].sin_cambios(h) for i, h in hashes.items()):
+        print("⏸️ SIN CAMBIOS: las tablas coinciden con los snapshots ya procesados hoy "
+              f"({', '.join(f'{i}={h[:12]}' for i, h in hashes.items())}). No se modifican los ficheros.")
+        if principal["tabla"] is None:
+            raise SystemExit(1)
+        return None
+    return principal, leidas, hashes
+
+
+def escribir_actual(resultados, prev: dict = None):
+    """
+    Escribe precio-aceite.json. Devuelve (datos, filas de la fuente principal); sin
+    filas, los precios de `datos` son los del último JSON.
+    """
+    m = metricas.actual
+    if prev is None:
+        prev = read_json(JSON_CURRENT, {})
+    now_local = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    now_utc_iso = datetime.now(timezone.utc).isoformat()
+
+    secciones = {}
+    filas_principal, sin_cierre_hoy = [], False
+    with fase("extraccion_filas"):
+        for r in resultados:
+            f = r["fuente"]
+            filas, sin_cierre = f.filas(r["tabla"]) if r["tabla"] is not None else ([], False)
+            secciones[f.id] = _seccion(r, filas, sin_cierre, prev.get("fuentes", {}).get(f.id), now_utc_iso)
+            if f.principal:
+                filas_principal, sin_cierre_hoy = filas, sin_cierre
+    m.marcar("sin_cierre_operaciones", bool(sin_cierre_hoy))
+
+    precios = _precios_por_tipo(filas_principal)
 
     # Si no hay precios numéricos hoy, reusar el último JSON (mantener la web operativa)
     had_numeric_today = bool(precios)
     if not precios:
         print("ℹ️ No hay precios numéricos hoy. Reusando últimos datos (si existen).")
-        prev = _read_json(JSON_CURRENT, {})
         precios = prev.get("precios", {}) or {}
+    m.marcar("datos_reutilizados", not had_numeric_today)
 
     # Validación “suave”: avisa si están fuera de rango, pero no tumba el scraper
     fuera_rango = False
@@ -213,52 +1049,40 @@ def main():
     if fuera_rango:
         print("⚠️ Algún precio está fuera del rango razonable (0–20 €/kg). Se continúa para no tumbar la web.")
 
-    # Campos dinámicos / metadatos
-    now_local = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    now_utc_iso = datetime.utcnow().isoformat()
-
+    # Campos de nivel superior: Infaoliva (lo que lee la web); cada fuente, en "fuentes"
     datos = {
         "fuente": "Infaoliva",
         "fecha": now_local,                  # legible en hora local
         "precios": precios,                  # puede venir del día o del último JSON
         "ultima_actualizacion": now_utc_iso, # ISO en UTC
         "generated_at": now_utc_iso,
-        "sin_cierre_operaciones": bool(sin_cierre_hoy)
+        "sin_cierre_operaciones": bool(sin_cierre_hoy),
+        "fuentes": secciones,
     }
 
     # Guardar JSON “actual”
-    _write_json(JSON_CURRENT, datos)
+    with fase("escritura_json"):
+        _write_json(JSON_CURRENT, datos)
     print("✅ precio-aceite.json actualizado.")
+    return datos, filas_principal if had_numeric_today else []
 
-    # === Actualizar histórico (solo si HOY hubo precios numéricos nuevos) ===
-    if had_numeric_today:
-        hist = _ensure_history_structure(_read_json(JSON_HISTORY, {}))
 
-        # Mapeo de claves reales -> canónicas del histórico
-        precios_map = {}
-        for k in HIST_KEYS:
-            if k in precios:
-                precios_map[k] = precios[k]
-            else:
-                # intenta emparejar por nombre simplificado
-                for real_k in precios.keys():
-                    if k.lower() in real_k.lower():
-                        precios_map[k] = precios[real_k]
-                        break
+def guardar_snapshots(leidas, hashes: dict, caches: dict):
+    """Registrar los snapshots procesados (las siguientes ejecuciones de hoy los compararán)."""
+    for r in leidas:
+        cache = caches.get(r["fuente"].id)
+        if cache is not None:
+            cache.guardar(r["tabla"], hashes[r["fuente"].id],
+                          r["meta"].get("etag"), r["meta"].get("last_modified"))
 
-        today_iso = datetime.utcnow().date().isoformat()
-        changed = _append_history_if_needed(hist, precios_map, today_iso)
-
-        if changed:
-            _write_json(JSON_HISTORY, hist)
-            print("📈 precio-aceite-historico.json actualizado.")
-        else:
-            print("ℹ️ Histórico sin cambios (ya existían entradas de hoy).")
-    else:
-        print("ℹ️ No se añade al histórico porque hoy no hubo precios numéricos.")
 
+def terminar(datos: dict, principal) -> str:
     # Log final
     print(json.dumps(datos, ensure_ascii=False, indent=2))
+    if principal["tabla"] is None:
+        print("❌ No se encontró la tabla del Observatorio de Infaoliva.")
+        raise SystemExit(1)
+    return "actualizado"
 
 
 if __name__ == "__main__":
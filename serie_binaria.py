@@ -0,0 +1,277 @@
+# serie_binaria.py
+# Formato columnar binario para la serie diaria 2015 → hoy.
+#
+# Disposición del fichero (little-endian):
+#   cabecera (16 bytes): b"OLIV" | versión u16 | nº columnas u16 | nº filas u32 | reservado u32
+#   columna "dia"      : int32[n]   ordinal de la fecha (date.toordinal())
+#   una columna float32[n] por cada clave de HIST_KEYS (NaN = sin dato)
+#
+# La lectura usa mmap: las columnas son memoryview sobre el fichero (sin copia)
+# y el corte por rango de fechas es una bisección sobre la columna de días.
+# Si NumPy está instalado, `columnas_numpy()` devuelve np.memmap equivalentes.
+#
+# Uso:
+#   python serie_binaria.py [precios2015.txt] [precios2015.bin]
+
+import bisect
+import math
+import mmap
+import struct
+import sys
+from array import array
+from datetime import date
+from pathlib import Path
+
+import escritura
+from historico_store import HIST_KEYS
+
+BIN_FILE = Path("precios2015.bin")
+TXT_FILE = Path("precios2015.txt")
+
+_MAGIC = b"OLIV"
+_VERSION = 1
+_CABECERA = struct.Struct("<4sHHII")
+
+
+def _bytes_le(arr: array) -> bytes:
+    if sys.byteorder != "little":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def serializar(dias, columnas) -> bytes:
+    """
+    Contenido del fichero. `dias` es una secuencia de ordinales ascendentes y
+    `columnas` una lista (una por clave de HIST_KEYS) de secuencias de float/None.
+    """
+    n = len(dias)
+    if len(columnas) != len(HIST_KEYS) or any(len(c) != n for c in columnas):
+        raise ValueError("Las columnas no cuadran con HIST_KEYS o con el número de días")
+
+    partes = [_CABECERA.pack(_MAGIC, _VERSION, len(HIST_KEYS), n, 0), _bytes_le(array("i", dias))]
+    for col in columnas:
+        if not (isinstance(col, array) and col.typecode == "f"):  # un array("f") ya va con NaN
+            col = array("f", (math.nan if v is None else v for v in col))
+        partes.append(_bytes_le(col))
+    return b"".join(partes)
+
+
+def escribir(path, dias, columnas):
+    """Escribe la serie (escritura atómica); mismos argumentos que serializar()."""
+    escritura.escribir(path, serializar(dias, columnas))
+
+
+def con_dia(path, fecha: date, valores: dict):
+    """
+    Contenido de la serie de `path` con un día más al final ({clave: precio}), copiando
+    las columnas existentes sin volver a parsear el texto. None si `fecha` no va detrás
+    del último día.
+    """
+    with SerieBinaria(path) as serie:
+        if serie.n and fecha.toordinal() <= serie.dias[-1]:
+            return None
+        dias = array("i", serie.dias)
+        dias.append(fecha.toordinal())
+        columnas = []
+        for k in HIST_KEYS:
+            col = array("f", serie.columnas[k])
+            v = valores.get(k)
+            col.append(math.nan if v is None else v)
+            columnas.append(col)
+    return serializar(dias, columnas)
+
+
+def con_cola(path, desde: date, precios: dict):
+    """
+    Contenido de la serie de `path` con `precios` ({date: {clave: precio}}, todos >=
+    `desde`) sobre sus filas desde `desde`: los precios dados sustituyen a los que
+    hubiera y los días nuevos se añaden. Las filas anteriores a `desde` se copian
+    columna a columna sin pasar por Python día a día: el trabajo en Python es el de la cola.
+    """
+    with SerieBinaria(path) as serie:
+        i = bisect.bisect_left(serie.dias, desde.toordinal())
+        cola = {}
+        for j in range(i, serie.n):
+            cola[serie.dias[j]] = {k: serie.columnas[k][j] for k in HIST_KEYS}
+        for f, valores in precios.items():
+            cola.setdefault(f.toordinal(), {}).update(valores)
+        ords = sorted(cola)
+        dias = array("i", serie.dias[:i])
+        dias.extend(ords)
+        columnas = []
+        for k in HIST_KEYS:
+            col = array("f", serie.columnas[k][:i])
+            col.extend(math.nan if cola[o].get(k) is None else cola[o][k] for o in ords)
+            columnas.append(col)
+    return serializar(dias, columnas)
+
+
+def serializar_por_fecha(precios: dict) -> bytes:
+    """Contenido a partir de {date: {clave: precio}} (la forma de validar_precios.leer_precios)."""
+    fechas = sorted(precios)
+    dias = [f.toordinal() for f in fechas]
+    columnas = [[precios[f].get(k) for f in fechas] for k in HIST_KEYS]
+    return serializar(dias, columnas)
+
+
+def escribir_por_fecha(path, precios: dict):
+    """Escribe a partir de {date: {clave: precio}} (escritura atómica)."""
+    escritura.escribir(path, serializar_por_fecha(precios))
+
+
+class SerieBinaria:
+    """Lector mmap de la serie columnar. Usar como context manager o llamar a close()."""
+
+    def __init__(self, path=BIN_FILE):
+        self.path = Path(path)
+        self._f = self.path.open("rb")
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # fichero vacío
+            self._f.close()
+            raise ValueError(f"{self.path} está vacío")
+
+        magic, version, ncols, n, _ = _CABECERA.unpack_from(self._mm, 0)
+        if magic != _MAGIC or version != _VERSION or ncols != len(HIST_KEYS):
+            self.close()
+            raise ValueError(f"{self.path} no es una serie binaria válida (v{_VERSION})")
+        if sys.byteorder != "little":
+            self.close()
+            raise ValueError("La lectura sin copia requiere una máquina little-endian")
+
+        self.n = n
+        self._vista = vista = memoryview(self._mm)
+        off = _CABECERA.size
+        self.dias = vista[off:off + 4 * n].cast("i")
+        off += 4 * n
+        self.columnas = {}
+        for k in HIST_KEYS:
+            self.columnas[k] = vista[off:off + 4 * n].cast("f")
+            off += 4 * n
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.n
+
+    def close(self):
+        # las memoryview deben liberarse antes de cerrar el mmap
+        for k in list(getattr(self, "columnas", {})):
+            self.columnas[k].release()
+        for attr in ("dias", "_vista"):
+            if hasattr(self, attr):
+                getattr(self, attr).release()
+        if getattr(self, "_mm", None) is not None and not self._mm.closed:
+            try:
+                self._mm.close()
+            except BufferError:
+                pass  # quedan cortes de rango() vivos: el mmap se libera con ellos
+        self._f.close()
+
+    def indices(self, desde: date = None, hasta: date = None):
+        """Rango [i, j) de filas con desde <= fecha <= hasta (bisección sobre los ordinales)."""
+        i = 0 if desde is None else bisect.bisect_left(self.dias, desde.toordinal())
+        j = self.n if hasta is None else bisect.bisect_right(self.dias, hasta.toordinal())
+        return i, max(i, j)
+
+    def rango(self, desde: date = None, hasta: date = None):
+        """Devuelve (dias, {clave: valores}) como memoryview sin copia."""
+        i, j = self.indices(desde, hasta)
+        return self.dias[i:j], {k: c[i:j] for k, c in self.columnas.items()}
+
+    def contiene(self, fecha: date) -> bool:
+        """¿Hay fila para `fecha`? (bisección sobre la columna de días)"""
+        i = bisect.bisect_left(self.dias, fecha.toordinal())
+        return i < self.n and self.dias[i] == fecha.toordinal()
+
+    def precio(self, fecha: date, clave: str):
+        """Precio de una fecha exacta (None si no existe o no hay dato)."""
+        i = bisect.bisect_left(self.dias, fecha.toordinal())
+        if i < self.n and self.dias[i] == fecha.toordinal():
+            v = self.columnas[clave][i]
+            return None if math.isnan(v) else round(v, 3)
+        return None
+
+    def por_fecha(self, desde: date = None, hasta: date = None) -> dict:
+        """{date: {clave: precio}} como validar_precios.leer_precios (sin NaN)."""
+        dias, cols = self.rango(desde, hasta)
+        salida = {}
+        for idx, d in enumerate(dias):
+            fila = {}
+            for k in HIST_KEYS:
+                v = cols[k][idx]
+                if not math.isnan(v):
+                    fila[k] = round(v, 3)
+            salida[date.fromordinal(d)] = fila
+        return salida
+
+    def columnas_numpy(self):
+        """(dias, {clave: array}) como np.memmap. Requiere NumPy."""
+        import numpy as np
+
+        off = _CABECERA.size
+        dias = np.memmap(self.path, dtype="<i4", mode="r", offset=off, shape=(self.n,))
+        cols = {}
+        for idx, k in enumerate(HIST_KEYS):
+            cols[k] = np.memmap(self.path, dtype="<f4", mode="r",
+                                offset=off + 4 * self.n * (idx + 1), shape=(self.n,))
+        return dias, cols
+
+
+def leer_por_fecha(path=BIN_FILE) -> dict:
+    with SerieBinaria(path) as serie:
+        return serie.por_fecha()
+
+
+def cargar_serie(path=BIN_FILE, store=None):
+    """
+    Serie completa como (fechas, {clave: [precio | None]}) ascendente: la serie binaria
+    con los días del almacén del histórico (HistoricoStore) encima. El almacén solo
+    guarda cierres reales, así que manda: cubre el scrape de hoy aún no volcado al
+    texto y los días de un backfill, que en la serie binaria pueden tener el precio
+    arrastrado del día anterior (o no estar).
+    """
+    dias, cols = [], {k: [] for k in HIST_KEYS}
+    if Path(path).exists():
+        with SerieBinaria(path) as serie:
+            dias = serie.dias.tolist()
+            for k in HIST_KEYS:
+                cols[k] = [None if math.isnan(v) else round(v, 3) for v in serie.columnas[k]]
+
+    if store is not None:
+        extra = []  # días que la serie binaria no tiene
+        for fecha_iso, valores in store.iterar():
+            o = date.fromisoformat(fecha_iso).toordinal()
+            i = bisect.bisect_left(dias, o)
+            if i < len(dias) and dias[i] == o:
+                for k, v in zip(HIST_KEYS, valores):
+                    if v is not None:
+                        cols[k][i] = v
+            else:
+                extra.append((o, valores))
+        if extra and dias and extra[0][0] < dias[-1]:
+            # alguno cae dentro o antes de la serie: mezcla ordenada (caso raro)
+            filas = sorted([(o, [cols[k][i] for k in HIST_KEYS]) for i, o in enumerate(dias)] + extra)
+            dias = [o for o, _ in filas]
+            for j, k in enumerate(HIST_KEYS):
+                cols[k] = [valores[j] for _, valores in filas]
+        else:
+            for o, valores in extra:
+                dias.append(o)
+                for k, v in zip(HIST_KEYS, valores):
+                    cols[k].append(v)
+    return [date.fromordinal(o) for o in dias], cols
+
+
+if __name__ == "__main__":
+    from validar_precios import leer_precios
+
+    origen = sys.argv[1] if len(sys.argv) > 1 else str(TXT_FILE)
+    destino = sys.argv[2] if len(sys.argv) > 2 else str(BIN_FILE)
+    escribir_por_fecha(destino, leer_precios(origen))
+    print(f"✅ Serie binaria generada: {destino}")
@@ -0,0 +1,189 @@
+# serie_rle.py
+# Serie diaria rellenada guardada por tramos (run-length): solo las fechas en las que
+# cambia el precio, o en las que se pasa de un precio observado a uno arrastrado.
+#
+# Los convertidores escriben un registro por día natural y, en fines de semana,
+# festivos y días sin cierre, ese registro repite el precio anterior. Aquí cada tramo
+# es (primer día, precio, observado): observado = 1 si todos sus días son cierres
+# reales (con ese precio), 0 si son relleno. Así los precios reales no se mezclan
+# con los sintéticos.
+#
+# Fichero (JSON compacto):
+#   {"formato": "rle", "version": 2, "desde": "2015-01-01", "hasta": "2025-10-28",
+#    "series": {"Aceite de oliva virgen extra":
+#                 {"d": [0, 1, 3, ...],     días desde "desde" en que empieza cada tramo
+#                  "p": [2.824, 2.824, ...], precio del tramo (null = sin dato)
+#                  "o": [1, 0, ...],         observado / rellenado
+#                  "f": 3953}}}              último día de la serie, también desde "desde"
+# Cada serie lleva su propio final: "hasta" es solo el último de todos. (La versión 1
+# no tenía "f" y se lee con "hasta" como final de todas.)
+#
+# SerieRLE responde "precio el día X" con una bisección sobre los inicios de tramo y
+# expande a la serie diaria solo cuando se le pide, día a día (dias()).
+#
+#   python3 serie_rle.py [precios2015.txt] [precio-aceite-historico.rle.json]
+
+import bisect
+import json
+import sys
+from datetime import date
+from pathlib import Path
+
+import escritura
+from historico_store import HIST_KEYS
+
+RLE_FILE = Path("precio-aceite-historico.rle.json")
+VERSION = 2
+
+
+class SerieRLE:
+    """Una serie: `inicios` (ordinales ascendentes), `precios` y `observados` por tramo, hasta `fin`."""
+
+    def __init__(self, inicios, precios, observados, fin: int):
+        self.inicios = list(inicios)
+        self.precios = list(precios)
+        self.observados = list(observados)
+        self.fin = fin
+
+    def __len__(self):
+        return self.fin - self.inicios[0] + 1 if self.inicios else 0
+
+    def _tramo(self, fecha: date):
+        o = fecha.toordinal()
+        if not self.inicios or o < self.inicios[0] or o > self.fin:
+            return None
+        return bisect.bisect_right(self.inicios, o) - 1
+
+    def precio(self, fecha: date):
+        """Precio del día (observado o arrastrado), o None si no hay dato."""
+        i = self._tramo(fecha)
+        return None if i is None else self.precios[i]
+
+    def observado(self, fecha: date) -> bool:
+        """¿Es `fecha` un cierre real? (solo el tramo observado, no su relleno)."""
+        i = self._tramo(fecha)
+        return i is not None and bool(self.observados[i])
+
+    def dias(self, desde: date = None, hasta: date = None):
+        """Genera (date, precio, observado) de cada día natural de [desde, hasta], sin expandir toda la serie."""
+        if not self.inicios:
+            return
+        o = max(self.inicios[0], desde.toordinal() if desde else self.inicios[0])
+        fin = min(self.fin, hasta.toordinal() if hasta else self.fin)
+        i = bisect.bisect_right(self.inicios, o) - 1
+        while o <= fin:
+            siguiente = self.inicios[i + 1] if i + 1 < len(self.inicios) else fin + 1
+            p, obs = self.precios[i], bool(self.observados[i])
+            for d in range(o, min(siguiente, fin + 1)):
+                yield date.fromordinal(d), p, obs
+            o, i = siguiente, i + 1
+
+    def a_json(self, base: int) -> dict:
+        return {"d": [o - base for o in self.inicios], "p": self.precios, "o": self.observados,
+                "f": self.fin - base}
+
+
+def codificar(ordinales, precios, observados=None) -> SerieRLE:
+    """
+    Serie diaria (ordinales ascendentes; un hueco cuenta como sin dato) → tramos.
+    `observados` por día; por defecto, todos los días con precio.
+    """
+    inicios, ps, obs = [], [], []
+    previo = None
+    for i, o in enumerate(ordinales):
+        p = precios[i]
+        ob = int(p is not None and (observados[i] if observados is not None else True))
+        if previo is not None and o > previo + 1 and (ps[-1], obs[-1]) != (None, 0):
+            inicios.append(previo + 1)
+            ps.append(None)
+            obs.append(0)
+        if not inicios or (ps[-1], obs[-1]) != (p, ob):
+            inicios.append(o)
+            ps.append(p)
+            obs.append(ob)
+        previo = o
+    return SerieRLE(inicios, ps, obs, previo if previo is not None else 0)
+
+
+def codificar_observados(ordinales, precios, fin: int = None) -> SerieRLE:
+    """
+    Cierres reales (ordinales ascendentes sin repetir; None = sin cierre) → serie
+    rellenada hasta `fin` arrastrando el último precio, sin pasar por la serie
+    diaria: O(nº de cierres).
+    """
+    cierres = [(o, p) for o, p in zip(ordinales, precios) if p is not None]
+    if not cierres:
+        return SerieRLE([], [], [], 0)
+    fin = cierres[-1][0] if fin is None else max(fin, cierres[-1][0])
+    inicios, ps, obs = [], [], []
+    hasta = None  # último día cubierto por el último tramo
+    for i, (o, p) in enumerate(cierres):
+        siguiente = cierres[i + 1][0] if i + 1 < len(cierres) else fin + 1
+        if not (inicios and obs[-1] and ps[-1] == p and hasta == o - 1):
+            inicios.append(o)
+            ps.append(p)
+            obs.append(1)
+        hasta = o
+        if siguiente > o + 1:  # relleno hasta el siguiente cierre
+            inicios.append(o + 1)
+            ps.append(p)
+            obs.append(0)
+            hasta = siguiente - 1
+    return SerieRLE(inicios, ps, obs, fin)
+
+
+# ---------- fichero ----------
+
+def serializar(series: dict) -> str:
+    """{clave: SerieRLE} → JSON compacto (los días, relativos a la primera fecha)."""
+    con_datos = {k: s for k, s in series.items() if s.inicios}
+    base = min((s.inicios[0] for s in con_datos.values()), default=0)
+    fin = max((s.fin for s in con_datos.values()), default=0)
+    return json.dumps({
+        "formato": "rle", "version": VERSION,
+        "desde": date.fromordinal(base).isoformat() if con_datos else None,
+        "hasta": date.fromordinal(fin).isoformat() if con_datos else None,
+        "series": {k: s.a_json(base) for k, s in con_datos.items()},
+    }, ensure_ascii=False, separators=(",", ":"))
+
+
+def escribir(path, series: dict) -> int:
+    return escritura.escribir(path, serializar(series))
+
+
+def leer(path=RLE_FILE) -> dict:
+    """{clave: SerieRLE} de un fichero escrito con escribir()."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    if data.get("formato") != "rle" or data.get("version") not in (1, VERSION):
+        raise ValueError(f"{path}: no es una serie por tramos (versión {VERSION})")
+    if not data["series"]:
+        return {}
+    base = date.fromisoformat(data["desde"]).toordinal()
+    hasta = date.fromisoformat(data["hasta"]).toordinal()
+    return {k: SerieRLE([base + d for d in s["d"]], s["p"], s["o"], base + s["f"] if "f" in s else hasta)
+            for k, s in data["series"].items()}
+
+
+def desde_series(data: dict, hasta: date = None) -> dict:
+    """{clave: [{"fecha", "precio_eur_kg"}]} con los cierres reales (parser_historico.series_por_clave) → {clave: SerieRLE}."""
+    fin = hasta.toordinal() if hasta else None
+    salida = {}
+    for k, lista in data.items():
+        ords = [date.fromisoformat(d["fecha"]).toordinal() for d in lista]
+        salida[k] = codificar_observados(ords, [d["precio_eur_kg"] for d in lista], fin)
+    return salida
+
+
+if __name__ == "__main__":
+    from parser_historico import parsear_archivo, series_por_clave
+
+    entrada = sys.argv[1] if len(sys.argv) > 1 else "precios2015.txt"
+    salida = sys.argv[2] if len(sys.argv) > 2 else RLE_FILE
+    series = desde_series(series_por_clave(parsear_archivo(entrada)), hasta=date.today())
+    n = escribir(salida, series)
+    for k in HIST_KEYS:
+        if k in series:
+            s = series[k]
+            print(f"   {k}: {len(s)} días en {len(s.inicios)} tramos "
+                  f"({sum(s.observados)} observados)")
+    print(f"✅ Serie por tramos guardada en {salida} ({n} bytes).")
@@ -0,0 +1,99 @@
+# snapshot_cache.py
+# Caché de snapshots de la tabla del Observatorio, direccionada por contenido.
+#
+#   snapshots/<sha256>.json   tabla extraída (cabeceras + filas) tal cual se leyó
+#   snapshots/estado.json     último hash procesado, día (UTC) en que se procesó
+#                             y ETag / Last-Modified de la última descarga HTTP
+#
+# Si la tabla de una ejecución tiene el mismo hash que la última procesada HOY,
+# el scraper no parsea ni toca el histórico ni los JSON. El primer run de cada día
+# sí se procesa aunque la tabla no cambie, porque el histórico lleva una entrada
+# por día. Con ETag/Last-Modified se hace una petición condicional: un 304 evita
+# incluso descargar la página (la tabla se recupera del snapshot guardado).
+
+import hashlib
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import escritura
+
+SNAPSHOTS_DIR = Path("snapshots")
+MAX_SNAPSHOTS = 10
+
+
+def hash_tabla(tabla: dict) -> str:
+    """Hash estable del contenido de la tabla (cabeceras y celdas, sin espacios sobrantes)."""
+    canon = {
+        "cabeceras": [" ".join(c.split()) for c in tabla.get("cabeceras", [])],
+        "filas": [[" ".join(c.split()) for c in fila] for fila in tabla.get("filas", [])],
+    }
+    texto = json.dumps(canon, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def _hoy() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+class SnapshotCache:
+    def __init__(self, directorio: Path = SNAPSHOTS_DIR):
+        self.directorio = Path(directorio)
+        self.estado_path = self.directorio / "estado.json"
+        try:
+            self.estado = json.loads(self.estado_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.estado = {}
+
+    def cabeceras_condicionales(self) -> dict:
+        """If-None-Match / If-Modified-Since para la descarga HTTP (solo si hay snapshot)."""
+        cab = {}
+        if not self.tabla_guardada():
+            return cab
+        if self.estado.get("etag"):
+            cab["If-None-Match"] = self.estado["etag"]
+        if self.estado.get("last_modified"):
+            cab["If-Modified-Since"] = self.estado["last_modified"]
+        return cab
+
+    def tabla_guardada(self):
+        """Tabla del último snapshot procesado (None si no existe)."""
+        h = self.estado.get("hash")
+        if not h:
+            return None
+        try:
+            return json.loads((self.directorio / f"{h}.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def sin_cambios(self, h: str) -> bool:
+        """True si `h` es el último snapshot procesado y se procesó hoy."""
+        return self.estado.get("hash") == h and self.estado.get("dia") == _hoy()
+
+    def guardar(self, tabla: dict, h: str = None, etag: str = None, last_modified: str = None):
+        """Guarda la tabla bajo su hash y marca el snapshot como procesado hoy."""
+        h = h or hash_tabla(tabla)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        destino = self.directorio / f"{h}.json"
+        if not destino.exists():
+            escritura.escribir_json(destino, tabla)
+        else:
+            destino.touch()
+
+        self.estado = {
+            "hash": h,
+            "dia": _hoy(),
+            "etag": etag or self.estado.get("etag"),
+            "last_modified": last_modified or self.estado.get("last_modified"),
+        }
+        escritura.escribir_json(self.estado_path, self.estado)
+        self._podar()
+
+    def _podar(self):
+        snaps = sorted(
+            (p for p in self.directorio.glob("*.json")
+             if p != self.estado_path and p.stem != self.estado.get("hash")),
+            key=lambda p: p.stat().st_mtime, reverse=True,
+        )
+        for viejo in snaps[MAX_SNAPSHOTS - 1:]:
+            viejo.unlink()
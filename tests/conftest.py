@@ -0,0 +1,69 @@
+# tests/conftest.py
+# Los módulos del repositorio están en la raíz (sin paquete) y usan rutas de datos
+# relativas al directorio actual.
+
+import sys
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+RAIZ = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
+
+
+@pytest.fixture
+def fixture_html():
+    def _leer(nombre: str) -> str:
+        return (FIXTURES / nombre).read_text(encoding="utf-8")
+    return _leer
+
+
+@pytest.fixture
+def metricas_limpias():
+    import metricas
+
+    return metricas.reiniciar()
+
+
+@pytest.fixture
+def directorio_datos(tmp_path, monkeypatch):
+    """Directorio de trabajo temporal: los ficheros de datos (rutas relativas) van ahí."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+class _Silencioso(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor_http():
+    """Sirve un directorio por HTTP en localhost; devuelve directorio → URL base (con "/")."""
+    servidores = []
+
+    def _servir(directorio) -> str:
+        servidor = ThreadingHTTPServer(("127.0.0.1", 0), partial(_Silencioso, directory=str(directorio)))
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        servidores.append(servidor)
+        return f"http://127.0.0.1:{servidor.server_port}/"
+
+    try:
+        yield _servir
+    finally:
+        for servidor in servidores:
+            servidor.shutdown()
+            servidor.server_close()
+
+
+@pytest.fixture
+def servidor_fixture(servidor_http):
+    """Sirve tests/fixtures por HTTP en localhost; devuelve nombre → URL."""
+    base = servidor_http(FIXTURES)
+    return lambda nombre: base + nombre
@@ -0,0 +1,75 @@
+# tests/test_backfill.py
+# Backfill contra páginas de días servidas en localhost: los cierres recuperados
+# llegan al texto, a la serie binaria y a lo publicado, y pasan por la validación.
+
+import json
+from datetime import date, timedelta
+
+import scraper
+import serie_binaria
+from historico_store import HIST_KEYS, HistoricoStore
+from validar_precios import leer_precios
+
+EXTRA, VIRGEN, LAMPANTE = HIST_KEYS
+ARRASTRADO = {EXTRA: 4.0, VIRGEN: 3.5, LAMPANTE: 3.0}
+PAGINAS = {
+    date(2025, 1, 20): {EXTRA: 4.05, VIRGEN: 3.55, LAMPANTE: 3.05},
+    date(2025, 1, 21): {EXTRA: 4.06, VIRGEN: 3.56, LAMPANTE: 0.305},  # coma desplazada
+    date(2025, 1, 22): {EXTRA: 4.07, VIRGEN: 3.57, LAMPANTE: 3.07},
+}
+
+
+def _txt(directorio):
+    # enero de 2025 con el mismo precio arrastrado todos los días
+    bloques = []
+    for i in range(31):
+        d = date(2025, 1, 1) + timedelta(days=i)
+        bloques.append("\n".join([d.strftime("%d-%m-%Y")] + [f"{k} {v:.3f}" for k, v in ARRASTRADO.items()]))
+    (directorio / "precios2015.txt").write_text("\n\n".join(bloques) + "\n", encoding="utf-8")
+    serie_binaria.escribir_por_fecha("precios2015.bin", leer_precios("precios2015.txt"))
+
+
+def _paginas(directorio, fixture_html):
+    paginas = directorio / "paginas"
+    paginas.mkdir()
+    plantilla = fixture_html("infaoliva.html")
+    for d, precios in PAGINAS.items():
+        html = plantilla
+        for viejo, k in (("4.100 &euro;", EXTRA), ("3,650 €", VIRGEN), ("3.500 €", LAMPANTE)):
+            html = html.replace(viejo, f"{precios[k]:.3f} €")
+        (paginas / f"{d.isoformat()}.html").write_text(html, encoding="utf-8")
+    return paginas
+
+
+def test_backfill_llega_al_texto_la_serie_y_la_cuarentena(directorio_datos, fixture_html, servidor_http,
+                                                          metricas_limpias):
+    _txt(directorio_datos)
+    base = servidor_http(_paginas(directorio_datos, fixture_html))
+
+    scraper.main(["--metricas", "m.jsonl", "backfill", "--desde", "2025-01-20", "--hasta", "2025-01-22",
+                  "--plantilla", base + "{fecha}.html", "--tasa", "100"])
+
+    esperado = {d: dict(precios) for d, precios in PAGINAS.items()}
+    esperado[date(2025, 1, 21)][LAMPANTE] = ARRASTRADO[LAMPANTE]  # en cuarentena: sigue el arrastrado
+
+    texto = leer_precios("precios2015.txt")
+    binaria = serie_binaria.leer_por_fecha("precios2015.bin")
+    for d, precios in esperado.items():
+        assert texto[d] == precios
+        assert binaria[d] == precios
+    assert texto[date(2025, 1, 23)] == ARRASTRADO
+    assert len(texto) == len(binaria) == 31
+
+    fechas, cols = serie_binaria.cargar_serie("precios2015.bin", HistoricoStore())
+    i = fechas.index(date(2025, 1, 20))
+    assert [cols[k][i] for k in HIST_KEYS] == [4.05, 3.55, 3.05]
+
+    manifest = json.loads((directorio_datos / "historico-manifest.json").read_text(encoding="utf-8"))
+    anio = json.loads((directorio_datos / manifest["anios"]["2025"]["archivo"]).read_text(encoding="utf-8"))
+    i = anio["fechas"].index("2025-01-22")
+    assert anio["series"][EXTRA][i] == 4.07
+
+    rechazos = [json.loads(linea) for linea in
+                (directorio_datos / "cuarentena-precios.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert [(r["fecha"], r["tipo"], r["origen"]) for r in rechazos] == [("2025-01-21", LAMPANTE, "backfill")]
+    assert rechazos[0]["motivo"] in ("salto", "atipico")
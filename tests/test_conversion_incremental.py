@@ -0,0 +1,72 @@
+# tests/test_conversion_incremental.py
+
+import json
+
+import conversion_incremental
+import convertir_historico_completo
+
+BLOQUES = [
+    ("01-09-2025", 4.100, 3.650, 3.500),
+    ("02-09-2025", 4.110, 3.660, 3.510),
+    ("05-09-2025", 4.120, None, 3.520),
+]
+NUEVOS = [
+    ("08-09-2025", 4.130, 3.670, 3.530),
+    ("09-09-2025", 4.140, 3.680, None),
+]
+TIPOS = ("Aceite de oliva virgen extra", "Aceite de oliva virgen", "Aceite de oliva lampante")
+
+
+def _texto(bloques) -> str:
+    partes = []
+    for fecha, *precios in bloques:
+        partes.append(fecha)
+        partes += [f"{k} {p:.3f}".replace(".", ",") if p is not None else f"{k} Sin cierre de operaciones"
+                   for k, p in zip(TIPOS, precios)]
+        partes.append("")
+    return "\n".join(partes) + "\n"
+
+
+def _convertir(directorio, texto):
+    (directorio / "precios.txt").write_text(texto, encoding="utf-8")
+    convertir_historico_completo.main("precios.txt", "salida.json", incremental=True, bin_file="salida.bin")
+    return json.loads((directorio / ".conversion-checkpoint.json").read_text())
+
+
+def test_incremental_igual_que_completa(tmp_path, monkeypatch):
+    incremental, completa = tmp_path / "inc", tmp_path / "completa"
+    incremental.mkdir()
+    completa.mkdir()
+
+    monkeypatch.chdir(incremental)
+    _convertir(incremental, _texto(BLOQUES))
+    with (incremental / "precios.txt").open("a", encoding="utf-8") as f:
+        f.write(_texto(NUEVOS))
+    modos = []
+    real = conversion_incremental.convertir
+    monkeypatch.setattr(conversion_incremental, "convertir", lambda *a, **k: modos.append(real(*a, **k)) or modos[-1])
+    cp = _convertir(incremental, (incremental / "precios.txt").read_text(encoding="utf-8"))
+    assert modos == ["incremental"]
+    assert cp["series"]["Aceite de oliva lampante"]["ultima_real"]["fecha"] == "2025-09-08"
+
+    monkeypatch.chdir(completa)
+    (completa / "precios.txt").write_text(_texto(BLOQUES + NUEVOS), encoding="utf-8")
+    convertir_historico_completo.main("precios.txt", "salida.json", bin_file="salida.bin")
+
+    esperado = (completa / "salida.json").read_bytes()
+    assert (incremental / "salida.json").read_bytes() == esperado
+    assert esperado.decode("utf-8") == json.dumps(json.loads(esperado), ensure_ascii=False, indent=2)
+    assert (incremental / "salida.bin").read_bytes() == (completa / "salida.bin").read_bytes()
+
+
+def test_bin_tocado_fuerza_conversion_completa(directorio_datos, monkeypatch):
+    _convertir(directorio_datos, _texto(BLOQUES))
+    (directorio_datos / "salida.bin").write_bytes(b"otra cosa")
+    with (directorio_datos / "precios.txt").open("a", encoding="utf-8") as f:
+        f.write(_texto(NUEVOS))
+
+    modos = []
+    real = conversion_incremental.convertir
+    monkeypatch.setattr(conversion_incremental, "convertir", lambda *a, **k: modos.append(real(*a, **k)) or modos[-1])
+    _convertir(directorio_datos, (directorio_datos / "precios.txt").read_text(encoding="utf-8"))
+    assert modos == ["completa"]
@@ -0,0 +1,45 @@
+# tests/test_convertidores.py
+
+from datetime import date
+
+import convertir_historico
+import convertir_historico_completo
+import fusionar_historico
+from serie_binaria import SerieBinaria
+
+TEXTO = """01-10-2025
+Aceite de oliva virgen extra 4,100
+Aceite de oliva virgen 3,650
+Aceite de oliva lampante 3,500
+
+03-10-2025
+Aceite de oliva virgen extra 4,120
+Aceite de oliva virgen 3,660
+Aceite de oliva lampante 3,510
+"""
+
+
+def test_sin_bin_no_toca_la_serie_canonica(directorio_datos):
+    (directorio_datos / "precios 2015.txt").write_text(TEXTO, encoding="utf-8")
+    (directorio_datos / "precios2015.txt").write_text(TEXTO, encoding="utf-8")
+    (directorio_datos / "precios2015.bin").write_bytes(b"canonica")
+
+    convertir_historico_completo.main()
+    fusionar_historico.main()
+    convertir_historico.convertir()
+
+    assert (directorio_datos / "precios2015.bin").read_bytes() == b"canonica"
+    assert (directorio_datos / "precio-aceite-historico.json").exists()
+
+
+def test_bin_explicito(directorio_datos):
+    entrada = directorio_datos / "entrada.txt"
+    entrada.write_text(TEXTO, encoding="utf-8")
+
+    fusionar_historico.main([str(entrada)], "salida.json", bin_file="salida.bin")
+
+    assert not (directorio_datos / "precios2015.bin").exists()
+    with SerieBinaria("salida.bin") as serie:
+        assert serie.precio(date(2025, 10, 1), "Aceite de oliva virgen extra") == 4.1
+        assert serie.precio(date(2025, 10, 2), "Aceite de oliva virgen extra") == 4.1  # relleno
+        assert serie.precio(date(2025, 10, 3), "Aceite de oliva lampante") == 3.51
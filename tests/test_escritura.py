@@ -0,0 +1,104 @@
+# tests/test_escritura.py
+# Diario de transacciones (rehacer / descartar tras una interrupción) y cerrojo.
+
+import fcntl
+import json
+
+import pytest
+
+import escritura
+
+REAL = escritura._aplicar
+
+
+def _interrumpir_tras(monkeypatch, n: int):
+    """El proceso "muere" tras aplicar `n` operaciones de una transacción ya confirmada."""
+    aplicadas = []
+
+    def _aplicar(op):
+        if len(aplicadas) == n:
+            raise KeyboardInterrupt
+        REAL(op)
+        aplicadas.append(op)
+    monkeypatch.setattr(escritura, "_aplicar", _aplicar)
+
+
+def _transaccion(directorio):
+    (directorio / "log.txt").write_text("a\n")
+    (directorio / "datos.json").write_text("viejo")
+    with escritura.transaccion() as t:
+        t.anexar("log.txt", "b\n")
+        t.anexar("log.txt", "c\n")
+        t.escribir("datos.json", "nuevo")
+
+
+@pytest.mark.parametrize("aplicadas", [0, 1, 2])
+def test_rehace_la_transaccion_confirmada(directorio_datos, monkeypatch, aplicadas):
+    _interrumpir_tras(monkeypatch, aplicadas)
+    with pytest.raises(KeyboardInterrupt):
+        _transaccion(directorio_datos)
+    assert escritura.JOURNAL_FILE.exists()
+    monkeypatch.setattr(escritura, "_aplicar", REAL)
+
+    assert escritura.recuperar() == 3
+    assert (directorio_datos / "log.txt").read_text() == "a\nb\nc\n"
+    assert (directorio_datos / "datos.json").read_text() == "nuevo"
+    assert not escritura.JOURNAL_FILE.exists()
+    assert not list(directorio_datos.glob(".*.tmp"))
+
+
+def test_descarta_la_transaccion_sin_confirmar(directorio_datos):
+    (directorio_datos / "datos.json").write_text("viejo")
+    t = escritura.Transaccion()
+    t.escribir("datos.json", "nuevo")
+    # el proceso murió mientras escribía el diario: sin la línea de confirmación
+    escritura.JOURNAL_FILE.write_text(json.dumps(t.ops[0]) + "\n{\"confirm")
+
+    assert escritura.recuperar() == 0
+    assert (directorio_datos / "datos.json").read_text() == "viejo"
+    assert not escritura.JOURNAL_FILE.exists()
+    assert not list(directorio_datos.glob(".*.tmp"))
+
+
+def test_no_rehace_si_el_fichero_es_mas_corto(directorio_datos, monkeypatch):
+    _interrumpir_tras(monkeypatch, 0)
+    with pytest.raises(KeyboardInterrupt):
+        _transaccion(directorio_datos)
+    monkeypatch.setattr(escritura, "_aplicar", REAL)
+    (directorio_datos / "log.txt").write_text("")  # alguien lo vació después
+
+    with pytest.raises(ValueError, match="log.txt"):
+        escritura.recuperar()
+    assert (directorio_datos / "log.txt").read_bytes() == b""
+    assert (directorio_datos / "datos.json").read_text() == "viejo"
+    assert escritura.JOURNAL_FILE.exists()
+    # y el cerrojo no queda tomado por el intento fallido
+    with pytest.raises(ValueError):
+        with escritura.bloqueo():
+            pass
+    assert not escritura._tenidos
+
+
+def _tomado_por_otro() -> bool:
+    with open(escritura.LOCK_FILE, "a+b") as f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return False
+
+
+def test_bloqueo_reentrante(directorio_datos, monkeypatch):
+    recuperaciones = []
+    monkeypatch.setattr(escritura, "recuperar", lambda diario: recuperaciones.append(diario))
+
+    with escritura.bloqueo():
+        assert _tomado_por_otro()
+        with escritura.bloqueo():  # no se bloquea a sí mismo
+            with escritura.transaccion() as t:
+                t.escribir("x.json", "{}")
+        assert _tomado_por_otro()  # sigue tomado al salir del nivel interior
+    assert not _tomado_por_otro()
+    assert len(recuperaciones) == 1  # el diario se revisa solo al tomarlo de verdad
+    assert (directorio_datos / "x.json").read_text() == "{}"
@@ -0,0 +1,59 @@
+# tests/test_filtro_recursos.py
+# Manejador de page.route que bloquea recursos pesados y dominios de terceros.
+
+from types import SimpleNamespace
+
+from scraper import _dominio_base, _filtro_recursos
+
+
+class _Ruta:
+    """Lo mínimo de playwright Route: request.url, request.resource_type, abort() y continue_()."""
+
+    def __init__(self, url: str, tipo: str):
+        self.request = SimpleNamespace(url=url, resource_type=tipo)
+        self.resultado = None
+
+    def abort(self):
+        self.resultado = "abortada"
+
+    def continue_(self):
+        self.resultado = "permitida"
+
+
+def _pasar(handler, url, tipo):
+    ruta = _Ruta(url, tipo)
+    handler(ruta)
+    return ruta.resultado
+
+
+def test_dominio_base():
+    assert _dominio_base("www.infaoliva.com") == "infaoliva.com"
+    assert _dominio_base("INFAOLIVA.com") == "infaoliva.com"
+    assert _dominio_base("") == ""
+
+
+def test_bloquea_imagenes_media_y_fuentes_del_propio_dominio():
+    handler, _ = _filtro_recursos("https://www.infaoliva.com/")
+    for tipo in ("image", "media", "font"):
+        assert _pasar(handler, "https://www.infaoliva.com/wp-content/recurso", tipo) == "abortada"
+
+
+def test_permite_documento_scripts_y_xhr_propios():
+    handler, _ = _filtro_recursos("https://www.infaoliva.com/")
+    assert _pasar(handler, "https://www.infaoliva.com/", "document") == "permitida"
+    assert _pasar(handler, "https://static.infaoliva.com/app.js", "script") == "permitida"
+    assert _pasar(handler, "https://www.infaoliva.com/wp-json/precios", "xhr") == "permitida"
+
+
+def test_bloquea_terceros_aunque_sean_scripts():
+    handler, _ = _filtro_recursos("https://www.infaoliva.com/")
+    assert _pasar(handler, "https://www.googletagmanager.com/gtag/js", "script") == "abortada"
+    assert _pasar(handler, "https://fonts.googleapis.com/css", "stylesheet") == "abortada"
+
+
+def test_contador():
+    handler, contador = _filtro_recursos("http://127.0.0.1:8765/")
+    _pasar(handler, "http://127.0.0.1:8765/", "document")
+    _pasar(handler, "http://127.0.0.1:8765/logo.png", "image")
+    _pasar(handler, "https://analytics.example.com/a.js", "script")
+    assert contador == {"abortadas": 2, "permitidas": 1}
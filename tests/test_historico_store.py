@@ -0,0 +1,77 @@
+# tests/test_historico_store.py
+
+from datetime import date, timedelta
+
+import historico_store
+from historico_store import ANCHO, HIST_KEYS, HistoricoStore
+
+EXTRA = HIST_KEYS[0]
+
+
+def _dias(desde: date, n: int):
+    return [(desde + timedelta(days=i)).isoformat() for i in range(n)]
+
+
+def test_compactar_anade_al_final_sin_reescribir(directorio_datos, monkeypatch):
+    store = HistoricoStore()
+    for i, d in enumerate(_dias(date(2025, 1, 1), 10)):
+        store.anadir(d, {EXTRA: 4 + i / 100})
+    store.compactar()
+    inodo = store.dat_path.stat().st_ino
+
+    monkeypatch.setattr(historico_store.escritura, "abrir", None)  # una reescritura fallaría
+    for i, d in enumerate(_dias(date(2025, 1, 11), 5)):
+        store.anadir(d, {EXTRA: 5 + i / 100})
+    store.compactar()
+
+    assert store.dat_path.stat().st_ino == inodo
+    assert store.dat_path.stat().st_size == 15 * ANCHO
+    assert not store.log_path.exists()
+    assert [f for f, _ in store.iterar()] == _dias(date(2025, 1, 1), 15)
+    assert store.valores("2025-01-13")[0] == 5.02
+
+
+def test_compactar_reescribe_si_el_log_cae_dentro_de_la_base(directorio_datos):
+    store = HistoricoStore()
+    for d in _dias(date(2025, 1, 1), 10):
+        if d != "2025-01-05":
+            store.anadir(d, {EXTRA: 4.0})
+    store.compactar()
+
+    store.anadir("2025-01-05", {EXTRA: 4.5})  # backfill de un hueco
+    store.anadir("2025-01-11", {EXTRA: 4.1})
+    store.compactar()
+
+    assert [f for f, _ in store.iterar()] == _dias(date(2025, 1, 1), 11)
+    assert store.valores("2025-01-05")[0] == 4.5
+    assert store.dat_path.stat().st_size == 11 * ANCHO
+
+
+def test_log_repetido_tras_interrupcion_no_duplica(directorio_datos):
+    store = HistoricoStore()
+    store.anadir("2025-01-01", {EXTRA: 4.0})
+    store.compactar()
+    # el proceso murió tras añadir a la base y antes de borrar el log
+    store.log_path.write_text(store.dat_path.read_text())
+    store.recargar()
+
+    assert list(store.iterar()) == [("2025-01-01", [4.0, None, None])]
+    store.compactar()
+    assert store.dat_path.stat().st_size == ANCHO
+
+
+def test_migracion_toma_los_cierres_del_texto(directorio_datos):
+    import scraper
+
+    (directorio_datos / "precios2015.txt").write_text(
+        "30-09-2025\nAceite de oliva virgen extra 4.067\n\n"
+        "01-10-2025\nAceite de oliva virgen extra 4.017\n", encoding="utf-8")
+    # el JSON antiguo trae el 01 con el precio del día anterior y un día que el texto no tiene
+    (directorio_datos / "precio-aceite-historico.json").write_text(
+        '{"Aceite de oliva virgen extra": [{"fecha": "2025-09-30", "precio_eur_kg": 4.067},'
+        ' {"fecha": "2025-10-01", "precio_eur_kg": 4.067},'
+        ' {"fecha": "2025-10-02", "precio_eur_kg": 4.033}]}', encoding="utf-8")
+
+    store = scraper.abrir_historico()
+    assert [(f, v[0]) for f, v in store.iterar()] == [
+        ("2025-09-30", 4.067), ("2025-10-01", 4.017), ("2025-10-02", 4.033)]
@@ -0,0 +1,41 @@
+# tests/test_indicadores.py
+
+from datetime import date, timedelta
+
+import pytest
+
+import indicadores
+from historico_store import HIST_KEYS, HistoricoStore
+
+EXTRA = HIST_KEYS[0]
+
+
+def _serie(desde: date, precios):
+    fechas = [desde + timedelta(days=i) for i in range(len(precios))]
+    return fechas, {k: list(precios) if k == EXTRA else [None] * len(precios) for k in HIST_KEYS}
+
+
+def test_huecos_del_almacen_cuentan_como_dias_naturales(directorio_datos):
+    precios = [4 + (i % 5) / 50 for i in range(60)]
+    inicio = date(2025, 1, 1)
+    fechas, cols = _serie(inicio, precios[:40])
+    estado = indicadores.recalcular(fechas, cols)
+    estado.guardar()
+
+    # al almacén le faltan dos días (fin de semana sin cierre)
+    store = HistoricoStore()
+    for i in range(40, 60):
+        if i not in (45, 46):
+            store.anadir((inicio + timedelta(days=i)).isoformat(), {EXTRA: precios[i]})
+    assert indicadores.actualizar(store) == "incremental"
+
+    # igual que la serie completa con esos días arrastrando el cierre anterior
+    completa = precios[:45] + [precios[44]] * 2 + precios[47:]
+    esperado = indicadores.recalcular(*_serie(inicio, completa)).resumen()["tipos"][EXTRA]
+    obtenido = indicadores.Indicadores.cargar().resumen()["tipos"][EXTRA]
+    assert obtenido == pytest.approx(esperado)
+    # el lote rellena igual los huecos de la serie
+    fechas, cols = _serie(inicio, completa)
+    for i in (45, 46):
+        cols[EXTRA][i] = None
+    assert indicadores.recalcular(fechas, cols).resumen()["tipos"][EXTRA] == pytest.approx(esperado)
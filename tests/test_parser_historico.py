@@ -0,0 +1,103 @@
+# tests/test_parser_historico.py
+# Formato, orden y lectura hacia atrás de los textos del histórico.
+
+from datetime import date
+
+import pytest
+
+from historico_store import HIST_KEYS
+from parser_historico import detectar_formato, dias_ordenados, lineas_al_reves
+
+EXTRA, VIRGEN, LAMPANTE = HIST_KEYS
+
+# como historico.txt: de nuevo a antiguo, CRLF, cabeceras repetidas, variedad y "Sin cierre"
+NUEVO_A_ANTIGUO = (
+    "Tipo de aceite de oliva Variedad Precio €/kg\r\n"
+    " 26-08-2025\r\n"
+    " Aceite de oliva virgen extra Picual Sin cierre de operaciones\r\n"
+    " Aceite de oliva virgen Picual Sin cierre de operaciones\r\n"
+    " Aceite de oliva lampante Picual Sin cierre de operaciones\r\n"
+    " 25-08-2025\r\n"
+    " Aceite de oliva virgen extra Picual 3.833 €\r\n"
+    " Aceite de oliva virgen Picual 3.450 €\r\n"
+    "Tipo de aceite de oliva Variedad Precio €/kg\r\n"
+    " Aceite de oliva lampante Picual 3.300 €\r\n"
+    " 22-08-2025\r\n"
+    " Aceite de oliva virgen extra Picual 3.800 €\r\n"
+    " Aceite de oliva virgen Picual 3.420 €\r\n"
+    " Aceite de oliva lampante Picual 3.290 €\r\n"
+)
+
+# como historico_completo.txt: tabulado, de nuevo a antiguo, coma decimal
+TABULADO = (
+    "\nTipo de aceite de oliva\tVariedad\tPrecio €/kg\n"
+    "25-09-2025\n"
+    "Aceite de oliva virgen extra\tPicual\t4,080 €\n"
+    "Aceite de oliva virgen\tPicual\t3,669 €\n"
+    "24-09-2025\n"
+    "Aceite de oliva virgen extra\tPicual\t4,033 €\n"
+    "Aceite de oliva virgen\tPicual\t3,650 €\n"
+)
+
+# como precios2015.txt: de antiguo a nuevo, un bloque repetido que se une
+ANTIGUO_A_NUEVO = (
+    "01-10-2025\nAceite de oliva virgen extra 4.017\n\n"
+    "02-10-2025\nAceite de oliva virgen extra 4.033\n\n"
+    "02-10-2025\nAceite de oliva lampante 3.500\n\n"
+    "03-10-2025\nAceite de oliva virgen extra 4.042\n"
+)
+
+
+def _fichero(tmp_path, nombre, texto):
+    path = tmp_path / nombre
+    path.write_bytes(texto.encode("utf-8"))
+    return path
+
+
+def test_detectar_formato(tmp_path):
+    assert detectar_formato(_fichero(tmp_path, "a.txt", NUEVO_A_ANTIGUO)) == \
+        {"formato": "espacios", "decimal": ".", "orden": "desc"}
+    assert detectar_formato(_fichero(tmp_path, "b.txt", TABULADO)) == \
+        {"formato": "tabulado", "decimal": ",", "orden": "desc"}
+    assert detectar_formato(_fichero(tmp_path, "c.txt", ANTIGUO_A_NUEVO)) == \
+        {"formato": "espacios", "decimal": ".", "orden": "asc"}
+
+
+@pytest.mark.parametrize("bloque", [1, 7, 64, 1 << 16])
+@pytest.mark.parametrize("texto", [NUEVO_A_ANTIGUO, TABULADO, ANTIGUO_A_NUEVO.rstrip("\n")])
+def test_lineas_al_reves(tmp_path, texto, bloque):
+    path = _fichero(tmp_path, "x.txt", texto)
+    esperado = [linea.rstrip("\r") for linea in texto.split("\n")][::-1]
+    assert list(lineas_al_reves(path, bloque)) == esperado
+
+
+def test_dias_ordenados_de_nuevo_a_antiguo(tmp_path):
+    path = _fichero(tmp_path, "historico.txt", NUEVO_A_ANTIGUO)
+    assert list(dias_ordenados(path)) == [
+        (date(2025, 8, 22), {EXTRA: 3.8, VIRGEN: 3.42, LAMPANTE: 3.29}),
+        (date(2025, 8, 25), {EXTRA: 3.833, VIRGEN: 3.45, LAMPANTE: 3.3}),
+        (date(2025, 8, 26), {EXTRA: None, VIRGEN: None, LAMPANTE: None}),
+    ]
+
+
+def test_dias_ordenados_tabulado(tmp_path):
+    path = _fichero(tmp_path, "historico_completo.txt", TABULADO)
+    assert list(dias_ordenados(path)) == [
+        (date(2025, 9, 24), {EXTRA: 4.033, VIRGEN: 3.65}),
+        (date(2025, 9, 25), {EXTRA: 4.08, VIRGEN: 3.669}),
+    ]
+
+
+def test_dias_ordenados_une_bloques_repetidos(tmp_path):
+    path = _fichero(tmp_path, "precios2015.txt", ANTIGUO_A_NUEVO)
+    assert list(dias_ordenados(path)) == [
+        (date(2025, 10, 1), {EXTRA: 4.017}),
+        (date(2025, 10, 2), {EXTRA: 4.033, LAMPANTE: 3.5}),
+        (date(2025, 10, 3), {EXTRA: 4.042}),
+    ]
+
+
+def test_dias_ordenados_rechaza_ficheros_desordenados(tmp_path):
+    path = _fichero(tmp_path, "mal.txt", ANTIGUO_A_NUEVO + "\n01-09-2025\nAceite de oliva virgen extra 3.9\n")
+    with pytest.raises(ValueError, match="desordenadas"):
+        list(dias_ordenados(path))
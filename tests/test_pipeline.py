@@ -0,0 +1,85 @@
+# tests/test_pipeline.py
+# Orden, saltos por dependencias y huellas, y cerrojo de pipeline.ejecutar.
+
+import json
+
+import escritura
+import pipeline
+from pipeline import Etapa
+
+
+def _etapas(llamadas, lectura=True, huella_texto=None):
+    """lectura (sin escribir) → actual → texto (con huella opcional)."""
+    def _fn(nombre, resultado):
+        def fn(ctx):
+            llamadas.append((nombre, bool(escritura._tenidos)))
+            return resultado
+        return fn
+
+    return [
+        Etapa("lectura", escribe=False)(_fn("lectura", lectura)),
+        Etapa("actual", ["lectura"])(_fn("actual", True)),
+        Etapa("texto", ["actual"], huella=huella_texto)(_fn("texto", False)),
+    ]
+
+
+def test_cerrojo_desde_la_primera_etapa_que_escribe(directorio_datos, metricas_limpias):
+    llamadas = []
+    estado = directorio_datos / "estado.json"
+    informe = pipeline.ejecutar({}, _etapas(llamadas), estado)
+
+    assert informe == {"lectura": "cambio", "actual": "cambio", "texto": "sin_cambios"}
+    assert llamadas == [("lectura", False), ("actual", True), ("texto", True)]
+    assert json.loads(estado.read_text()) == {}
+    assert not escritura._tenidos
+
+
+def test_sin_cambios_se_omite_y_no_se_toca_el_estado(directorio_datos, metricas_limpias):
+    llamadas = []
+    estado = directorio_datos / "estado.json"
+    informe = pipeline.ejecutar({}, _etapas(llamadas, lectura=False), estado)
+
+    assert informe == {"lectura": "sin_cambios", "actual": "omitida", "texto": "omitida"}
+    assert llamadas == [("lectura", False)]
+    assert not estado.exists()  # sin cerrojo no se escribe el estado
+
+
+def test_huella_distinta_ejecuta_la_etapa_pendiente(directorio_datos, metricas_limpias):
+    llamadas = []
+    estado = directorio_datos / "estado.json"
+    estado.write_text(json.dumps({"texto": ["antes"]}))
+    firma = ["ahora"]
+
+    informe = pipeline.ejecutar({}, _etapas(llamadas, lectura=False, huella_texto=lambda ctx: firma), estado)
+    assert informe["actual"] == "omitida"
+    assert informe["texto"] == "sin_cambios"  # se ejecutó por la huella
+    assert ("texto", True) in llamadas
+    assert json.loads(estado.read_text()) == {"texto": ["ahora"]}
+
+    # con la huella ya guardada, la siguiente ejecución la omite
+    llamadas.clear()
+    informe = pipeline.ejecutar({}, _etapas(llamadas, lectura=False, huella_texto=lambda ctx: firma), estado)
+    assert informe["texto"] == "omitida"
+    assert llamadas == [("lectura", False)]
+
+
+def test_huella_sin_estado_previo_no_esta_pendiente(directorio_datos, metricas_limpias):
+    llamadas = []
+    estado = directorio_datos / "estado.json"
+    informe = pipeline.ejecutar({}, _etapas(llamadas, lectura=False, huella_texto=lambda ctx: ["x"]), estado)
+
+    assert informe["texto"] == "omitida"
+    # la etapa con huella toma el cerrojo para comprobarla, así que el estado se escribe
+    assert json.loads(estado.read_text()) == {}
+
+
+def test_al_tomar_el_cerrojo_se_recarga_el_almacen(directorio_datos, metricas_limpias):
+    class _Store:
+        recargas = 0
+
+        def recargar(self):
+            self.recargas += 1
+
+    ctx = {"store": _Store()}
+    pipeline.ejecutar(ctx, _etapas([]), directorio_datos / "estado.json")
+    assert ctx["store"].recargas == 1
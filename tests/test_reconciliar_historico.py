@@ -0,0 +1,85 @@
+# tests/test_reconciliar_historico.py
+
+import json
+
+import reconciliar_historico
+from historico_store import HIST_KEYS
+
+EXTRA, VIRGEN, LAMPANTE = HIST_KEYS
+
+
+def _texto(path, dias):
+    bloques = []
+    for fecha, precios in dias:
+        lineas = [fecha] + [f"{k} Sin cierre de operaciones" if v is None else f"{k} {v:.3f}"
+                            for k, v in zip(HIST_KEYS, precios)]
+        bloques.append("\n".join(lineas))
+    path.write_text("\n\n".join(bloques) + "\n", encoding="utf-8")
+    return path
+
+
+def _ficheros(tmp_path):
+    # a rellena hacia delante el 03 (sin cierre en b) y el 04 trae otro precio real
+    a = _texto(tmp_path / "a.txt", [
+        ("02-10-2025", (4.033, 3.617, 3.500)),
+        ("03-10-2025", (4.033, 3.617, 3.500)),
+        ("04-10-2025", (4.042, 3.617, 3.510)),
+    ])
+    b = _texto(tmp_path / "b.txt", [
+        ("02-10-2025", (4.033, 3.617, 3.500)),
+        ("03-10-2025", (None, None, None)),
+        ("04-10-2025", (4.051, 3.617, 3.510)),
+    ])
+    # c repite el 04 el precio del 03 (arrastrado) frente al real de a
+    c = _texto(tmp_path / "c.txt", [
+        ("03-10-2025", (4.040, 3.620, 3.505)),
+        ("04-10-2025", (4.040, 3.620, 3.505)),
+    ])
+    return [a, b, c]
+
+
+def _conflictos(path):
+    return [json.loads(linea) for linea in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_solo_cuentan_diferencias_entre_precios_reales(tmp_path):
+    resumen = reconciliar_historico.reconciliar(
+        _ficheros(tmp_path), tmp_path / "canonico.txt", tmp_path / "conflictos.jsonl",
+        rellenan=("a.txt", "c.txt"))
+
+    conflictos = _conflictos(tmp_path / "conflictos.jsonl")
+    assert [(c["fecha"], c["tipo"]) for c in conflictos] == [("2025-10-04", EXTRA)]
+    assert conflictos[0]["valores"] == {"a.txt": 4.042, "b.txt": 4.051, "c.txt": 4.04}
+    assert conflictos[0]["arrastrados"] == ["c.txt"]
+    assert resumen["conflictos"] == 1
+    assert resumen["sin_cierre"] == 3  # el 03, los tres tipos
+    assert resumen["arrastrado"] == 2  # el 04, virgen y lampante frente a c
+    assert resumen["dias"] == 3
+
+
+def test_repetidos_de_ficheros_que_no_rellenan_van_al_informe(tmp_path):
+    # sin ficheros que rellenen no se sabe qué precio es relleno: todo se informa
+    resumen = reconciliar_historico.reconciliar(
+        _ficheros(tmp_path), tmp_path / "canonico.txt", tmp_path / "conflictos.jsonl", rellenan=())
+
+    conflictos = _conflictos(tmp_path / "conflictos.jsonl")
+    assert [(c["fecha"], c["tipo"]) for c in conflictos] == [
+        ("2025-10-03", k) for k in HIST_KEYS] + [("2025-10-04", k) for k in HIST_KEYS]
+    assert conflictos[0]["valores"] == {"a.txt": 4.033, "b.txt": None, "c.txt": 4.04}
+    assert conflictos[0]["arrastrados"] == ["a.txt"]
+    assert conflictos[4]["arrastrados"] == ["a.txt", "c.txt"]  # virgen el 04 (b venía de sin cierre)
+    assert resumen["conflictos"] == 6
+    assert resumen["sin_cierre"] == resumen["arrastrado"] == 0
+
+
+def test_elegidos_por_precio(tmp_path):
+    # a solo trae el virgen extra: los otros dos tipos los pone b
+    a = tmp_path / "a.txt"
+    a.write_text(f"02-10-2025\n{EXTRA} 4.033\n", encoding="utf-8")
+    b = _texto(tmp_path / "b.txt", [("02-10-2025", (4.033, 3.617, 3.500))])
+
+    resumen = reconciliar_historico.reconciliar(
+        [a, b], tmp_path / "canonico.txt", tmp_path / "conflictos.jsonl")
+
+    assert resumen["elegidos"] == {"a.txt": 1, "b.txt": 2}
+    assert resumen["por_fuente"] == {"a.txt": 1, "b.txt": 1}
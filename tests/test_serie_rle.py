@@ -0,0 +1,42 @@
+# tests/test_serie_rle.py
+
+import json
+from datetime import date
+
+import serie_rle
+
+
+def _o(dia: int) -> int:
+    return date(2025, 10, dia).toordinal()
+
+
+def test_cada_serie_conserva_su_final(tmp_path):
+    series = {
+        "larga": serie_rle.codificar_observados([_o(1), _o(3)], [4.0, 4.1], fin=_o(10)),
+        "corta": serie_rle.codificar_observados([_o(2), _o(4)], [3.5, 3.6]),
+    }
+    path = tmp_path / "serie.rle.json"
+    serie_rle.escribir(path, series)
+    leidas = serie_rle.leer(path)
+
+    assert leidas["larga"].fin == _o(10)
+    assert leidas["corta"].fin == _o(4)
+    assert leidas["larga"].precio(date(2025, 10, 8)) == 4.1
+    assert leidas["corta"].precio(date(2025, 10, 8)) is None
+    assert [d for d, _, _ in leidas["corta"].dias()] == [date(2025, 10, d) for d in range(2, 5)]
+
+
+def test_lee_la_version_1_con_el_final_comun(tmp_path):
+    path = tmp_path / "v1.rle.json"
+    path.write_text(json.dumps({
+        "formato": "rle", "version": 1, "desde": "2025-10-01", "hasta": "2025-10-05",
+        "series": {"x": {"d": [0, 1], "p": [4.0, 4.0], "o": [1, 0]}},
+    }), encoding="utf-8")
+    assert serie_rle.leer(path)["x"].fin == _o(5)
+
+
+def test_codificar_con_hueco():
+    s = serie_rle.codificar([_o(1), _o(2), _o(5)], [4.0, 4.0, 4.2])
+    assert s.inicios == [_o(1), _o(3), _o(5)]
+    assert s.precios == [4.0, None, 4.2]
+    assert s.observados == [1, 0, 1]
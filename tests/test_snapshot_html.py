@@ -0,0 +1,81 @@
+# tests/test_snapshot_html.py
+# Ruta HTTP sin navegador: del HTML estático de Infaoliva a las filas de precios.
+
+import asyncio
+
+from fuentes import Infaoliva
+from scraper import _leer_fuente, _snapshot_desde_html
+
+
+def _tabla_y_filas(html: str):
+    fuente = Infaoliva()
+    tabla = fuente.localizar_tabla(_snapshot_desde_html(html))
+    if not fuente.tabla_valida(tabla):
+        return tabla, None
+    return tabla, fuente.filas(tabla)
+
+
+def test_tabla_normal(fixture_html, metricas_limpias):
+    tabla, (filas, sin_cierre) = _tabla_y_filas(fixture_html("infaoliva.html"))
+
+    assert tabla["cabeceras"] == ["Tipo de aceite de oliva", "Variedad", "Precio €/kg"]
+    assert not sin_cierre
+    assert [(f["clave"], f["variedad"], f["precio_eur_kg"]) for f in filas] == [
+        ("Aceite de oliva virgen extra", "Picual", 4.1),
+        ("Aceite de oliva virgen", "Picual", 3.65),
+        ("Aceite de oliva lampante", "Picual", 3.5),
+    ]
+    assert metricas_limpias.contadores["infaoliva.filas_recorridas"] == 3
+
+
+def test_ignora_tablas_dentro_de_script(fixture_html):
+    snapshot = _snapshot_desde_html(fixture_html("infaoliva.html"))
+    assert len(snapshot["tablas"]) == 1
+
+
+def test_sin_tabla_en_html_estatico(fixture_html, metricas_limpias):
+    tabla, filas = _tabla_y_filas(fixture_html("infaoliva_sin_tabla.html"))
+
+    assert tabla is None and filas is None  # el scraper pasaría a Playwright
+    assert metricas_limpias.indicadores["infaoliva.tabla_por_encabezado"] is False
+
+
+def test_fila_sin_cierre(fixture_html, metricas_limpias):
+    _, (filas, sin_cierre) = _tabla_y_filas(fixture_html("infaoliva_sin_cierre.html"))
+
+    assert sin_cierre
+    assert [(f["clave"], f["precio_eur_kg"]) for f in filas] == [("Aceite de oliva lampante", 3.48)]
+
+
+def test_tabla_por_encabezado_sin_cabeceras(metricas_limpias):
+    html = """
+    <table><tr><td>Menú</td></tr></table>
+    <section><h2>Observatorio de precios del aceite</h2></section>
+    <table>
+      <tr><td>Tipo</td><td>Variedad</td><td>Precio</td></tr>
+      <tr><td>Aceite de oliva virgen extra</td><td>Hojiblanca</td><td>4.200 €</td></tr>
+    </table>
+    """
+    tabla, (filas, sin_cierre) = _tabla_y_filas(html)
+
+    assert tabla["cabeceras"] == []
+    assert not sin_cierre
+    assert [(f["clave"], f["precio_eur_kg"]) for f in filas] == [("Aceite de oliva virgen extra", 4.2)]
+    assert metricas_limpias.indicadores["infaoliva.tabla_por_encabezado"] is True
+
+
+def test_ruta_http_contra_servidor_local(servidor_fixture, metricas_limpias):
+    fuente = Infaoliva(url=servidor_fixture("infaoliva.html"), reintentos=0)
+    r = asyncio.run(_leer_fuente(fuente, "http", navegador=None))
+
+    assert r["error"] is None
+    assert metricas_limpias.indicadores["infaoliva.ruta"] == "http"
+    assert len(fuente.filas(r["tabla"])[0]) == 3
+
+
+def test_ruta_http_sin_tabla_no_reintenta(servidor_fixture, metricas_limpias):
+    fuente = Infaoliva(url=servidor_fixture("infaoliva_sin_tabla.html"), reintentos=2)
+    r = asyncio.run(_leer_fuente(fuente, "http", navegador=None))
+
+    assert r["tabla"] is None and r["error"] == "tabla no encontrada"
+    assert r["intentos"] == 1
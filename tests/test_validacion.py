@@ -0,0 +1,26 @@
+# tests/test_validacion.py
+
+from datetime import date, timedelta
+
+import validacion
+from historico_store import HIST_KEYS
+
+EXTRA = HIST_KEYS[0]
+
+
+def test_texto_de_nuevo_a_antiguo_pasa_salto_y_mediana(tmp_path):
+    # como historico.txt: el día más reciente primero; el 10 trae 9.550 en lugar de 4.550
+    dias = [date(2025, 8, 1) + timedelta(days=i) for i in range(20)]
+    bloques = []
+    for d in reversed(dias):
+        precio = 9.55 if d.day == 10 else 4.55
+        bloques.append(f" {d:%d-%m-%Y}\r\n Aceite de oliva virgen extra Picual {precio:.3f} €\r\n")
+    path = tmp_path / "historico.txt"
+    path.write_bytes("".join(bloques).encode("utf-8"))
+
+    salida = tmp_path / "cuarentena.jsonl"
+    validador = validacion.validar_archivo(validacion._dias_txt(path), salida)
+
+    assert validador.rechazados == {validacion.SALTO: 1}
+    assert '"fecha": "2025-08-10"' in salida.read_text(encoding="utf-8")
+    assert validador.aceptados == 19
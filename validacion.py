@@ -0,0 +1,281 @@
+# validacion.py
+# Validación en streaming de los precios antes de que entren en el histórico.
+#
+# Cada punto (fecha, tipo, precio) pasa por:
+#   fuera_de_rango  precio fuera de (0, 20) €/kg (la regla que ya aplicaba el scraper)
+#   salto           variación frente al último precio aceptado del mismo tipo mayor que
+#                   SALTO_MAX (escalado por la raíz de los días transcurridos)
+#   atipico         lejos de la mediana móvil: |p - mediana| > Z_MAX × 1.4826 × MAD
+#                   sobre los últimos VENTANA precios aceptados
+#   orden           el mismo día no se cumple extra >= virgen >= lampante (con
+#                   TOLERANCIA_ORDEN); se rechaza el precio del par que además se
+#                   sale de su serie o, si no se puede saber, los dos
+# Un desplazamiento decimal da un salto de ×10 y una columna cambiada rompe el orden;
+# ninguno de los dos pasa.
+#
+# El estado por tipo es de tamaño fijo (ventana de VENTANA precios y el último
+# aceptado), así que validar un día cuesta lo mismo con 10 años de histórico que con
+# uno. En el scraper el estado se calienta con la cola del almacén del histórico
+# (Validador.desde_store: solo los últimos días, sin recorrer el archivo completo).
+# Un validador solo aplica salto y mediana a días posteriores a los que ya conoce; para
+# días pasados (backfill) se calienta con los días anteriores a cada uno
+# (Validador.antes_de), así que pasan las mismas pruebas que el scrape diario.
+#
+# Si un cambio de nivel es real, los primeros precios se rechazan por salto; cuando
+# llegan CONFIRMAR seguidos coherentes entre sí se acepta el nuevo nivel y la ventana
+# se reinicia con ellos. Los ya rechazados quedan en cuarentena para revisarlos.
+#
+# Los rechazos se añaden a un JSON-lines de cuarentena:
+#   {"fecha": "2025-10-28", "tipo": "...", "precio": 41.0, "motivo": "salto",
+#    "detalle": "...", "origen": "scraper", "registrado": "...Z"}
+#
+# Uso en lote sobre el archivo completo (informe en cuarentena-archivo.jsonl):
+#   python3 validacion.py                     precios2015.bin + almacén del histórico
+#   python3 validacion.py --txt historico.txt cualquier formato de parser_historico
+
+import argparse
+import bisect
+import json
+import math
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import escritura
+from historico_store import HIST_KEYS, HistoricoStore
+
+CUARENTENA_FILE = Path("cuarentena-precios.jsonl")
+CUARENTENA_LOTE_FILE = Path("cuarentena-archivo.jsonl")
+
+PRECIO_MAX = 20
+VENTANA = 21
+MIN_VENTANA = 7  # con menos precios aceptados no se aplica la prueba de la mediana
+Z_MAX = 8.0
+MAD_MIN = 0.03  # suelo del MAD como fracción de la mediana (series planas)
+SALTO_MAX = 0.20
+TOLERANCIA_ORDEN = 0.02
+CONFIRMAR = 3
+
+FUERA_DE_RANGO = "fuera_de_rango"
+SALTO = "salto"
+ATIPICO = "atipico"
+ORDEN = "orden"
+
+
+class _Serie:
+    """Estado de un tipo: ventana de precios aceptados (en orden y ordenada) y el último."""
+
+    def __init__(self):
+        self.ventana = deque()
+        self.ordenada = []
+        self.ultimo = None
+        self.ultima_fecha = None
+        self.pendientes = []  # [(ordinal, precio)] rechazados seguidos por salto/atípico
+
+    def aceptar(self, o: int, v: float):
+        self.ventana.append(v)
+        bisect.insort(self.ordenada, v)
+        if len(self.ventana) > VENTANA:
+            viejo = self.ventana.popleft()
+            del self.ordenada[bisect.bisect_left(self.ordenada, viejo)]
+        self.ultimo, self.ultima_fecha = v, o
+        self.pendientes = []
+
+    def reiniciar(self, puntos):
+        self.ventana.clear()
+        self.ordenada = []
+        for o, v in puntos:
+            self.aceptar(o, v)
+
+    def mediana_mad(self):
+        orden = self.ordenada
+        n = len(orden)
+        mediana = (orden[(n - 1) // 2] + orden[n // 2]) / 2
+        desv = sorted(abs(v - mediana) for v in orden)
+        return mediana, (desv[(n - 1) // 2] + desv[n // 2]) / 2
+
+    def comprobar(self, o: int, v: float):
+        """(motivo, detalle) si el precio no encaja con la serie, o None."""
+        if self.ultimo is not None:
+            dias = max(1, o - self.ultima_fecha)
+            limite = SALTO_MAX * math.sqrt(dias)
+            cambio = abs(v / self.ultimo - 1)
+            if cambio > limite:
+                return SALTO, f"{cambio:.0%} frente a {self.ultimo} ({dias} día(s); límite {limite:.0%})"
+        if len(self.ordenada) >= MIN_VENTANA:
+            mediana, mad = self.mediana_mad()
+            escala = 1.4826 * max(mad, MAD_MIN * mediana)
+            z = abs(v - mediana) / escala
+            if z > Z_MAX:
+                return ATIPICO, f"z={z:.1f} (mediana {mediana:.3f})"
+        return None
+
+    def confirma_nivel(self, o: int, v: float) -> bool:
+        """Registra un rechazo; True si, con este, hay CONFIRMAR seguidos coherentes entre sí."""
+        self.pendientes.append((o, v))
+        del self.pendientes[:-CONFIRMAR]
+        precios = [p for _, p in self.pendientes]
+        return len(precios) >= CONFIRMAR and max(precios) / min(precios) - 1 <= SALTO_MAX
+
+
+def _orden(valores: dict):
+    """Pares (mayor, menor) del mismo día que incumplen extra >= virgen >= lampante."""
+    malos = []
+    for i, alto in enumerate(HIST_KEYS):
+        for bajo in HIST_KEYS[i + 1:]:
+            a, b = valores.get(alto), valores.get(bajo)
+            if a is not None and b is not None and a < b * (1 - TOLERANCIA_ORDEN):
+                malos.append((alto, bajo))
+    return malos
+
+
+class Validador:
+    def __init__(self):
+        self.series = {k: _Serie() for k in HIST_KEYS}
+        self.aceptados = 0
+        self.rechazados = {}
+
+    @classmethod
+    def desde_store(cls, store: HistoricoStore, dias: int = 2 * VENTANA):
+        """Validador con el estado de los últimos `dias` del almacén (sin recorrerlo entero)."""
+        validador = cls()
+        ultima = store.ultima_fecha()
+        if ultima:
+            desde = (date.fromisoformat(ultima) - timedelta(days=dias)).isoformat()
+            for fecha_iso, valores in store.iterar(desde):
+                validador.aprender(date.fromisoformat(fecha_iso), dict(zip(HIST_KEYS, valores)))
+        return validador
+
+    @classmethod
+    def antes_de(cls, fechas, cols, fecha: date, dias: int = 2 * VENTANA):
+        """
+        Validador con el estado de los `dias` anteriores a `fecha` en la serie
+        (fechas, {clave: [precio | None]}) de serie_binaria.cargar_serie.
+        """
+        validador = cls()
+        i = bisect.bisect_left(fechas, fecha - timedelta(days=dias))
+        j = bisect.bisect_left(fechas, fecha)
+        for idx in range(i, j):
+            validador.aprender(fechas[idx], {k: cols[k][idx] for k in HIST_KEYS})
+        return validador
+
+    def aprender(self, fecha: date, valores: dict):
+        """Incorpora precios ya aceptados sin validarlos (calentar el estado)."""
+        o = fecha.toordinal()
+        for k, v in valores.items():
+            s = self.series.get(k)
+            if s is not None and v is not None and (s.ultima_fecha is None or o > s.ultima_fecha):
+                s.aceptar(o, v)
+
+    def _fallo(self, k, o: int, v: float):
+        s = self.series.get(k)
+        if s is None or (s.ultima_fecha is not None and o <= s.ultima_fecha):
+            return None
+        return s.comprobar(o, v)
+
+    def validar(self, fecha: date, valores: dict):
+        """
+        Valida los precios {clave: float} de un día. Devuelve (aceptados, rechazos):
+        aceptados {clave: float}; rechazos [{"fecha", "tipo", "precio", "motivo", "detalle"}].
+        """
+        o = fecha.toordinal()
+        rechazos = []
+        candidatos = {}
+
+        def _rechazar(k, v, motivo, detalle):
+            rechazos.append({"fecha": fecha.isoformat(), "tipo": k, "precio": v,
+                             "motivo": motivo, "detalle": detalle})
+            self.rechazados[motivo] = self.rechazados.get(motivo, 0) + 1
+
+        for k, v in valores.items():
+            if v is None:
+                continue
+            if not 0 < v < PRECIO_MAX:
+                _rechazar(k, v, FUERA_DE_RANGO, f"fuera de (0, {PRECIO_MAX}) €/kg")
+            else:
+                candidatos[k] = v
+
+        for alto, bajo in _orden(candidatos):
+            par = [k for k in (alto, bajo) if k in candidatos]
+            # si solo uno de los dos se sale de su propia serie, el culpable es ese
+            culpables = [k for k in par if self._fallo(k, o, candidatos[k])]
+            for k in culpables if len(culpables) == 1 else par:
+                _rechazar(k, candidatos.pop(k), ORDEN, f"{alto} < {bajo}")
+
+        aceptados = {}
+        for k, v in candidatos.items():
+            s = self.series.get(k)
+            if s is None or (s.ultima_fecha is not None and o <= s.ultima_fecha):
+                aceptados[k] = v  # fecha pasada (backfill) o tipo sin serie: solo rango y orden
+                continue
+            fallo = s.comprobar(o, v)
+            if fallo is None:
+                s.aceptar(o, v)
+                aceptados[k] = v
+            elif s.confirma_nivel(o, v):
+                s.reiniciar(s.pendientes)  # cambio de nivel confirmado
+                aceptados[k] = v
+            else:
+                _rechazar(k, v, *fallo)
+
+        self.aceptados += len(aceptados)
+        return aceptados, rechazos
+
+
+def poner_en_cuarentena(rechazos, origen: str, path: Path = CUARENTENA_FILE):
+    """Añade los rechazos al JSON-lines de cuarentena."""
+    if not rechazos:
+        return
+    registrado = datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+    escritura.anexar(path, "".join(json.dumps({**r, "origen": origen, "registrado": registrado},
+                                              ensure_ascii=False) + "\n" for r in rechazos))
+
+
+def _dias_txt(path):
+    """
+    (fecha, {clave: precio}) de un texto del histórico en orden ascendente de fecha,
+    aunque el fichero vaya de nuevo a antiguo (historico.txt, historico_completo.txt):
+    el validador solo aplica salto y mediana a fechas posteriores a las que conoce.
+    """
+    from parser_historico import dias_ordenados
+
+    return dias_ordenados(path)
+
+
+def _dias_serie(bin_path):
+    from serie_binaria import cargar_serie
+
+    fechas, cols = cargar_serie(bin_path, HistoricoStore())
+    for i, d in enumerate(fechas):
+        yield d, {k: cols[k][i] for k in HIST_KEYS}
+
+
+def validar_archivo(dias, salida: Path = CUARENTENA_LOTE_FILE) -> Validador:
+    """Pasa todo el archivo por el validador (en orden) y reescribe el informe de cuarentena."""
+    validador = Validador()
+    Path(salida).unlink(missing_ok=True)
+    pendientes = []
+    for fecha, valores in dias:
+        _, rechazos = validador.validar(fecha, valores)
+        pendientes.extend(rechazos)
+        if len(pendientes) >= 1000:
+            poner_en_cuarentena(pendientes, "lote", salida)
+            pendientes = []
+    poner_en_cuarentena(pendientes, "lote", salida)
+    return validador
+
+
+if __name__ == "__main__":
+    from serie_binaria import BIN_FILE
+
+    ap = argparse.ArgumentParser(description="Valida el archivo de precios completo y deja los rechazos en cuarentena.")
+    ap.add_argument("--bin", type=Path, default=BIN_FILE, help="Serie binaria (más el almacén del histórico)")
+    ap.add_argument("--txt", type=Path, help="Validar un texto del histórico en lugar de la serie binaria")
+    ap.add_argument("--salida", type=Path, default=CUARENTENA_LOTE_FILE, help="JSON-lines de rechazos")
+    args = ap.parse_args()
+
+    validador = validar_archivo(_dias_txt(args.txt) if args.txt else _dias_serie(args.bin), args.salida)
+    total = sum(validador.rechazados.values())
+    print(f"✅ {validador.aceptados} precios aceptados; {total} en cuarentena ({args.salida}).")
+    for motivo, n in sorted(validador.rechazados.items()):
+        print(f"   {motivo}: {n}")
@@ -1,92 +1,75 @@
 import datetime
 
-FILE_PATH = "precios 2015.txt"
-
-
-def parsear_precio(valor: str, ultimo_precio: float) -> float:
-    """
-    Limpia y convierte el precio a float.
-    Si el valor está vacío o es 'sin cierre de operaciones', usa el último precio.
-    """
-    valor = valor.strip().lower()
+import escritura
+import remuestreo
+from parser_historico import parsear_archivo
 
-    if not valor or "sin cierre" in valor:
-        return ultimo_precio
-
-    # Normalizar separadores decimales
-    valor = valor.replace(",", ".").replace(" ", "")
-
-    try:
-        return float(valor)
-    except ValueError:
-        print(f"⚠️ Línea ignorada (precio inválido): {valor}")
-        return ultimo_precio
+FILE_PATH = "precios 2015.txt"
 
 
 def leer_precios(file_path: str):
     """
     Lee el archivo de precios y devuelve un diccionario {fecha: {tipo: precio}}
+    Acepta también la serie binaria (.bin) generada por serie_binaria.py.
     """
+    if str(file_path).endswith(".bin"):
+        import serie_binaria
+        return serie_binaria.leer_por_fecha(file_path)
+
     precios = {}
-    fecha_actual = None
     ultimo_precio = {}
 
-    with open(file_path, "r", encoding="utf-8") as f:
-        for linea in f:
-            linea = linea.strip()
-            if not linea:
-                continue
-
-            # Detectar fecha (formato DD-MM-YYYY)
-            try:
-                fecha = datetime.datetime.strptime(linea, "%d-%m-%Y").date()
-                fecha_actual = fecha
-                if fecha_actual not in precios:
-                    precios[fecha_actual] = {}
-                continue
-            except ValueError:
-                pass  # no es fecha
-
-            # Si es línea de precio
-            if fecha_actual:
-                partes = linea.split()
-                tipo = " ".join(partes[:-1])  # todo menos el último token
-                valor = partes[-1].replace("€", "").replace("/kg", "")
-
-                # Usar último precio conocido si no hay valor válido
-                precio = parsear_precio(valor, ultimo_precio.get(tipo, 0.0))
-                precios[fecha_actual][tipo] = precio
-                ultimo_precio[tipo] = precio
+    # Parser común: detecta el formato y trata "Sin cierre de operaciones" como None
+    for fecha, tipo, precio in parsear_archivo(file_path):
+        # Usar último precio conocido si no hay valor válido
+        if precio is None:
+            precio = ultimo_precio.get(tipo, 0.0)
+        precios.setdefault(fecha, {})[tipo] = precio
+        ultimo_precio[tipo] = precio
 
     return precios
 
 
-def rellenar_faltantes(precios: dict):
+def rellenar_columnas(precios: dict, politica: str = remuestreo.FFILL):
+    """
+    Rellena los días faltantes de todos los tipos a la vez sobre arrays de ordinales.
+    Devuelve (ordinales, {tipo: [precio | None]}) sin crear un dict por día.
+    """
+    fechas = sorted(precios.keys())
+    tipos = list(dict.fromkeys(t for f in fechas for t in precios[f]))
+    ordinales = [f.toordinal() for f in fechas]
+    columnas = {t: [precios[f].get(t) for f in fechas] for t in tipos}
+    return remuestreo.rellenar(ordinales, columnas, politica=politica)
+
+
+def rellenar_faltantes(precios: dict, politica: str = remuestreo.FFILL):
     """
     Rellena los días faltantes con el último precio conocido
     """
     if not precios:
         return {}
 
-    fechas = sorted(precios.keys())
-    fecha_inicio, fecha_fin = fechas[0], fechas[-1]
-    precios_completos = {}
-    ultimo_valores = {}
-
-    fecha = fecha_inicio
-    while fecha <= fecha_fin:
-        if fecha in precios:
-            precios_completos[fecha] = precios[fecha]
-            ultimo_valores.update(precios[fecha])
-        else:
-            precios_completos[fecha] = ultimo_valores.copy()
-        fecha += datetime.timedelta(days=1)
-
-    return precios_completos
+    ordinales, columnas = rellenar_columnas(precios, politica)
+    return {
+        datetime.date.fromordinal(o): {t: col[i] for t, col in columnas.items() if col[i] is not None}
+        for i, o in enumerate(ordinales)
+    }
+
+
+def guardar_columnas(ordinales, columnas: dict, file_path: str):
+    """Escribe el formato de bloques a partir de columnas (fechas formateadas en bloque)."""
+    fechas = remuestreo.fechas_para(ordinales, "dmy")
+    with escritura.abrir(file_path) as f:
+        for i, fecha in enumerate(fechas):
+            f.write(f"{fecha}\n")
+            for tipo, col in columnas.items():
+                if col[i] is not None:
+                    f.write(f"{tipo} {col[i]:.3f}\n")
+            f.write("\n")
 
 
 def guardar_precios(precios: dict, file_path: str):
-    with open(file_path, "w", encoding="utf-8") as f:
+    with escritura.abrir(file_path) as f:
         for fecha in sorted(precios.keys()):
             f.write(f"{fecha.strftime('%d-%m-%Y')}\n")
             for tipo, valor in precios[fecha].items():
@@ -96,6 +79,7 @@ def guardar_precios(precios: dict, file_path: str):
 
 if __name__ == "__main__":
     precios = leer_precios(FILE_PATH)
-    precios_completos = rellenar_faltantes(precios)
-    guardar_precios(precios_completos, FILE_PATH)
+    if precios:
+        ordinales, columnas = rellenar_columnas(precios)
+        guardar_columnas(ordinales, columnas, FILE_PATH)
     print(f"✅ Archivo {FILE_PATH} ha sido validado y sobrescrito con los datos corregidos.")